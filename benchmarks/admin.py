@@ -0,0 +1,89 @@
+"""Отрисовка списка постов в админке: обычный ModelAdmin против PostAdmin.
+
+    python -m benchmarks.admin --posts 1000000
+
+Обычный вариант повторяет прежние настройки PostAdmin: точный COUNT(*),
+связанные объекты без list_select_related, DISTINCT по датам и свой
+список групп у каждой редактируемой строки.
+"""
+import argparse
+
+from benchmarks.utils import fill_posts, measure, print_table, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--db', help='путь к уже заполненной базе')
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    from django.conf import settings
+    from django.contrib import admin
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.test import RequestFactory
+    from django.test.utils import CaptureQueriesContext
+
+    from posts.admin import PostAdmin
+    from posts.models import Post
+
+    class StockPostAdmin(admin.ModelAdmin):
+        list_display = ('pk', 'text', 'pub_date', 'author', 'group')
+        list_editable = ('group',)
+        search_fields = ('text',)
+        list_filter = ('pub_date',)
+        date_hierarchy = 'pub_date'
+
+    # Как на боевом сервере: шаблоны виджетов разбираются один раз.
+    settings.DEBUG = False
+    if not args.db:
+        fill_posts(args.posts)
+    superuser = get_user_model().objects.create_superuser(
+        'benchmark-admin', '', 'password'
+    )
+    factory = RequestFactory()
+    year = Post.objects.latest('pub_date').pub_date.year
+    urls = (
+        ('все посты', {}),
+        (f'{year} год', {'pub_date__year': year}),
+        ('поиск', {'q': 'Пост 12345'}),
+    )
+
+    rows = []
+    for name, params in urls:
+        def render(model_admin):
+            request = factory.get('/admin/posts/post/', params)
+            request.user = superuser
+            model_admin.changelist_view(request).render()
+
+        timings = []
+        queries = []
+        for model_admin in (
+            StockPostAdmin(Post, admin.site), PostAdmin(Post, admin.site)
+        ):
+            render(model_admin)
+            with CaptureQueriesContext(connection) as captured:
+                render(model_admin)
+            queries.append(len(captured))
+            timings.append(measure(lambda: render(model_admin), args.repeat))
+        stock_ms, tuned_ms = timings
+        rows.append((
+            name,
+            f'{stock_ms:.1f}',
+            queries[0],
+            f'{tuned_ms:.1f}',
+            queries[1],
+            f'{stock_ms / tuned_ms:.1f}x',
+        ))
+    print(f'Постов: {Post.objects.latest("pk").pk}')
+    print_table(
+        ('список', 'ModelAdmin, мс', 'запросов', 'PostAdmin, мс',
+         'запросов', 'ускорение'),
+        rows,
+    )
+
+
+if __name__ == '__main__':
+    main()
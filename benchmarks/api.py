@@ -0,0 +1,72 @@
+"""Запросов в секунду на ядро: JSON API против HTML-страниц тех же лент.
+
+    python -m benchmarks.api --posts 100000
+
+Запросы идут через тестовый клиент Django со всеми middleware, но без
+сети. «Кэш» — повторный запрос анонимного читателя, «без кэша» —
+запрос с очищенным кэшем страниц и фрагментов.
+"""
+import argparse
+import time
+
+from benchmarks.utils import fill_posts, print_table, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=100000)
+    parser.add_argument('--seconds', type=float, default=2.0)
+    parser.add_argument('--db', help='путь к уже заполненной базе')
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.test import Client
+
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['*']
+    if not args.db:
+        fill_posts(args.posts)
+    client = Client()
+
+    def rate(url, cached):
+        client.get(url)
+        done = 0
+        spent = 0.0
+        while spent < args.seconds:
+            if not cached:
+                cache.clear()
+            start = time.perf_counter()
+            response = client.get(url)
+            spent += time.perf_counter() - start
+            assert response.status_code == 200, response.status_code
+            done += 1
+        return done / spent
+
+    pages = (
+        ('главная', '/', '/api/v1/posts/'),
+        ('группа', '/group/group-1/', '/api/v1/groups/group-1/posts/'),
+        ('профиль', '/profile/user1/', '/api/v1/profiles/user1/posts/'),
+        ('пост', '/posts/1/', '/api/v1/posts/1/'),
+    )
+    rows = []
+    for name, html, api in pages:
+        for cached in (True, False):
+            html_rate = rate(html, cached)
+            api_rate = rate(api, cached)
+            rows.append((
+                name,
+                'кэш' if cached else 'без кэша',
+                f'{html_rate:.0f}',
+                f'{api_rate:.0f}',
+                f'{api_rate / html_rate:.1f}x',
+            ))
+    print_table(
+        ('страница', 'режим', 'HTML, зап/с', 'API, зап/с', 'ускорение'),
+        rows,
+    )
+
+
+if __name__ == '__main__':
+    main()
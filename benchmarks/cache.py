@@ -0,0 +1,113 @@
+"""Пропускная способность кэша при нескольких процессах.
+
+    python -m benchmarks.cache --processes 1 2 4 8
+
+Каждый процесс выполняет смесь операций, как у страниц сайта: в основном
+get_many/get, немного set и incr поколений. LocMemCache приведён для
+сравнения: он быстрее, но у каждого процесса своя копия, и общий счётчик
+в нём не сходится.
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.utils import PROJECT_DIR, print_table
+
+KEYS = 1000
+INCR_KEYS = 10
+
+
+def make_cache(name, location):
+    from django.conf import settings
+
+    if not settings.configured:
+        settings.configure()
+    if PROJECT_DIR not in sys.path:
+        sys.path.insert(0, PROJECT_DIR)
+    from django.core.cache.backends.filebased import FileBasedCache
+    from django.core.cache.backends.locmem import LocMemCache
+
+    from core.cache import SQLiteCache
+
+    options = {'OPTIONS': {'MAX_ENTRIES': KEYS * 10}}
+    if name == 'sqlite':
+        return SQLiteCache(os.path.join(location, 'cache.sqlite3'), options)
+    if name == 'filebased':
+        return FileBasedCache(os.path.join(location, 'files'), options)
+    return LocMemCache(location, options)
+
+
+def work(name, location, ops, seed):
+    cache = make_cache(name, location)
+    rnd = random.Random(seed)
+    payload = 'x' * 2000
+    increments = 0
+    for _ in range(ops):
+        roll = rnd.random()
+        if roll < 0.6:
+            cache.get(f'key{rnd.randrange(KEYS)}')
+        elif roll < 0.85:
+            cache.get_many([f'key{rnd.randrange(KEYS)}' for _ in range(5)])
+        elif roll < 0.95:
+            cache.set(f'key{rnd.randrange(KEYS)}', payload)
+        else:
+            cache.incr(f'generation{rnd.randrange(INCR_KEYS)}')
+            increments += 1
+    return increments
+
+
+def run(name, processes, ops):
+    location = tempfile.mkdtemp()
+    try:
+        cache = make_cache(name, location)
+        cache.set_many({f'key{i}': 'x' * 2000 for i in range(KEYS)})
+        cache.set_many({f'generation{i}': 0 for i in range(INCR_KEYS)})
+        with ProcessPoolExecutor(processes) as pool:
+            start = time.perf_counter()
+            expected = sum(pool.map(
+                work,
+                [name] * processes,
+                [location] * processes,
+                [ops] * processes,
+                range(processes),
+            ))
+            elapsed = time.perf_counter() - start
+        increments = sum(
+            cache.get(f'generation{i}') for i in range(INCR_KEYS)
+        )
+        return processes * ops / elapsed, increments, expected
+    finally:
+        shutil.rmtree(location)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--processes', type=int, nargs='+', default=[1, 2, 4, 8]
+    )
+    parser.add_argument('--ops', type=int, default=5000)
+    args = parser.parse_args()
+
+    rows = []
+    for processes in args.processes:
+        for name in ('locmem', 'filebased', 'sqlite'):
+            throughput, increments, expected = run(
+                name, processes, args.ops
+            )
+            rows.append((
+                processes, name, f'{throughput:.0f}',
+                f'{increments}/{expected}',
+            ))
+    print(f'Операций на процесс: {args.ops}')
+    print_table(
+        ('процессов', 'бэкенд', 'оп/с', 'incr сохранено/выполнено'), rows
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Нумерованные страницы лент: Paginator с COUNT(*) против CountedPaginator.
+
+    python -m benchmarks.page_count --posts 1000000
+
+CountedPaginator берёт число постов группы и автора из счётчиков, а для
+главной и ленты подписок — из кэша (замер идёт на прогретом кэше).
+"""
+import argparse
+
+from benchmarks.utils import (
+    fill_follows, fill_posts, measure, print_table, setup_django,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--follows', type=int, default=50)
+    parser.add_argument('--page', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--db', help='путь к уже заполненной базе')
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    from django.conf import settings
+    from django.core.paginator import Paginator
+
+    from posts.models import Group, Post, User
+    from posts.paginators import CountedPaginator
+    from posts.timeline import Timeline
+
+    if not args.db:
+        fill_posts(args.posts)
+        fill_follows(1, args.follows)
+    reader = User.objects.get(pk=1)
+    author = User.objects.select_related('profile').get(pk=2)
+    group = Group.objects.get(pk=1)
+    feeds = (
+        ('index', Post.objects.select_related('author', 'group'),
+         {'namespaces': ('index',)}),
+        ('group', group.posts.select_related('author', 'group'),
+         {'count': group.posts_count}),
+        ('profile', author.posts.select_related('author', 'group'),
+         {'count': author.profile.posts_count}),
+        ('follow', Timeline(reader).posts(),
+         {'namespaces': ('index', f'follow:{reader.pk}')}),
+    )
+
+    per_page = settings.COUNTER
+    rows = []
+    for name, queryset, count in feeds:
+        def stock_page():
+            list(Paginator(queryset, per_page).get_page(args.page))
+
+        def counted_page():
+            list(CountedPaginator(queryset, per_page, **count).get_page(
+                args.page
+            ))
+
+        counted_page()
+        stock_ms = measure(stock_page, args.repeat)
+        counted_ms = measure(counted_page, args.repeat)
+        rows.append((
+            name,
+            Paginator(queryset, per_page).count,
+            f'{stock_ms:.2f}',
+            f'{counted_ms:.2f}',
+            f'{stock_ms / counted_ms:.1f}x',
+        ))
+    print(f'Страница {args.page}, на странице: {per_page}')
+    print_table(
+        ('лента', 'постов', 'Paginator, мс', 'Counted, мс', 'ускорение'),
+        rows,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Сравнение постраничного вывода: OFFSET + COUNT(*) против курсора.
+
+    python -m benchmarks.pagination --posts 1000000
+"""
+import argparse
+
+from benchmarks.utils import fill_posts, measure, print_table, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--db', help='путь к уже заполненной базе')
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    from django.conf import settings
+    from django.core.paginator import Paginator
+
+    from posts.models import Post
+    from posts.paginators import CursorPaginator, encode_cursor
+
+    if not args.db:
+        fill_posts(args.posts)
+    queryset = Post.objects.select_related('author', 'group')
+    total = queryset.count()
+    per_page = settings.COUNTER
+    last = (total - 1) // per_page + 1
+    depths = sorted({1, 10, 100, 1000, last // 2, last} - {0})
+
+    rows = []
+    for number in depths:
+        def offset_page():
+            list(Paginator(queryset, per_page).get_page(number))
+
+        # Курсор на нужную глубину берётся вне замера: пользователь
+        # получает его из ссылки «Старее» на предыдущей странице.
+        cursor = None
+        if number > 1:
+            edge = Post.objects.order_by('-pub_date', '-id').values_list(
+                'pub_date', 'id'
+            )[(number - 1) * per_page - 1]
+            cursor = encode_cursor(*edge)
+
+        def cursor_page():
+            list(CursorPaginator(queryset, per_page).get_page(after=cursor))
+
+        offset_ms = measure(offset_page, args.repeat)
+        cursor_ms = measure(cursor_page, args.repeat)
+        rows.append((
+            number,
+            f'{offset_ms:.2f}',
+            f'{cursor_ms:.2f}',
+            f'{offset_ms / cursor_ms:.1f}x',
+        ))
+    print(f'Постов: {total}, на странице: {per_page}')
+    print_table(('страница', 'offset, мс', 'cursor, мс', 'ускорение'), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Смешанная нагрузка чтения и записи: одна база против реплик.
+
+    python -m benchmarks.replicas --posts 100000 --processes 4 --replicas 2
+
+Каждый процесс читает ленты и посты анонимно и с долей --writes
+оставляет комментарии от имени пользователя. Кэш отключён, чтобы все
+чтения доходили до базы. Реплики — копии базы (команда copy_replicas),
+записи до них не доходят, но и не мешают их читателям.
+"""
+import argparse
+import multiprocessing
+import random
+import tempfile
+import time
+
+from benchmarks.utils import fill_posts, print_table, setup_django
+
+
+def work(seed, seconds, writes, post_id):
+    from django.contrib.auth import get_user_model
+    from django.db import OperationalError
+    from django.test import Client
+
+    rnd = random.Random(seed)
+    reader = Client()
+    writer = Client()
+    writer.force_login(get_user_model().objects.get(username='user0'))
+    pages = (
+        '/',
+        '/group/group-1/',
+        '/profile/user1/',
+        f'/posts/{post_id}/',
+    )
+    done = {'reads': 0, 'writes': 0, 'errors': 0}
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        try:
+            if rnd.random() < writes:
+                writer.post(
+                    f'/posts/{post_id}/comment/', {'text': 'Комментарий'}
+                )
+                done['writes'] += 1
+            else:
+                reader.get(rnd.choice(pages))
+                done['reads'] += 1
+        except OperationalError:
+            # database is locked: писатель не дождался блокировки.
+            done['errors'] += 1
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=100000)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--replicas', type=int, default=2)
+    parser.add_argument('--writes', type=float, default=0.1)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    setup_django(replicas=args.replicas)
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.db import connections
+
+    from posts.models import Post
+
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['*']
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        },
+    }
+    settings.SERVER_TIMING_SAMPLE = 0
+    settings.METRICS_DIR = tempfile.mkdtemp()
+    fill_posts(args.posts)
+    call_command('copy_replicas', verbosity=0)
+    post_id = Post.objects.order_by('-pub_date').values_list(
+        'pk', flat=True
+    ).first()
+    replicas = settings.DATABASE_REPLICAS
+
+    rows = []
+    for name, aliases in (('одна база', []), ('реплики', replicas)):
+        settings.DATABASE_REPLICAS = aliases
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        with context.Pool(args.processes) as pool:
+            results = pool.starmap(work, [
+                (seed, args.seconds, args.writes, post_id)
+                for seed in range(args.processes)
+            ])
+        reads = sum(result['reads'] for result in results)
+        writes = sum(result['writes'] for result in results)
+        errors = sum(result['errors'] for result in results)
+        rows.append((
+            name,
+            f'{reads / args.seconds:.0f}',
+            f'{writes / args.seconds:.0f}',
+            f'{(reads + writes) / args.seconds:.0f}',
+            errors,
+        ))
+    print_table(
+        ('режим', 'чтений/с', 'записей/с', 'всего/с', 'ошибок'), rows
+    )
+
+
+if __name__ == '__main__':
+    main()
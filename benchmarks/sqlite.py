@@ -0,0 +1,137 @@
+"""Конкурентная запись комментариев: обычный бэкенд SQLite против
+core.backends.sqlite3.
+
+    python -m benchmarks.sqlite --posts 100000 --processes 1 4 8
+
+Каждый процесс оставляет комментарии (add_comment) и с долей --reads
+читает посты. Кэш отключён, чтобы все запросы доходили до базы.
+«Обычный» — django.db.backends.sqlite3 в режиме отката, соединение на
+каждый запрос; «настроенный» — WAL, PRAGMA, BEGIN IMMEDIATE при записи
+(atomic_immediate) и соединение на процесс. Ошибки — ответы, упавшие
+с «database is locked».
+"""
+import argparse
+import multiprocessing
+import random
+import tempfile
+import time
+
+from benchmarks.utils import fill_posts, percentile, print_table, setup_django
+
+ENGINES = (
+    ('обычный', {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {},
+    }),
+    ('настроенный', {
+        'ENGINE': 'core.backends.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {'timeout': 5},
+    }),
+)
+
+
+def use_engine(engine):
+    from django.db import connections
+
+    connections.close_all()
+    connections.databases['default'].update(engine)
+    del connections['default']
+
+
+def work(seed, seconds, reads, post_ids):
+    from django.contrib.auth import get_user_model
+    from django.db import OperationalError
+    from django.test import Client
+
+    rnd = random.Random(seed)
+    client = Client()
+    client.force_login(get_user_model().objects.get(username=f'user{seed}'))
+    timings = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        post_id = rnd.choice(post_ids)
+        start = time.perf_counter()
+        try:
+            if rnd.random() < reads:
+                client.get(f'/posts/{post_id}/')
+            else:
+                client.post(
+                    f'/posts/{post_id}/comment/', {'text': 'Комментарий'}
+                )
+        except OperationalError:
+            errors += 1
+            continue
+        timings.append(time.perf_counter() - start)
+    return timings, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=100000)
+    parser.add_argument(
+        '--processes', type=int, nargs='+', default=[1, 4, 8]
+    )
+    parser.add_argument('--reads', type=float, default=0.5)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.db import connection
+
+    from posts.models import Post
+
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['*']
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        },
+    }
+    settings.SERVER_TIMING_SAMPLE = 0
+    settings.METRICS_DIR = tempfile.mkdtemp()
+    fill_posts(args.posts, users=max(100, max(args.processes)))
+    post_ids = list(Post.objects.order_by('-pub_date').values_list(
+        'pk', flat=True
+    )[:100])
+
+    rows = []
+    for name, engine in ENGINES:
+        use_engine(engine)
+        with connection.cursor() as cursor:
+            # Режим журнала хранится в файле базы: обычный бэкенд
+            # получает базу в режиме отката, как после создания.
+            cursor.execute(
+                'PRAGMA journal_mode = WAL' if name == 'настроенный'
+                else 'PRAGMA journal_mode = DELETE'
+            )
+        for processes in args.processes:
+            connection.close()
+            context = multiprocessing.get_context('fork')
+            with context.Pool(processes) as pool:
+                results = pool.starmap(work, [
+                    (seed, args.seconds, args.reads, post_ids)
+                    for seed in range(processes)
+                ])
+            timings = [value for result in results for value in result[0]]
+            errors = sum(result[1] for result in results)
+            rows.append((
+                name,
+                processes,
+                f'{len(timings) / args.seconds:.0f}',
+                f'{percentile(timings, 50) * 1000:.1f}',
+                f'{percentile(timings, 99) * 1000:.1f}',
+                errors,
+            ))
+    print_table(
+        ('бэкенд', 'процессов', 'запросов/с', 'p50, мс', 'p99, мс',
+         'ошибок'),
+        rows,
+    )
+
+
+if __name__ == '__main__':
+    main()
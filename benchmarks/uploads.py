@@ -0,0 +1,111 @@
+"""Память и время обработки загруженной картинки в зависимости от размера.
+
+    python -m benchmarks.uploads --megapixels 2 12 24 48
+
+Сравнивается обработка с полным декодированием (open, exif_transpose,
+thumbnail) и posts.images.normalize, которая декодирует JPEG сразу
+уменьшенным. Каждый замер идёт в отдельном процессе, пик памяти — по
+ru_maxrss (только Unix).
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from benchmarks.utils import PROJECT_DIR, print_table
+
+MAX_SIDE = 2048
+
+
+def make_photo(path, megapixels):
+    from PIL import Image
+
+    width = int((megapixels * 10 ** 6 * 4 / 3) ** 0.5)
+    height = width * 3 // 4
+    # Шум сжимается как настоящая фотография, а не как заливка.
+    noise = Image.effect_noise((width // 4, height // 4), 64)
+    image = Image.merge('RGB', (noise, noise.rotate(90), noise)).resize(
+        (width, height)
+    )
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    image.save(path, 'JPEG', quality=90, exif=exif.tobytes())
+    return width, height
+
+
+def full_decode(path):
+    from PIL import Image, ImageOps
+
+    with open(path, 'rb') as upload:
+        image = ImageOps.exif_transpose(Image.open(upload))
+        image.thumbnail((MAX_SIDE, MAX_SIDE), Image.LANCZOS)
+        image.save(tempfile.TemporaryFile(), 'JPEG', quality=85)
+
+
+def streamed(path):
+    from django.core.files import File
+
+    from posts.images import normalize
+
+    with open(path, 'rb') as upload:
+        normalize(File(upload, name=os.path.basename(path)))
+
+
+def measure(name, path, queue):
+    from django.conf import settings
+
+    if PROJECT_DIR not in sys.path:
+        sys.path.insert(0, PROJECT_DIR)
+    settings.configure(POST_IMAGE_MAX_SIDE=MAX_SIDE, POST_IMAGE_QUALITY=85)
+    import PIL.Image  # noqa: F401 — импорт не должен попасть в замер
+
+    func = {'full decode': full_decode, 'normalize': streamed}[name]
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    func(path)
+    elapsed = (time.perf_counter() - start) * 1000
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((elapsed, (peak - before) / 1024))
+
+
+def run(name, path):
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=measure, args=(name, path, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--megapixels', type=float, nargs='+', default=[2, 12, 24, 48]
+    )
+    args = parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for megapixels in args.megapixels:
+            path = os.path.join(directory, f'{megapixels}.jpg')
+            width, height = make_photo(path, megapixels)
+            size = os.path.getsize(path) / 2 ** 20
+            for name in ('full decode', 'normalize'):
+                elapsed, peak = run(name, path)
+                rows.append((
+                    f'{width}x{height}', f'{size:.1f}', name,
+                    f'{elapsed:.0f}', f'{peak:.0f}',
+                ))
+    print(f'Оригинал ужимается до {MAX_SIDE}px по большей стороне')
+    print_table(
+        ('картинка', 'файл, МБ', 'способ', 'время, мс', 'пик памяти, МБ'),
+        rows,
+    )
+
+
+if __name__ == '__main__':
+    main()
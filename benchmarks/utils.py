@@ -0,0 +1,143 @@
+"""Общая обвязка бенчмарков: отдельная база, генерация данных, замеры.
+
+Бенчмарки запускаются из корня репозитория, например::
+
+    python -m benchmarks.pagination --posts 1000000
+
+Данные пишутся во временную базу SQLite, рабочая db.sqlite3 не трогается.
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_DIR = os.path.join(BASE_DIR, 'yatube')
+
+
+def setup_django(db_path=None, replicas=0):
+    """Настраивает Django на отдельную базу и накатывает миграции.
+
+    С replicas рядом с базой заводятся реплики replica1..N
+    (settings.DATABASE_REPLICAS); заполняет их команда copy_replicas.
+    """
+    if PROJECT_DIR not in sys.path:
+        sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    import django
+    from django.conf import settings
+    from django.core.management import call_command
+
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+    settings.DATABASES['default']['NAME'] = db_path
+    # Кэш и метрики — рядом с базой бенчмарка, общие файлы сервера
+    # не трогаются.
+    directory = os.path.dirname(os.path.abspath(db_path))
+    settings.CACHES['default']['LOCATION'] = os.path.join(
+        directory, 'cache.sqlite3'
+    )
+    settings.METRICS_DIR = os.path.join(directory, 'metrics')
+    settings.DATABASE_REPLICAS = []
+    for number in range(1, replicas + 1):
+        alias = f'replica{number}'
+        settings.DATABASES[alias] = {
+            **settings.DATABASES['default'],
+            'NAME': f'{os.path.splitext(db_path)[0]}-{alias}.sqlite3',
+        }
+        settings.DATABASE_REPLICAS.append(alias)
+    django.setup()
+    call_command('migrate', verbosity=0)
+    return db_path
+
+
+def fill_posts(posts, users=100, groups=10, batch=10000):
+    """Быстро заполняет базу постами в обход ORM.
+
+    Даты публикации разнесены по последним годам, чтобы ключ
+    (pub_date, id) не совпадал с порядком вставки. Профили и счётчики
+    после вставки пересчитываются, как командой recount.
+    """
+    from django.db import connection, transaction
+
+    from posts import counters
+
+    now = datetime(2022, 11, 1)
+    rnd = random.Random(0)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO auth_user (password, is_superuser, username, '
+            'first_name, last_name, email, is_staff, is_active, '
+            "date_joined) VALUES ('', 0, %s, '', '', '', 0, 1, %s)",
+            [(f'user{i}', now) for i in range(users)],
+        )
+        cursor.executemany(
+            'INSERT INTO posts_group (title, slug, description, posts_count) '
+            'VALUES (%s, %s, %s, 0)',
+            [(f'Группа {i}', f'group-{i}', '') for i in range(groups)],
+        )
+        for start in range(0, posts, batch):
+            rows = []
+            for i in range(start, min(start + batch, posts)):
+                pub_date = now - timedelta(seconds=rnd.randrange(10 ** 8))
+                rows.append((
+                    f'Пост {i}',
+                    pub_date,
+                    rnd.randrange(users) + 1,
+                    rnd.randrange(groups) + 1,
+                    '',
+                    pub_date,
+                ))
+            cursor.executemany(
+                'INSERT INTO posts_post (text, pub_date, author_id, '
+                'group_id, image, comments_count, updated_at) '
+                'VALUES (%s, %s, %s, %s, %s, 0, %s)',
+                rows,
+            )
+        counters.rebuild()
+        cursor.execute('ANALYZE')
+
+
+def fill_follows(user_id, authors):
+    """Подписывает пользователя на authors первых авторов через ORM,
+    чтобы лента подписок заполнилась так же, как на сайте."""
+    from posts.models import Follow
+
+    for author_id in range(1, authors + 2):
+        if author_id != user_id:
+            Follow.objects.get_or_create(user_id=user_id, author_id=author_id)
+
+
+def measure(func, repeat=5):
+    """Медиана времени вызова func в миллисекундах."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def percentile(values, percent):
+    """Перцентиль с линейной интерполяцией между соседними значениями."""
+    values = sorted(values)
+    position = (len(values) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (
+        position - lower
+    )
+
+
+def print_table(header, rows):
+    widths = [
+        max(len(str(value)) for value in column)
+        for column in zip(header, *rows)
+    ]
+    for row in (header, *rows):
+        print('  '.join(
+            str(value).rjust(width) for value, width in zip(row, widths)
+        ))
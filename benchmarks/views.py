@@ -0,0 +1,230 @@
+"""Время ответа и число запросов к базе для каждого адреса posts.urls.
+
+    python -m benchmarks.views --posts 100000 --save results.json
+    python -m benchmarks.views --posts 100000 --baseline results.json
+
+Данные создаются генератором (команда generate_data) или берутся из
+готовой базы --db. Каждый адрес запрашивается тестовым клиентом Django
+от гостя и от автора поста: для обоих считаются p50, p95 и p99 времени
+ответа и число SQL-запросов. С --cold кэш очищается перед каждым
+запросом (вне замера).
+
+Подписка и отписка меняют базу, поэтому замеряются парой: перед каждым
+запросом обратный адрес (вне замера) возвращает состояние, которое
+замеряемый меняет, а после замера подписка автора становится такой же,
+как до него.
+
+С --baseline результаты сравниваются с сохранённым ранее --save: адрес,
+у которого выросло число запросов или p95 стал медленнее больше чем на
+--tolerance (и больше чем на NOISE_MS), считается регрессией, и бенчмарк
+завершается с кодом 1.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.utils import percentile, print_table, setup_django
+
+ROLES = ('guest', 'author')
+# Разница p95 меньше этой (мс) — шум, а не регрессия.
+NOISE_MS = 1.0
+# Адреса, которые меняют базу, и обратные им.
+INVERSE = {
+    'profile_follow': 'profile_unfollow',
+    'profile_unfollow': 'profile_follow',
+}
+
+
+def sample_kwargs():
+    """Аргументы адресов: пост, его группа и самый читаемый автор."""
+    from django.db.models import Count
+
+    from posts.models import Group, Post, User
+
+    post = Post.objects.filter(group__isnull=False).order_by('-pk').first()
+    if post is None:
+        sys.exit('В базе нет постов с группой.')
+    popular = User.objects.exclude(pk=post.author_id).annotate(
+        readers=Count('following')
+    ).order_by('-readers').first()
+    if popular is None:
+        sys.exit('В базе нет второго пользователя, кроме автора поста.')
+    return post, {
+        'post_id': post.pk,
+        'slug': Group.objects.get(pk=post.group_id).slug,
+        'username': popular.username,
+    }
+
+
+def targets(post, kwargs):
+    """Адреса всех маршрутов posts.urls по именам."""
+    from django.urls import reverse
+
+    from posts import urls
+
+    found = {}
+    for pattern in urls.urlpatterns:
+        name = pattern.name
+        url = reverse(
+            f'{urls.app_name}:{name}',
+            kwargs={key: kwargs[key] for key in pattern.pattern.converters},
+        )
+        if name == 'search':
+            url += '?q=' + post.text.split()[0].strip('.,')
+        found[name] = url
+    return found
+
+
+def run(url, client, repeat, cold, prepare=None):
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    if prepare:
+        client.get(prepare)
+    client.get(url)
+    timings = []
+    queries = []
+    status = None
+    for _ in range(repeat):
+        if prepare:
+            client.get(prepare)
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(len(context.captured_queries))
+        status = response.status_code
+    return {
+        'url': url,
+        'status': status,
+        'p50': percentile(timings, 50),
+        'p95': percentile(timings, 95),
+        'p99': percentile(timings, 99),
+        'queries': statistics.median(queries),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Строки сравнения с базовой линией и число регрессий."""
+    rows = []
+    regressions = 0
+    for key, result in results.items():
+        before = baseline.get(key)
+        if before is None:
+            rows.append((key, '-', f'{result["p95"]:.1f}', '-', '-', 'новый'))
+            continue
+        slower = (
+            result['p95'] > before['p95'] * (1 + tolerance)
+            and result['p95'] - before['p95'] > NOISE_MS
+        )
+        more_queries = result['queries'] > before['queries']
+        verdict = 'ok'
+        if slower or more_queries:
+            verdict = 'РЕГРЕССИЯ'
+            regressions += 1
+        rows.append((
+            key,
+            f'{before["p95"]:.1f}',
+            f'{result["p95"]:.1f}',
+            f'{before["queries"]:g}',
+            f'{result["queries"]:g}',
+            verdict,
+        ))
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--posts', type=int, default=100000)
+    parser.add_argument('--comments', type=int, default=200000)
+    parser.add_argument('--follows', type=int, default=20)
+    parser.add_argument('--images', type=float, default=0.1)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--cold', action='store_true')
+    parser.add_argument('--db', help='путь к уже заполненной базе')
+    parser.add_argument('--save', metavar='FILE')
+    parser.add_argument('--baseline', metavar='FILE')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    from django.conf import settings
+    from django.test import Client
+
+    from posts.generator import Generator
+    from posts.models import Follow
+
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['*']
+    settings.MEDIA_ROOT = tempfile.mkdtemp()
+    if not args.db:
+        Generator(
+            users=args.users,
+            posts=args.posts,
+            comments=args.comments,
+            follows=args.follows,
+            images=args.images,
+        ).run()
+    post, kwargs = sample_kwargs()
+    clients = {'guest': Client(), 'author': Client()}
+    clients['author'].force_login(post.author)
+    urls = targets(post, kwargs)
+    following = Follow.objects.filter(
+        user=post.author, author__username=kwargs['username']
+    ).exists()
+
+    results = {}
+    for name, url in urls.items():
+        prepare = urls.get(INVERSE.get(name))
+        for role in ROLES:
+            results[f'{name} {role}'] = run(
+                url, clients[role], args.repeat, args.cold, prepare
+            )
+        if prepare:
+            clients['author'].get(urls[
+                'profile_follow' if following else 'profile_unfollow'
+            ])
+    print_table(
+        ('адрес', 'роль', 'код', 'p50, мс', 'p95, мс', 'p99, мс', 'SQL'),
+        [
+            (*key.split(), result['status'], f'{result["p50"]:.1f}',
+             f'{result["p95"]:.1f}', f'{result["p99"]:.1f}',
+             f'{result["queries"]:g}')
+            for key, result in results.items()
+        ],
+    )
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as output:
+            json.dump({
+                'meta': {
+                    'python': platform.python_version(),
+                    'repeat': args.repeat,
+                    'cold': args.cold,
+                    'posts': args.posts,
+                    'db': args.db,
+                },
+                'results': results,
+            }, output, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as source:
+            baseline = json.load(source)['results']
+        rows, regressions = compare(results, baseline, args.tolerance)
+        print()
+        print_table(
+            ('адрес', 'p95 было', 'p95 стало', 'SQL было', 'SQL стало', ''),
+            rows,
+        )
+        if regressions:
+            sys.exit(f'Регрессий: {regressions}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""SQLite для продакшена: WAL и настройки соединения.
+
+Обычный бэкенд Django открывает базу в режиме отката (rollback journal):
+пока пишет один процесс, остальные не могут даже читать. Здесь при
+открытии соединения выполняются PRAGMA из PRAGMAS (их можно дополнить
+или заменить в OPTIONS['pragmas']): WAL, в котором читатели не мешают
+писателю, synchronous=NORMAL (в WAL надёжно и без fsync на каждую
+транзакцию), mmap и кэш страниц побольше.
+
+Транзакции atomic() начинаются с BEGIN (DEFERRED) и не ждут писателей,
+пока только читают. Блоки, которые точно пишут, открываются
+core.transactions.atomic_immediate(): BEGIN IMMEDIATE берёт блокировку
+записи сразу, и SQLite ждёт её по busy_timeout (OPTIONS['timeout'],
+секунд). Запросы вне транзакций ждут занятую базу тот же busy_timeout.
+
+Соединения переиспользуются между запросами по CONN_MAX_AGE.
+
+Однострочные результаты запоминаются на время запроса к сайту
+(core.memo, компилятор в compiler.py); любая запись и откат
+транзакции их забывают. INSERT, UPDATE и DELETE ещё и переводят
+запрос на чтение основной базы (core.routers.wrote).
+
+В соединении есть функция period_end(kind, value, tzname): начало
+следующего местного года, месяца или дня. По ней иерархия дат
+в админке (posts.admin.IndexedDatesQuerySet) идёт по индексу даты.
+"""
+from datetime import date, datetime, timedelta
+
+import pytz
+from django.db.backends import utils as backend_utils
+from django.db.backends.sqlite3 import base, operations
+from django.utils import timezone
+
+from core import memo, routers
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — размер в КиБ, а не в страницах.
+    'cache_size': -32 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+def period_end(kind, value, tzname):
+    """Начало года, месяца или дня (kind), следующего за value.
+
+    Периоды считаются в поясе tzname; value и результат — даты в том
+    виде, в каком они лежат в базе (в UTC, если tzname задан).
+    """
+    moment = backend_utils.typecast_timestamp(value)
+    zone = pytz.timezone(tzname) if tzname else None
+    if zone is not None:
+        moment = timezone.localtime(moment, zone)
+    day = moment.date()
+    if kind == 'year':
+        day = date(day.year + 1, 1, 1)
+    elif kind == 'month':
+        day = (day.replace(day=1) + timedelta(days=31)).replace(day=1)
+    else:
+        day += timedelta(days=1)
+    boundary = datetime.combine(day, datetime.min.time())
+    if zone is not None:
+        boundary = timezone.make_aware(boundary, zone, is_dst=False)
+        boundary = boundary.astimezone(pytz.utc).replace(tzinfo=None)
+    return str(boundary)
+
+
+def is_read(query):
+    return query.lstrip()[:6].upper() == 'SELECT'
+
+
+def is_write(query):
+    return query.lstrip()[:7].upper().startswith(
+        ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+    )
+
+
+class SQLiteCursorWrapper(base.SQLiteCursorWrapper):
+    def execute(self, query, params=None):
+        if not is_read(query):
+            memo.clear()
+            if is_write(query):
+                routers.wrote()
+        return super().execute(query, params)
+
+    def executemany(self, query, param_list):
+        memo.clear()
+        routers.wrote()
+        return super().executemany(query, param_list)
+
+
+class DatabaseOperations(operations.DatabaseOperations):
+    compiler_module = 'core.backends.sqlite3.compiler'
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    ops_class = DatabaseOperations
+    # Выставляет core.transactions.atomic_immediate().
+    begin_immediate = False
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = {**PRAGMAS, **params.pop('pragmas', {})}
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        connection.create_function('period_end', 3, period_end)
+        # Переход в WAL ждёт, пока другие соединения отпустят базу,
+        # по busy_timeout соединения.
+        for name, value in self.pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def create_cursor(self, name=None):
+        return self.connection.cursor(factory=SQLiteCursorWrapper)
+
+    def _rollback(self):
+        memo.clear()
+        return super()._rollback()
+
+    def _start_transaction_under_autocommit(self):
+        if self.begin_immediate:
+            self.cursor().execute('BEGIN IMMEDIATE')
+        else:
+            super()._start_transaction_under_autocommit()
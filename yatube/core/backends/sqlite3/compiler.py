@@ -0,0 +1,44 @@
+"""Компиляторы SQL, которые берут однострочные результаты из core.memo."""
+import sys
+
+from django.core.exceptions import EmptyResultSet
+from django.db.models.sql import compiler
+from django.db.models.sql.constants import MULTI, SINGLE
+
+from core import memo
+
+
+class SQLCompiler(compiler.SQLCompiler):
+    def execute_sql(self, result_type=MULTI, *args, **kwargs):
+        scope = memo.current()
+        if result_type != SINGLE or scope is None:
+            return super().execute_sql(result_type, *args, **kwargs)
+        try:
+            sql, params = self.as_sql()
+            key = (self.using, sql, tuple(params))
+            hash(key)
+        except (EmptyResultSet, TypeError):
+            return super().execute_sql(result_type, *args, **kwargs)
+        return scope.fetch(
+            key,
+            lambda: super(SQLCompiler, self).execute_sql(
+                result_type, *args, **kwargs
+            ),
+            sys._getframe(1),
+        )
+
+
+class SQLInsertCompiler(compiler.SQLInsertCompiler, SQLCompiler):
+    pass
+
+
+class SQLDeleteCompiler(compiler.SQLDeleteCompiler, SQLCompiler):
+    pass
+
+
+class SQLUpdateCompiler(compiler.SQLUpdateCompiler, SQLCompiler):
+    pass
+
+
+class SQLAggregateCompiler(compiler.SQLAggregateCompiler, SQLCompiler):
+    pass
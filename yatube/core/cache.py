@@ -0,0 +1,332 @@
+"""Кэш в файле SQLite, общий для всех процессов сервера на одной машине.
+
+LocMemCache держит свою копию в каждом воркере, и сброс поколений
+(posts.cache) до других воркеров не доходит. Здесь записи лежат в одном
+файле SQLite в режиме WAL: читатели не блокируют друг друга и писателя,
+incr выполняется в транзакции и атомарен между процессами.
+
+Размер ограничен числом записей (MAX_ENTRIES) и суммой размеров
+(MAX_SIZE, в байтах); при переполнении сначала удаляются просроченные
+записи, затем давно не читанные (LRU). Время последнего чтения
+обновляется не чаще раза в ACCESS_INTERVAL секунд, чтобы чтения
+не превращались в записи.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from . import metrics, timing
+
+# SQLite ограничивает число параметров запроса (999 в старых сборках).
+CHUNK = 900
+INT_SIZE = 8
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL,'
+    ' size INTEGER NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE TABLE IF NOT EXISTS cache_stats ('
+    ' id INTEGER PRIMARY KEY CHECK (id = 0),'
+    ' entries INTEGER NOT NULL,'
+    ' size INTEGER NOT NULL)',
+    'INSERT OR IGNORE INTO cache_stats VALUES (0, 0, 0)',
+    # Итоги ведут триггеры, чтобы проверка переполнения не считала
+    # всю таблицу на каждой записи.
+    'CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN'
+    ' UPDATE cache_stats SET entries = entries + 1, size = size + NEW.size;'
+    ' END',
+    'CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN'
+    ' UPDATE cache_stats SET entries = entries - 1, size = size - OLD.size;'
+    ' END',
+    'CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache'
+    ' BEGIN UPDATE cache_stats SET size = size - OLD.size + NEW.size; END',
+)
+
+
+def encode(value):
+    """Целые числа хранятся как есть, чтобы incr не распаковывал pickle."""
+    if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+        return value, INT_SIZE
+    data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    return sqlite3.Binary(data), len(data)
+
+
+def decode(value):
+    if isinstance(value, int):
+        return value
+    return pickle.loads(value)
+
+
+def is_expired(expires, now):
+    return expires is not None and expires <= now
+
+
+def chunks(items):
+    items = list(items)
+    for start in range(0, len(items), CHUNK):
+        yield items[start:start + CHUNK]
+
+
+def marks(items):
+    return ', '.join('?' * len(items))
+
+
+def count_reads(hits, misses):
+    timing.count('cache_hits', hits)
+    timing.count('cache_misses', misses)
+    if hits:
+        metrics.CACHE.inc(hits, result='hit')
+    if misses:
+        metrics.CACHE.inc(misses, result='miss')
+
+
+def timed(method):
+    """Время операции попадает в слагаемое cache (core.timing)."""
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        with timing.measure('cache'):
+            return method(*args, **kwargs)
+    return wrapper
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.max_size = int(options.get('MAX_SIZE', 64 * 1024 * 1024))
+        self.access_interval = float(options.get('ACCESS_INTERVAL', 1))
+        self.busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(
+            self.path, timeout=self.busy_timeout, isolation_level=None
+        )
+        db.execute('PRAGMA journal_mode = WAL')
+        db.execute('PRAGMA synchronous = NORMAL')
+        # Без этого INSERT OR REPLACE удаляет старую строку молча,
+        # и триггер cache_delete не поправит итоги.
+        db.execute('PRAGMA recursive_triggers = ON')
+        db.execute('BEGIN IMMEDIATE')
+        for statement in SCHEMA:
+            db.execute(statement)
+        db.execute('COMMIT')
+        return db
+
+    @property
+    def db(self):
+        # Соединение своё у каждого потока и у каждого процесса:
+        # после fork унаследованным соединением пользоваться нельзя.
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.connection = self._connect()
+            local.pid = os.getpid()
+        return local.connection
+
+    @contextmanager
+    def transaction(self):
+        db = self.db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _mark_accessed(self, rows, now):
+        keys = [
+            key for key, accessed in rows
+            if accessed < now - self.access_interval
+        ]
+        if not keys:
+            return
+        db = self.db
+        # База занята писателем — сразу сдаёмся: порядок LRU поправится
+        # при следующем чтении, а ждать ради него незачем.
+        db.execute('PRAGMA busy_timeout = 0')
+        try:
+            for chunk in chunks(keys):
+                db.execute(
+                    f'UPDATE cache SET accessed = ? '
+                    f'WHERE key IN ({marks(chunk)})',
+                    (now, *chunk),
+                )
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            db.execute(
+                f'PRAGMA busy_timeout = {int(self.busy_timeout * 1000)}'
+            )
+
+    def _cull(self, db, now):
+        entries, size = db.execute(
+            'SELECT entries, size FROM cache_stats'
+        ).fetchone()
+        if entries <= self._max_entries and size <= self.max_size:
+            return
+        db.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        if self._cull_frequency == 0:
+            db.execute('DELETE FROM cache')
+            return
+        while True:
+            entries, size = db.execute(
+                'SELECT entries, size FROM cache_stats'
+            ).fetchone()
+            if entries <= self._max_entries and size <= self.max_size:
+                return
+            db.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                (max(1, entries // self._cull_frequency),),
+            )
+
+    def _write(self, db, key, value, timeout, now):
+        value, size = encode(value)
+        db.execute(
+            'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)',
+            (key, value, self.get_backend_timeout(timeout), now,
+             size + len(key)),
+        )
+
+    @timed
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self.transaction() as db:
+            row = db.execute(
+                'SELECT expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None and not is_expired(row[0], now):
+                return False
+            self._write(db, key, value, timeout, now)
+            self._cull(db, now)
+        return True
+
+    @timed
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        row = self.db.execute(
+            'SELECT value, expires, accessed FROM cache WHERE key = ?',
+            (key,),
+        ).fetchone()
+        if row is None or is_expired(row[1], now):
+            count_reads(0, 1)
+            return default
+        count_reads(1, 0)
+        self._mark_accessed([(key, row[2])], now)
+        return decode(row[0])
+
+    @timed
+    def get_many(self, keys, version=None):
+        names = {self._key(key, version): key for key in keys}
+        now = time.time()
+        found, accessed = {}, []
+        for chunk in chunks(names):
+            rows = self.db.execute(
+                f'SELECT key, value, expires, accessed FROM cache '
+                f'WHERE key IN ({marks(chunk)})',
+                chunk,
+            )
+            for key, value, expires, last in rows:
+                if not is_expired(expires, now):
+                    found[names[key]] = decode(value)
+                    accessed.append((key, last))
+        count_reads(len(found), len(names) - len(found))
+        self._mark_accessed(accessed, now)
+        return found
+
+    @timed
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self.transaction() as db:
+            self._write(db, key, value, timeout, now)
+            self._cull(db, now)
+
+    @timed
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        with self.transaction() as db:
+            for key, value in data.items():
+                self._write(db, self._key(key, version), value, timeout, now)
+            self._cull(db, now)
+        return []
+
+    @timed
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        cursor = self.db.execute(
+            'UPDATE cache SET expires = ? '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, now),
+        )
+        return cursor.rowcount > 0
+
+    @timed
+    def incr(self, key, delta=1, version=None):
+        name = self._key(key, version)
+        now = time.time()
+        with self.transaction() as db:
+            row = db.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (name,)
+            ).fetchone()
+            if row is None or is_expired(row[1], now):
+                raise ValueError("Key '%s' not found" % key)
+            value = decode(row[0]) + delta
+            encoded, size = encode(value)
+            db.execute(
+                'UPDATE cache SET value = ?, size = ? WHERE key = ?',
+                (encoded, size + len(name), name),
+            )
+        return value
+
+    @timed
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        row = self.db.execute(
+            'SELECT 1 FROM cache '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    @timed
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        cursor = self.db.execute('DELETE FROM cache WHERE key = ?', (key,))
+        return cursor.rowcount > 0
+
+    @timed
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        with self.transaction() as db:
+            for chunk in chunks(keys):
+                db.execute(
+                    f'DELETE FROM cache WHERE key IN ({marks(chunk)})', chunk
+                )
+
+    @timed
+    def clear(self):
+        self.db.execute('DELETE FROM cache')
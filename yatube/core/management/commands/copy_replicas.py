@@ -0,0 +1,34 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.routers import PRIMARY
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в реплики DATABASE_REPLICAS '
+        '(для проверки чтения с реплик на своей машине).'
+    )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError(
+                'Реплик нет: задайте их число в YATUBE_REPLICAS.'
+            )
+        primary = connections[PRIMARY]
+        if primary.vendor != 'sqlite':
+            raise CommandError('Копировать можно только базу SQLite.')
+        primary.ensure_connection()
+        for alias in settings.DATABASE_REPLICAS:
+            # backup даёт согласованный снимок даже во время записи,
+            # а читатели реплики ждут, пока копия не закончится.
+            target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            if options['verbosity']:
+                self.stdout.write(f'{alias}: скопирована.')
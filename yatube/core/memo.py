@@ -0,0 +1,77 @@
+"""Одинаковые запросы к базе выполняются один раз за запрос к сайту.
+
+QueryMemoMiddleware (core.middleware) заводит Memo на время запроса,
+а компилятор бэкенда core.backends.sqlite3 берёт из него результаты
+однострочных запросов: count(), exists(), aggregate(). Ключ — база,
+SQL и параметры, так что один и тот же подсчёт во вьюхе и в шаблоне
+выполняется один раз.
+
+Любая запись (всё, что не SELECT) и откат транзакции очищают Memo
+целиком: после записи запросы снова идут в базу. Записи других
+процессов на время запроса не видны — как и при чтении одного снимка.
+
+При DEBUG Memo помнит, какие запросы и откуда не выполнены, и
+middleware пишет отчёт в лог core.memo.
+"""
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .queries import where
+
+_local = threading.local()
+
+
+class Memo:
+    def __init__(self, debug=False):
+        self.results = {}
+        self.debug = debug
+        self.hits = 0
+        self.skipped = Counter()
+
+    def fetch(self, key, execute, frame=None):
+        """Результат запроса key из памяти или от execute().
+
+        frame — кадр, с которого искать место запроса для отчёта.
+        """
+        if key in self.results:
+            self.hits += 1
+            if self.debug:
+                place = where(frame or sys._getframe(1))
+                self.skipped[key[1], place] += 1
+            return self.results[key]
+        result = self.results[key] = execute()
+        return result
+
+    def clear(self):
+        self.results.clear()
+
+    def report(self, limit=10):
+        """Невыполненные повторы по местам, начиная с частых."""
+        lines = [f'Повторов не выполнено: {self.hits}.']
+        for (sql, place), count in self.skipped.most_common(limit):
+            lines.append(f'{count:>4} × {place}')
+            lines.append(f'       {sql}')
+        return '\n'.join(lines)
+
+
+def current():
+    return getattr(_local, 'memo', None)
+
+
+def clear():
+    memo = current()
+    if memo is not None:
+        memo.clear()
+
+
+@contextmanager
+def request_scope():
+    memo = _local.memo = Memo(debug=settings.DEBUG)
+    try:
+        yield memo
+    finally:
+        _local.memo = None
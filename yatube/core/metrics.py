@@ -0,0 +1,362 @@
+"""Счётчики и гистограммы, общие для всех процессов сервера.
+
+Каждый процесс пишет значения в свой файл METRICS_DIR/<pid>.db,
+отображённый в память (mmap): запись — это сложение числа в памяти
+под локом потоков, без системных вызовов и без ожидания других
+процессов. Страница /metrics/ (core.views.metrics) читает файлы всех
+процессов, складывает одинаковые ряды и отдаёт их в текстовом формате
+Prometheus.
+
+Файл — заголовок (занятый размер) и записи подряд: длина ключа, ключ
+(JSON с именем ряда и метками) и значение double, выровненное по 8 байт.
+Новые записи только дописываются, поэтому читатель всегда видит
+целые записи.
+
+Значения процессов, которые уже завершились, collect переносит
+в общий файл merged.db, а их файлы удаляет: счётчики не убывают,
+а число файлов не растёт с каждым перезапуском воркеров.
+"""
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+INITIAL_SIZE = 64 * 1024
+HEADER = struct.Struct('<Q')
+LENGTH = struct.Struct('<I')
+VALUE = struct.Struct('<d')
+# Файл со значениями завершившихся процессов.
+MERGED = 'merged.db'
+
+REGISTRY = {}
+
+
+def aligned(offset):
+    return (offset + 7) // 8 * 8
+
+
+def read_entries(buffer):
+    """Пары (ключ, смещение значения) из содержимого файла."""
+    used = HEADER.unpack_from(buffer, 0)[0]
+    offset = HEADER.size
+    while offset < used:
+        length = LENGTH.unpack_from(buffer, offset)[0]
+        start = offset + LENGTH.size
+        key = bytes(buffer[start:start + length]).decode()
+        value_offset = aligned(start + length)
+        yield key, value_offset
+        offset = value_offset + VALUE.size
+
+
+class ProcessFile:
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.file = open(path, 'a+b')
+        size = os.fstat(self.file.fileno()).st_size
+        if size < INITIAL_SIZE:
+            self.file.truncate(INITIAL_SIZE)
+            size = INITIAL_SIZE
+        self.map = mmap.mmap(self.file.fileno(), size)
+        self.offsets = dict(read_entries(self.map))
+        self.used = max(HEADER.unpack_from(self.map, 0)[0], HEADER.size)
+
+    def append(self, key):
+        data = key.encode()
+        value_offset = aligned(self.used + LENGTH.size + len(data))
+        end = value_offset + VALUE.size
+        if end > len(self.map):
+            size = len(self.map)
+            while size < end:
+                size *= 2
+            self.file.truncate(size)
+            self.map.resize(size)
+        LENGTH.pack_into(self.map, self.used, len(data))
+        start = self.used + LENGTH.size
+        self.map[start:start + len(data)] = data
+        VALUE.pack_into(self.map, value_offset, 0.0)
+        # Размер меняется последним: читатель не увидит запись
+        # раньше, чем она дописана.
+        HEADER.pack_into(self.map, 0, end)
+        self.used = end
+        self.offsets[key] = value_offset
+        return value_offset
+
+    def add(self, key, amount):
+        with self.lock:
+            offset = self.offsets.get(key)
+            if offset is None:
+                offset = self.append(key)
+            value = VALUE.unpack_from(self.map, offset)[0]
+            VALUE.pack_into(self.map, offset, value + amount)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+_lock = threading.Lock()
+_file = None
+
+
+def process_file():
+    global _file
+    pid = os.getpid()
+    if _file is None or _file[0] != pid:
+        with _lock:
+            if _file is None or _file[0] != pid:
+                os.makedirs(settings.METRICS_DIR, exist_ok=True)
+                path = os.path.join(settings.METRICS_DIR, f'{pid}.db')
+                _file = (pid, ProcessFile(path))
+    return _file[1]
+
+
+@receiver(setting_changed)
+def reset_process_file(setting, **kwargs):
+    global _file
+    if setting == 'METRICS_DIR':
+        _file = None
+
+
+def read_values(path, totals):
+    """Прибавляет к totals значения из файла path."""
+    with open(path, 'rb') as source:
+        buffer = source.read()
+    if len(buffer) < HEADER.size:
+        return totals
+    for key, offset in read_entries(buffer):
+        value = VALUE.unpack_from(buffer, offset)[0]
+        totals[key] = totals.get(key, 0.0) + value
+    return totals
+
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def merge_dead(directory):
+    """Переносит значения завершившихся процессов в merged.db.
+
+    Новый merged.db пишется рядом и подменяет старый, после чего файлы
+    процессов удаляются. Вызывается под блокировкой merge.lock.
+    """
+    dead = [
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.endswith('.db') and name[:-3].isdigit()
+        and not alive(int(name[:-3]))
+    ]
+    if not dead:
+        return
+    merged = os.path.join(directory, MERGED)
+    totals = {}
+    for path in [merged, *dead]:
+        if os.path.exists(path):
+            read_values(path, totals)
+    temp_path = merged + '.tmp'
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    target = ProcessFile(temp_path)
+    for key, value in totals.items():
+        target.add(key, value)
+    target.close()
+    os.replace(temp_path, merged)
+    for path in dead:
+        os.remove(path)
+
+
+def collect():
+    """Суммы значений по всем файлам каталога METRICS_DIR."""
+    totals = {}
+    directory = settings.METRICS_DIR
+    if not os.path.isdir(directory):
+        return totals
+    # Чтения /metrics/ идут по очереди: иначе одно из них могло бы
+    # сложить файл процесса и merged.db, в который его уже перенесли.
+    with open(os.path.join(directory, 'merge.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        merge_dead(directory)
+        for name in os.listdir(directory):
+            if name.endswith('.db'):
+                read_values(os.path.join(directory, name), totals)
+    return totals
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\').replace(
+            '"', r'\"'
+        ).replace('\n', r'\n'))
+        for name, value in labels
+    ) + '}'
+
+
+def format_value(value):
+    return repr(int(value)) if value == int(value) else repr(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.keys = {}
+        REGISTRY[name] = self
+
+    def key(self, sample, labels):
+        """Ключ ряда в файле; собирается один раз на набор меток."""
+        cache_key = (sample, *labels.items())
+        key = self.keys.get(cache_key)
+        if key is None:
+            if set(labels) != set(self.labels) | ({'le'} & set(labels)):
+                raise ValueError(
+                    f'{self.name}: нужны метки {", ".join(self.labels)}'
+                )
+            key = json.dumps([sample, sorted(
+                (name, str(value)) for name, value in labels.items()
+            )], ensure_ascii=False)
+            self.keys[cache_key] = key
+        return key
+
+    def samples(self, totals):
+        """Строки (имя, метки, значение) ряда из собранных сумм."""
+        found = []
+        for key, value in totals.items():
+            sample, labels = json.loads(key)
+            if sample.startswith(self.name):
+                found.append((sample, [tuple(label) for label in labels],
+                              value))
+        return found
+
+    def expose(self, totals):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+        for sample, labels, value in self.samples(totals):
+            lines.append(
+                f'{sample}{format_labels(labels)} {format_value(value)}'
+            )
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        process_file().add(self.key(self.name, labels), amount)
+
+    def samples(self, totals):
+        return sorted(
+            sample for sample in super().samples(totals)
+            if sample[0] == self.name
+        )
+
+
+class Histogram(Metric):
+    """Гистограмма с постоянными границами корзин.
+
+    В файле хранится число наблюдений в каждой корзине отдельно,
+    а накопленные значения le, как их ждёт Prometheus, считаются
+    при выдаче.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets, labels=()):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        bucket = bisect_left(self.buckets, value)
+        target = process_file()
+        if bucket < len(self.buckets):
+            target.add(self.key(
+                f'{self.name}_bucket', {**labels, 'le': bucket}
+            ), 1)
+        target.add(self.key(f'{self.name}_sum', labels), value)
+        target.add(self.key(f'{self.name}_count', labels), 1)
+
+    def samples(self, totals):
+        series = {}
+        for sample, labels, value in super().samples(totals):
+            suffix = sample[len(self.name):]
+            if suffix not in ('_bucket', '_sum', '_count'):
+                continue
+            plain = tuple(label for label in labels if label[0] != 'le')
+            data = series.setdefault(plain, {
+                'buckets': [0.0] * len(self.buckets),
+                '_sum': 0.0,
+                '_count': 0.0,
+            })
+            if suffix == '_bucket':
+                data['buckets'][int(dict(labels)['le'])] += value
+            else:
+                data[suffix] += value
+        found = []
+        # Корзины идут по возрастанию границ, а не по алфавиту.
+        for labels, data in sorted(series.items()):
+            total = 0.0
+            for bound, value in zip(self.buckets, data['buckets']):
+                total += value
+                found.append((
+                    f'{self.name}_bucket',
+                    [*labels, ('le', format_value(bound))],
+                    total,
+                ))
+            found.append((
+                f'{self.name}_bucket', [*labels, ('le', '+Inf')],
+                data['_count'],
+            ))
+            found.append((f'{self.name}_sum', list(labels), data['_sum']))
+            found.append(
+                (f'{self.name}_count', list(labels), data['_count'])
+            )
+        return found
+
+
+def exposition():
+    """Все ряды в текстовом формате Prometheus."""
+    totals = collect()
+    lines = []
+    for metric in REGISTRY.values():
+        lines.extend(metric.expose(totals))
+    return '\n'.join(lines) + '\n'
+
+
+REQUESTS = Counter(
+    'yatube_requests_total',
+    'Ответы по имени адреса и коду.',
+    ('view', 'status'),
+)
+LATENCY = Histogram(
+    'yatube_request_duration_seconds',
+    'Время ответа по имени адреса, секунд.',
+    (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    ('view',),
+)
+QUERIES = Histogram(
+    'yatube_db_queries',
+    'Запросов к базе на ответ по имени адреса.',
+    (0, 1, 2, 5, 10, 20, 50, 100),
+    ('view',),
+)
+CACHE = Counter(
+    'yatube_cache_requests_total',
+    'Чтения кэша: hit — найдено, miss — нет.',
+    ('result',),
+)
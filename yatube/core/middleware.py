@@ -0,0 +1,181 @@
+"""Замеры запросов: метрики каждого ответа и Server-Timing для выборки.
+
+MetricsMiddleware считает каждый ответ в core.metrics: число ответов
+и время по имени адреса, число запросов к базе.
+
+ServerTimingMiddleware отдаёт заголовок Server-Timing и строку лога
+о том, на что ушло время запроса.
+
+ReplicaMiddleware включает чтение с реплик (core.routers) для запросов
+GET и HEAD и привязывает браузер к основной базе после записи.
+
+QueryMemoMiddleware выполняет одинаковые однострочные запросы
+(count(), exists()) один раз за запрос (core.memo), а при DEBUG пишет
+в лог core.memo, какие повторы не выполнены и откуда.
+
+Для доли запросов SERVER_TIMING_SAMPLE считаются время и число запросов
+к базе, время, попадания и промахи кэша, время отрисовки шаблонов
+и поиска миниатюр (core.timing). Итог отдаётся браузеру заголовком
+Server-Timing (виден во вкладке Network инструментов разработчика)
+и пишется строкой JSON в лог core.timing с уровнем INFO.
+
+Остальные запросы проходят без замеров, поэтому middleware можно
+держать включённым и в продакшене.
+"""
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+
+from . import memo, metrics, routers, timing
+
+logger = logging.getLogger('core.timing')
+memo_logger = logging.getLogger('core.memo')
+
+# Кука со временем (unix), до которого браузер читает основную базу.
+PIN_COOKIE = 'primary_until'
+SAFE_METHODS = ('GET', 'HEAD')
+
+# Слагаемые заголовка в порядке вывода.
+METRICS = ('db', 'cache', 'tpl', 'thumb')
+
+
+def header(timings, total):
+    # Значения заголовков HTTP — latin-1, поэтому описания по-английски.
+    descriptions = {
+        'db': f'{timings.counts["queries"]} queries',
+        'cache': (
+            f'{timings.counts["cache_hits"]} hits, '
+            f'{timings.counts["cache_misses"]} misses'
+        ),
+    }
+    parts = []
+    for name in METRICS:
+        part = f'{name};dur={timings.seconds[name] * 1000:.1f}'
+        if name in descriptions:
+            part += f';desc="{descriptions[name]}"'
+        parts.append(part)
+    parts.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(parts)
+
+
+def log_record(request, response, timings, total):
+    return {
+        'method': request.method,
+        'path': request.path,
+        'view': view_name(request),
+        'status': response.status_code,
+        'total_ms': round(total * 1000, 1),
+        'db_ms': round(timings.seconds['db'] * 1000, 1),
+        'queries': timings.counts['queries'],
+        'cache_ms': round(timings.seconds['cache'] * 1000, 1),
+        'cache_hits': timings.counts['cache_hits'],
+        'cache_misses': timings.counts['cache_misses'],
+        'tpl_ms': round(timings.seconds['tpl'] * 1000, 1),
+        'thumb_ms': round(timings.seconds['thumb'] * 1000, 1),
+    }
+
+
+def view_name(request):
+    match = request.resolver_match
+    return match.view_name if match else None
+
+
+class QueryCounter:
+    def __init__(self):
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = perf_counter()
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        # Адреса вне urls.py (404) идут одним рядом, чтобы случайные
+        # пути не плодили ряды.
+        view = view_name(request) or '-'
+        metrics.REQUESTS.inc(view=view, status=response.status_code)
+        metrics.LATENCY.observe(perf_counter() - start, view=view)
+        metrics.QUERIES.observe(counter.queries, view=view)
+        return response
+
+
+class ServerTimingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.SERVER_TIMING_SAMPLE:
+            return self.get_response(request)
+        start = perf_counter()
+        with timing.collect() as timings, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(timings.execute)
+                )
+            response = self.get_response(request)
+        total = perf_counter() - start
+        response['Server-Timing'] = header(timings, total)
+        record = log_record(request, response, timings, total)
+        logger.info(
+            json.dumps(record, ensure_ascii=False), extra={'timing': record}
+        )
+        return response
+
+
+def pinned(request):
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        replicas = request.method in SAFE_METHODS and not pinned(request)
+        with routers.request_scope(replicas) as state:
+            response = self.get_response(request)
+        if state.wrote or request.method not in SAFE_METHODS:
+            seconds = settings.REPLICA_PIN_SECONDS
+            response.set_cookie(
+                PIN_COOKIE,
+                str(int(time.time() + seconds) + 1),
+                max_age=seconds,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+class QueryMemoMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with memo.request_scope() as scope:
+            response = self.get_response(request)
+        if scope.skipped:
+            memo_logger.debug(
+                '%s %s\n%s', request.method, request.path, scope.report()
+            )
+        return response
@@ -0,0 +1,34 @@
+from django.db import models
+
+
+class Blob(models.Model):
+    """Уникальное содержимое файла в хранилище core.storage."""
+    digest = models.CharField('SHA-256', max_length=64, primary_key=True)
+    name = models.CharField('Путь в хранилище', max_length=255)
+    size = models.PositiveIntegerField('Размер')
+    refcount = models.PositiveIntegerField('Ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Содержимое файла'
+        verbose_name_plural = 'Содержимое файлов'
+
+    def __str__(self):
+        return self.digest
+
+
+class StoredFile(models.Model):
+    """Имя файла, под которым его знают модели, и его содержимое."""
+    name = models.CharField('Имя', max_length=255, primary_key=True)
+    blob = models.ForeignKey(
+        Blob,
+        on_delete=models.PROTECT,
+        related_name='files',
+        verbose_name='Содержимое',
+    )
+
+    class Meta:
+        verbose_name = 'Файл'
+        verbose_name_plural = 'Файлы'
+
+    def __str__(self):
+        return self.name
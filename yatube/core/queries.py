@@ -0,0 +1,81 @@
+"""SQL-запросы вместе с местом, откуда они сделаны.
+
+capture_queries() записывает каждый запрос к базе и строку шаблона, при
+отрисовке которой он выполнен, а если запрос сделан не из шаблона —
+строку кода проекта. QueryLog.report() группирует одинаковые запросы по
+месту, так что N+1 видно сразу: один и тот же SQL, повторённый
+на одной строке шаблона столько раз, сколько карточек на странице.
+"""
+import os
+import sys
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.template.base import Node
+
+# Каждый узел шаблона отрисовывается через Node.render_annotated.
+RENDER_CODE = Node.render_annotated.__code__
+THIS_FILE = os.path.abspath(__file__)
+# Код, через который проходит любой запрос, — не место запроса.
+INTERNAL = (
+    THIS_FILE,
+    os.path.join(os.path.dirname(THIS_FILE), 'memo.py'),
+    os.path.join(os.path.dirname(THIS_FILE), 'backends') + os.sep,
+)
+
+
+def project_file(filename):
+    filename = os.path.abspath(filename)
+    return (
+        filename.startswith(settings.BASE_DIR)
+        and not filename.startswith(INTERNAL)
+        and 'site-packages' not in filename
+    )
+
+
+def where(frame):
+    """Строка шаблона или кода проекта, ближайшая к запросу."""
+    code_line = None
+    while frame is not None:
+        if frame.f_code is RENDER_CODE:
+            node = frame.f_locals['self']
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                name = origin.template_name or origin.name
+                return f'{name}:{token.lineno}'
+        if code_line is None and project_file(frame.f_code.co_filename):
+            code_line = '{}:{}'.format(
+                os.path.relpath(frame.f_code.co_filename, settings.BASE_DIR),
+                frame.f_lineno,
+            )
+        frame = frame.f_back
+    return code_line or '?'
+
+
+class QueryLog(list):
+    """Список пар (SQL без параметров, место)."""
+
+    def __call__(self, execute, sql, params, many, context):
+        self.append((sql, where(sys._getframe(1))))
+        return execute(sql, params, many, context)
+
+    def report(self, limit=10):
+        """Самые частые запросы по местам, начиная с повторённых."""
+        counts = Counter(self)
+        lines = [f'Запросов: {len(self)}, разных: {len(counts)}.']
+        for (sql, place), count in counts.most_common(limit):
+            lines.append(f'{count:>4} × {place}')
+            lines.append(f'       {sql}')
+        if len(counts) > limit:
+            lines.append(f'… и ещё {len(counts) - limit} разных запросов.')
+        return '\n'.join(lines)
+
+
+@contextmanager
+def capture_queries(using=connection):
+    log = QueryLog()
+    with using.execute_wrapper(log):
+        yield log
@@ -0,0 +1,79 @@
+"""Чтение с реплик, запись в основную базу.
+
+ReplicaMiddleware (core.middleware) разрешает чтение с реплик
+DATABASE_REPLICAS только на время запросов GET и HEAD. Всё остальное
+(POST, команды manage.py, сигналы вне запросов) читает и пишет
+основную базу default.
+
+Реплики отстают от основной базы, поэтому после записи чтение
+возвращается к основной базе:
+- до конца того же запроса, с первой записи (wrote: её отмечает курсор
+  core.backends.sqlite3, когда выполняет INSERT, UPDATE или DELETE;
+  сам вопрос db_for_write, как в get_or_create или admin, запись
+  не означает);
+- на REPLICA_PIN_SECONDS секунд для того же браузера (кука PIN_COOKIE),
+  чтобы автор сразу увидел свой пост или комментарий.
+
+Сессии всегда читаются из основной базы: иначе только что вошедший
+пользователь мог бы не найти свою сессию на реплике.
+"""
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+
+PRIMARY = 'default'
+# Приложения, которые всегда читаются из основной базы.
+PRIMARY_APPS = ('sessions',)
+
+_state = threading.local()
+
+
+class RequestState:
+    def __init__(self, replicas):
+        self.replicas = replicas
+        self.wrote = False
+
+
+def wrote():
+    """Отмечает запись в базу: запрос дальше читает основную базу."""
+    state = getattr(_state, 'request', None)
+    if state is not None:
+        state.wrote = True
+        state.replicas = False
+
+
+@contextmanager
+def request_scope(replicas):
+    """Маршрутизация на время запроса; replicas — можно ли читать реплики."""
+    state = _state.request = RequestState(replicas)
+    try:
+        yield state
+    finally:
+        _state.request = None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = getattr(_state, 'request', None)
+        if (
+            state is None
+            or not state.replicas
+            or not settings.DATABASE_REPLICAS
+            or model._meta.app_label in PRIMARY_APPS
+        ):
+            return PRIMARY
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        # Явно: без ответа роутера Django пишет туда, откуда объект
+        # прочитан, то есть в реплику.
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Реплики — копии основной базы (команда copy_replicas).
+        return db == PRIMARY
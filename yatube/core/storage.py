@@ -0,0 +1,151 @@
+"""Хранилище, в котором одинаковое содержимое лежит на диске один раз.
+
+Файл сохраняется под обычным именем (например, posts/cat.jpg), но на диск
+пишется по SHA-256 содержимого: blobs/ab/cd/<digest>.jpg. Какое имя
+ссылается на какое содержимое, хранят модели core.models; у содержимого
+есть счётчик ссылок, и файл с диска удаляется, только когда на него
+не осталось имён.
+
+Имена, которых нет в таблице (файлы, загруженные до этого хранилища),
+обслуживаются как в FileSystemStorage, но никогда не удаляются.
+
+После удаления содержимого с диска посылается сигнал blob_removed
+(digest, name): по нему убирают то, что построено из содержимого,
+например миниатюры.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.dispatch import Signal
+from django.utils.deconstruct import deconstructible
+
+from .models import Blob, StoredFile
+from .transactions import atomic_immediate
+
+BLOBS = 'blobs'
+# Имя без записи в таблице кэшируется пустой строкой.
+LEGACY = ''
+
+# Аргументы: digest и name удалённого содержимого.
+blob_removed = Signal()
+
+
+def blob_name(digest, extension):
+    return f'{BLOBS}/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def cache_key(self, name):
+        return 'stored-file:' + hashlib.md5(name.encode()).hexdigest()
+
+    def resolve(self, name):
+        """Путь содержимого в хранилище или None для старых имён."""
+        key = self.cache_key(name)
+        found = cache.get(key)
+        if found is None:
+            found = StoredFile.objects.filter(name=name).values_list(
+                'blob__name', flat=True
+            ).first() or LEGACY
+            # В кэш попадает только зафиксированное: после отката
+            # транзакции имя не должно числиться занятым.
+            transaction.on_commit(lambda: cache.set(key, found, None))
+        return found or None
+
+    def digest(self, name):
+        """SHA-256 содержимого файла name, если он в этом хранилище."""
+        found = self.resolve(name)
+        if found is not None:
+            return os.path.splitext(os.path.basename(found))[0]
+
+    def path(self, name):
+        return super().path(self.resolve(name) or name)
+
+    def url(self, name):
+        return super().url(self.resolve(name) or name)
+
+    def exists(self, name):
+        return self.resolve(name) is not None or super().exists(name)
+
+    def write_blob(self, name, content):
+        # Пишем рядом и переименовываем: параллельная загрузка того же
+        # содержимого видит либо целый файл, либо никакого.
+        full_path = super().path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(handle, 'wb') as output:
+                for chunk in content.chunks():
+                    output.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+            os.replace(temp_path, full_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def _save(self, name, content):
+        sha = hashlib.sha256()
+        size = 0
+        for chunk in content.chunks():
+            sha.update(chunk)
+            size += len(chunk)
+        digest = sha.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        with atomic_immediate():
+            try:
+                with transaction.atomic():
+                    blob, _ = Blob.objects.get_or_create(
+                        digest=digest,
+                        defaults={
+                            'name': blob_name(digest, extension),
+                            'size': size,
+                        },
+                    )
+            except IntegrityError:
+                blob = Blob.objects.get(digest=digest)
+            if not os.path.exists(super().path(blob.name)):
+                content.seek(0)
+                self.write_blob(blob.name, content)
+            StoredFile.objects.create(name=name, blob=blob)
+            Blob.objects.filter(pk=digest).update(refcount=F('refcount') + 1)
+        self.forget(name)
+        return name
+
+    def forget(self, name):
+        key = self.cache_key(name)
+        cache.delete(key)
+        transaction.on_commit(lambda: cache.delete(key))
+
+    def delete(self, name):
+        with atomic_immediate():
+            stored = StoredFile.objects.select_related('blob').filter(
+                name=name
+            ).first()
+            if stored is None:
+                return
+            stored.delete()
+            blob = stored.blob
+            Blob.objects.filter(
+                pk=blob.pk, refcount__gt=0
+            ).update(refcount=F('refcount') - 1)
+            if Blob.objects.filter(pk=blob.pk, refcount=0).delete()[0]:
+                transaction.on_commit(
+                    lambda: self.remove_blob(blob.pk, blob.name)
+                )
+            self.forget(name)
+
+    def remove_blob(self, digest, name):
+        # Пока шла транзакция, то же содержимое могли загрузить заново.
+        if not Blob.objects.filter(pk=digest).exists():
+            try:
+                os.remove(super().path(name))
+            except FileNotFoundError:
+                pass
+            blob_removed.send(type(self), digest=digest, name=name)
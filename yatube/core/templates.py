@@ -0,0 +1,23 @@
+"""Шаблонный бэкенд Django, время отрисовки которого учитывает core.timing.
+
+Замеряется только верхний шаблон: include и extends рисуются внутри него,
+а шаблоны, отрисованные из тегов (render_to_string карточек постов),
+вкладываются в его замер и второй раз не считаются (core.timing).
+"""
+from django.template.backends import django
+
+from . import timing
+
+
+class Template(django.Template):
+    def render(self, context=None, request=None):
+        with timing.measure('tpl'):
+            return super().render(context, request)
+
+
+class DjangoTemplates(django.DjangoTemplates):
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
@@ -0,0 +1,215 @@
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.test import SimpleTestCase
+
+from core.cache import SQLiteCache
+
+
+def make_cache(path, **options):
+    return SQLiteCache(path, {'OPTIONS': options})
+
+
+def incr_many(path, times):
+    cache = make_cache(path)
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class Unpicklable:
+    def __reduce__(self):
+        raise TypeError('unpicklable')
+
+
+class SQLiteCacheContractTests(SimpleTestCase):
+    """Поведение, которого Django ждёт от любого бэкенда кэша."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'cache.sqlite3')
+        self.cache = make_cache(self.path, MAX_ENTRIES=10000)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_simple(self):
+        self.cache.set('key', 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertIsNone(self.cache.get('missing'))
+        self.assertEqual(self.cache.get('missing', 'default'), 'default')
+
+    def test_add(self):
+        self.assertTrue(self.cache.add('key', 'value'))
+        self.assertFalse(self.cache.add('key', 'new value'))
+        self.assertEqual(self.cache.get('key'), 'value')
+
+    def test_add_replaces_expired(self):
+        self.cache.set('key', 'value', 0)
+        self.assertTrue(self.cache.add('key', 'new value'))
+        self.assertEqual(self.cache.get('key'), 'new value')
+
+    def test_prefix_and_versions(self):
+        other = SQLiteCache(self.path, {'KEY_PREFIX': 'other'})
+        self.cache.set('key', 'value')
+        self.cache.set('key', 'second', version=2)
+        self.assertIsNone(other.get('key'))
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(self.cache.get('key', version=2), 'second')
+        self.assertEqual(self.cache.incr_version('key'), 2)
+        self.assertEqual(self.cache.get('key', version=2), 'value')
+
+    def test_many(self):
+        self.assertEqual(self.cache.set_many({'a': 1, 'b': 'b', 'c': 3}), [])
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'missing']), {'a': 1, 'b': 'b'}
+        )
+        self.cache.delete_many(['a', 'b'])
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']), {'c': 3})
+
+    def test_get_many_large_batch(self):
+        data = {f'key{i}': i for i in range(2000)}
+        self.cache.set_many(data)
+        self.assertEqual(self.cache.get_many(data), data)
+
+    def test_delete_and_has_key(self):
+        self.cache.set('key', 'value')
+        self.assertTrue(self.cache.has_key('key'))
+        self.assertTrue(self.cache.delete('key'))
+        self.assertFalse(self.cache.delete('key'))
+        self.assertFalse(self.cache.has_key('key'))
+        self.assertNotIn('key', self.cache)
+
+    def test_clear(self):
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.cache.clear()
+        self.assertEqual(self.cache.get_many(['a', 'b']), {})
+
+    def test_incr_decr(self):
+        self.cache.set('answer', 41)
+        self.assertEqual(self.cache.incr('answer'), 42)
+        self.assertEqual(self.cache.incr('answer', 10), 52)
+        self.assertEqual(self.cache.decr('answer', 52), 0)
+        self.assertEqual(self.cache.get('answer'), 0)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        with self.assertRaises(ValueError):
+            self.cache.decr('missing')
+
+    def test_incr_beyond_int64(self):
+        self.cache.set('big', 2 ** 63 - 1)
+        self.assertEqual(self.cache.incr('big'), 2 ** 63)
+        self.assertEqual(self.cache.incr('big'), 2 ** 63 + 1)
+
+    def test_data_types(self):
+        values = {
+            'string': 'строка',
+            'bytes': b'\x00\xff',
+            'bool': True,
+            'float': 1.5,
+            'none': None,
+            'dict': {'a': [1, 2, (3, 4)]},
+            'large': 'x' * 2 ** 20,
+        }
+        for key, value in values.items():
+            with self.subTest(key=key):
+                self.cache.set(key, value)
+                self.assertEqual(self.cache.get(key), value)
+                self.assertIs(type(self.cache.get(key)), type(value))
+
+    def test_unpicklable_value_keeps_old_one(self):
+        self.cache.set('key', 'value')
+        with self.assertRaises(TypeError):
+            self.cache.set('key', Unpicklable())
+        self.assertEqual(self.cache.get('key'), 'value')
+
+    def test_expiration(self):
+        self.cache.set('expired', 'value', 0)
+        self.cache.set('short', 'value', 1)
+        self.cache.set('forever', 'value', None)
+        self.assertIsNone(self.cache.get('expired'))
+        self.assertFalse(self.cache.has_key('expired'))
+        time.sleep(1.1)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertEqual(self.cache.get('forever'), 'value')
+
+    def test_touch(self):
+        self.cache.set('key', 'value', 1)
+        self.assertTrue(self.cache.touch('key', None))
+        self.assertFalse(self.cache.touch('missing'))
+        time.sleep(1.1)
+        self.assertEqual(self.cache.get('key'), 'value')
+
+    def test_get_or_set(self):
+        self.assertEqual(
+            self.cache.get_or_set('key', lambda: 'value'), 'value'
+        )
+        self.assertEqual(self.cache.get_or_set('key', 'other'), 'value')
+
+    def test_shared_between_instances(self):
+        make_cache(self.path).set('key', 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+
+
+class SQLiteCacheLimitsTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'cache.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_lru_eviction(self):
+        cache = make_cache(
+            self.path, MAX_ENTRIES=3, CULL_FREQUENCY=3, ACCESS_INTERVAL=0
+        )
+        for key in 'abc':
+            cache.set(key, key)
+        cache.get('a')
+        cache.set('d', 'd')
+        self.assertEqual(
+            sorted(cache.get_many('abcd')), ['a', 'c', 'd']
+        )
+
+    def test_size_cap(self):
+        cache = make_cache(self.path, MAX_SIZE=100 * 1024)
+        for i in range(20):
+            cache.set(f'key{i}', os.urandom(10 * 1024))
+        entries, size = cache.db.execute(
+            'SELECT entries, size FROM cache_stats'
+        ).fetchone()
+        self.assertLessEqual(size, 100 * 1024)
+        self.assertEqual(
+            (entries, size),
+            cache.db.execute(
+                'SELECT COUNT(*), TOTAL(size) FROM cache'
+            ).fetchone(),
+        )
+        self.assertIsNotNone(cache.get('key19'))
+
+    def test_cull_everything(self):
+        cache = make_cache(self.path, MAX_ENTRIES=2, CULL_FREQUENCY=0)
+        cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(cache.get_many('abc'), {})
+
+    def test_read_does_not_wait_for_writer(self):
+        cache = make_cache(self.path, ACCESS_INTERVAL=0)
+        cache.set('key', 'value')
+        writer = make_cache(self.path)
+        writer.db.execute('BEGIN IMMEDIATE')
+        try:
+            started = time.monotonic()
+            self.assertEqual(cache.get('key'), 'value')
+            self.assertEqual(cache.get_many(['key']), {'key': 'value'})
+            self.assertLess(time.monotonic() - started, 1)
+        finally:
+            writer.db.execute('ROLLBACK')
+
+    def test_incr_is_atomic_across_processes(self):
+        cache = make_cache(self.path)
+        cache.set('counter', 0)
+        with ProcessPoolExecutor(4) as pool:
+            list(pool.map(incr_many, [self.path] * 4, [50] * 4))
+        self.assertEqual(cache.get('counter'), 200)
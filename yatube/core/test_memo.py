@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from core.middleware import QueryMemoMiddleware
+from posts.models import Post
+
+User = get_user_model()
+
+
+class QueryMemoTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Author')
+        Post.objects.create(text='Тестовый текст', author=cls.user)
+
+    def run_request(self, view):
+        return QueryMemoMiddleware(view)(RequestFactory().get('/'))
+
+    def test_repeated_queries_run_once(self):
+        """Одинаковые count() и exists() за запрос выполняются один раз"""
+        results = []
+
+        def view(request):
+            for _ in range(2):
+                results.append(Post.objects.count())
+                results.append(Post.objects.filter(author=self.user).exists())
+            return HttpResponse()
+
+        with self.assertNumQueries(2):
+            self.run_request(view)
+        self.assertEqual(results, [1, True, 1, True])
+
+    def test_write_clears_memo(self):
+        """После записи подсчёт выполняется заново"""
+        results = []
+
+        def view(request):
+            results.append(Post.objects.count())
+            Post.objects.create(text='Новый пост', author=self.user)
+            results.append(Post.objects.count())
+            return HttpResponse()
+
+        self.run_request(view)
+        self.assertEqual(results, [1, 2])
+
+    def test_outside_request_not_memoized(self):
+        """Вне запроса к сайту каждый подсчёт идёт в базу"""
+        with self.assertNumQueries(2):
+            Post.objects.count()
+            Post.objects.count()
+
+    @override_settings(DEBUG=True)
+    def test_debug_report(self):
+        """При DEBUG в лог попадает невыполненный повтор и его место"""
+        def view(request):
+            Post.objects.count()
+            Post.objects.count()
+            return HttpResponse()
+
+        with self.assertLogs('core.memo', 'DEBUG') as logs:
+            self.run_request(view)
+        self.assertIn('Повторов не выполнено: 1.', logs.output[0])
+        self.assertRegex(logs.output[0], r'1 × core/test_memo\.py:\d+')
@@ -0,0 +1,102 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+
+from core import metrics
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        override = override_settings(METRICS_DIR=self.directory)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(shutil.rmtree, self.directory)
+        cache.clear()
+
+    def scrape(self):
+        response = Client().get('/metrics/')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode().splitlines()
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Корзины гистограммы накапливаются, +Inf равна числу наблюдений"""
+        histogram = metrics.Histogram(
+            'test_seconds', 'Тест.', (0.1, 1), ('view',)
+        )
+        self.addCleanup(metrics.REGISTRY.pop, 'test_seconds')
+        for value in (0.05, 0.5, 0.7, 3):
+            histogram.observe(value, view='x')
+        self.assertEqual(histogram.expose(metrics.collect())[2:], [
+            'test_seconds_bucket{view="x",le="0.1"} 1',
+            'test_seconds_bucket{view="x",le="1"} 3',
+            'test_seconds_bucket{view="x",le="+Inf"} 4',
+            'test_seconds_sum{view="x"} 4.25',
+            'test_seconds_count{view="x"} 4',
+        ])
+
+    @skipUnless(hasattr(os, 'fork'), 'нужен fork')
+    def test_processes_are_summed(self):
+        """Значения разных процессов складываются"""
+        counter = metrics.Counter('test_total', 'Тест.', ('kind',))
+        self.addCleanup(metrics.REGISTRY.pop, 'test_total')
+        counter.inc(kind='a')
+        child = multiprocessing.get_context('fork').Process(
+            target=counter.inc, args=(2,), kwargs={'kind': 'a'}
+        )
+        child.start()
+        child.join()
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+        self.assertIn('test_total{kind="a"} 3', counter.expose(
+            metrics.collect()
+        ))
+
+    @skipUnless(hasattr(os, 'fork'), 'нужен fork')
+    def test_dead_processes_are_merged(self):
+        """Файлы завершившихся процессов сливаются в один, суммы целы"""
+        counter = metrics.Counter('test_total', 'Тест.', ('kind',))
+        self.addCleanup(metrics.REGISTRY.pop, 'test_total')
+        counter.inc(kind='a')
+        context = multiprocessing.get_context('fork')
+        for amount in (2, 3):
+            child = context.Process(
+                target=counter.inc, args=(amount,), kwargs={'kind': 'a'}
+            )
+            child.start()
+            child.join()
+        for _ in range(2):
+            self.assertIn('test_total{kind="a"} 6', counter.expose(
+                metrics.collect()
+            ))
+        self.assertEqual(
+            sorted(name for name in os.listdir(self.directory)
+                   if name.endswith('.db')),
+            sorted([f'{os.getpid()}.db', metrics.MERGED]),
+        )
+
+    def test_requests_are_recorded(self):
+        """Ответы, время, запросы к базе и чтения кэша видны в /metrics/"""
+        Client().get('/')
+        lines = self.scrape()
+        self.assertIn(
+            'yatube_requests_total{status="200",view="posts:index"} 1', lines
+        )
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 1',
+            lines,
+        )
+        self.assertIn('# TYPE yatube_db_queries histogram', lines)
+        self.assertTrue(any(
+            line.startswith('yatube_cache_requests_total{result="miss"}')
+            for line in lines
+        ))
+
+    def test_only_allowed_addresses(self):
+        """Чужому адресу /metrics/ не отдаётся"""
+        response = Client().get('/metrics/', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 403)
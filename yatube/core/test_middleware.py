@@ -0,0 +1,58 @@
+import json
+import re
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+
+METRIC = re.compile(r'(\w+);dur=([\d.]+)(?:;desc="([^"]*)")?')
+
+
+@override_settings(SERVER_TIMING_SAMPLE=1)
+class ServerTimingTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def metrics(self, response):
+        return {
+            name: (float(duration), description)
+            for name, duration, description
+            in METRIC.findall(response['Server-Timing'])
+        }
+
+    def test_header_lists_parts(self):
+        """Заголовок содержит базу, кэш, шаблоны, миниатюры и итог"""
+        metrics = self.metrics(self.client.get('/'))
+        self.assertEqual(
+            list(metrics), ['db', 'cache', 'tpl', 'thumb', 'total']
+        )
+        self.assertGreater(metrics['tpl'][0], 0)
+        self.assertGreaterEqual(metrics['total'][0], metrics['tpl'][0])
+        self.assertRegex(metrics['db'][1], r'^[1-9]\d* queries$')
+
+    def test_cache_hits_and_misses(self):
+        """Повторный запрос страницы попадает в кэш и не ходит в базу"""
+        first = self.metrics(self.client.get('/'))
+        self.assertNotIn(' 0 misses', ' ' + first['cache'][1])
+        second = self.metrics(self.client.get('/'))
+        self.assertEqual(second['db'][1], '0 queries')
+        self.assertRegex(second['cache'][1], r'^[1-9]\d* hits, 0 misses$')
+
+    def test_structured_log(self):
+        """Замер пишется в лог core.timing строкой JSON"""
+        with self.assertLogs('core.timing', 'INFO') as logs:
+            self.client.get('/')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record, logs.records[0].timing)
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+
+    @override_settings(SERVER_TIMING_SAMPLE=0)
+    def test_unsampled_request_is_not_measured(self):
+        """Запрос вне выборки проходит без заголовка и лога"""
+        with mock.patch('core.middleware.logger') as logger:
+            response = self.client.get('/')
+        self.assertNotIn('Server-Timing', response)
+        logger.info.assert_not_called()
@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.template import Context, Template
+from django.template.base import UNKNOWN_SOURCE
+from django.test import TestCase
+
+from core.queries import capture_queries
+
+User = get_user_model()
+
+
+class CaptureQueriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for number in range(3):
+            User.objects.create_user(username=f'user{number}')
+
+    def test_template_queries_grouped_by_line(self):
+        """Запрос на каждой итерации цикла собирается в одну строку отчёта"""
+        template = Template(
+            '{% for user in users %}\n{{ user.groups.count }}\n{% endfor %}'
+        )
+        users = list(User.objects.all())
+        with capture_queries() as queries:
+            template.render(Context({'users': users}))
+        self.assertEqual(len(queries), 3)
+        self.assertEqual({place for _, place in queries}, {
+            f'{UNKNOWN_SOURCE}:2'
+        })
+        self.assertIn(f'   3 × {UNKNOWN_SOURCE}:2', queries.report())
+
+    def test_code_queries_point_to_project_line(self):
+        """Запрос вне шаблона указывает на строку кода проекта"""
+        with capture_queries() as queries:
+            User.objects.count()
+        (_, place), = queries
+        self.assertRegex(place, r'^core/test_queries\.py:\d+$')
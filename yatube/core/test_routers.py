@@ -0,0 +1,104 @@
+import time
+
+from django.contrib.sessions.models import Session
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, override_settings,
+)
+
+from core import routers
+from core.middleware import PIN_COOKIE, ReplicaMiddleware
+from core.routers import ReplicaRouter
+from posts.models import Group, Post
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_PIN_SECONDS=5)
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def run_request(self, request, write=False):
+        """Куда читает запрос до и после записи и его ответ."""
+        reads = []
+
+        def view(request):
+            reads.append(self.router.db_for_read(Post))
+            reads.append(self.router.db_for_read(Session))
+            if write:
+                routers.wrote()
+                reads.append(self.router.db_for_read(Post))
+            return HttpResponse()
+
+        return reads, ReplicaMiddleware(view)(request)
+
+    def test_outside_request_reads_primary(self):
+        """Вне запроса всё читается из основной базы"""
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+
+    def test_get_reads_replica(self):
+        """GET читает реплику, сессии — из основной базы, куки нет"""
+        reads, response = self.run_request(self.factory.get('/'))
+        self.assertEqual(reads, ['replica1', 'default'])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_write_pins_primary(self):
+        """После записи запрос и браузер читают основную базу"""
+        reads, response = self.run_request(self.factory.get('/'), write=True)
+        self.assertEqual(reads, ['replica1', 'default', 'default'])
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 5)
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = response.cookies[PIN_COOKIE].value
+        reads, _ = self.run_request(request)
+        self.assertEqual(reads[0], 'default')
+
+    def test_expired_pin_reads_replica(self):
+        """Истёкшая привязка к основной базе не действует"""
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = str(int(time.time()) - 1)
+        reads, _ = self.run_request(request)
+        self.assertEqual(reads[0], 'replica1')
+
+    def test_post_reads_primary(self):
+        """POST читает основную базу и привязывает к ней браузер"""
+        reads, response = self.run_request(self.factory.post('/'))
+        self.assertEqual(reads, ['default', 'default'])
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        """Без реплик всё идёт в основную базу и куки не ставятся"""
+        reads, response = self.run_request(self.factory.get('/'), write=True)
+        self.assertEqual(reads, ['default', 'default', 'default'])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_PIN_SECONDS=5)
+class ReplicaWriteTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Group.objects.create(title='Группа', slug='group')
+
+    def run_request(self, slug):
+        """Ответ на GET, который ищет или создаёт группу slug."""
+        reads = []
+
+        def view(request):
+            Group.objects.get_or_create(slug=slug, defaults={'title': slug})
+            reads.append(ReplicaRouter().db_for_read(Post))
+            return HttpResponse()
+
+        return reads, ReplicaMiddleware(view)(RequestFactory().get('/'))
+
+    def test_get_or_create_existing_does_not_pin(self):
+        """get_or_create найденной записи оставляет чтение на реплике"""
+        reads, response = self.run_request('group')
+        self.assertEqual(reads, ['replica1'])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_get_or_create_new_pins(self):
+        """get_or_create, создавший запись, привязывает к основной базе"""
+        reads, response = self.run_request('new')
+        self.assertEqual(reads, ['default'])
+        self.assertIn(PIN_COOKIE, response.cookies)
@@ -0,0 +1,100 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+
+from django.db import OperationalError, connections, transaction
+from django.test import SimpleTestCase
+
+from core.transactions import atomic_immediate
+
+ALIAS = 'tuned_sqlite'
+
+
+class TunedSQLiteTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'test.sqlite3')
+        sqlite3.connect(self.path).execute('CREATE TABLE t (x INTEGER)')
+
+    def connect(self, **options):
+        connections.databases[ALIAS] = {
+            'ENGINE': 'core.backends.sqlite3',
+            'NAME': self.path,
+            'OPTIONS': options,
+        }
+        connections.ensure_defaults(ALIAS)
+        self.addCleanup(connections.databases.pop, ALIAS)
+        connection = connections[ALIAS]
+        self.addCleanup(connections.__delitem__, ALIAS)
+        self.addCleanup(connection.close)
+        return connection
+
+    def pragma(self, connection, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def locked(self):
+        """Сторонний писатель, который держит базу, пока его не отпустят."""
+        other = sqlite3.connect(
+            self.path, isolation_level=None, check_same_thread=False
+        )
+        other.execute('BEGIN IMMEDIATE')
+        self.addCleanup(other.close)
+        return other
+
+    def test_pragmas_on_connect(self):
+        """Соединение открывается в WAL с настройками PRAGMAS"""
+        connection = self.connect(pragmas={'cache_size': -1024})
+        self.assertEqual(self.pragma(connection, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(connection, 'synchronous'), 1)
+        self.assertEqual(
+            self.pragma(connection, 'mmap_size'), 256 * 1024 * 1024
+        )
+        self.assertEqual(self.pragma(connection, 'cache_size'), -1024)
+
+    def test_atomic_is_deferred(self):
+        """atomic() не берёт блокировку записи, пока только читает"""
+        connection = self.connect(timeout=0.05)
+        connection.ensure_connection()
+        other = self.locked()
+        with transaction.atomic(using=ALIAS):
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT COUNT(*) FROM t')
+        other.execute('COMMIT')
+
+    def test_atomic_immediate_takes_write_lock(self):
+        """atomic_immediate() сразу берёт блокировку записи"""
+        connection = self.connect()
+        connection.ensure_connection()
+        other = sqlite3.connect(self.path, timeout=0)
+        self.addCleanup(other.close)
+        with atomic_immediate(using=ALIAS):
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT COUNT(*) FROM t')
+            with self.assertRaises(sqlite3.OperationalError):
+                other.execute('INSERT INTO t VALUES (1)')
+        with transaction.atomic(using=ALIAS):
+            other.execute('INSERT INTO t VALUES (1)')
+
+    def test_busy_database_is_awaited(self):
+        """Запрос к занятой базе ждёт её до timeout"""
+        connection = self.connect(timeout=5)
+        connection.ensure_connection()
+        other = self.locked()
+        threading.Timer(0.2, other.execute, ('COMMIT',)).start()
+        with connection.cursor() as cursor:
+            cursor.execute('INSERT INTO t VALUES (%s)', [1])
+        self.assertEqual(self.pragma(connection, 'journal_mode'), 'wal')
+
+    def test_busy_database_gives_up(self):
+        """Через timeout секунд ошибка всё же поднимается"""
+        connection = self.connect(timeout=0.05)
+        connection.ensure_connection()
+        self.locked()
+        with self.assertRaises(OperationalError):
+            with connection.cursor() as cursor:
+                cursor.execute('INSERT INTO t VALUES (%s)', [1])
@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TransactionTestCase
+
+from core.models import Blob, StoredFile
+from core.storage import ContentAddressedStorage
+
+
+class ContentAddressedStorageTests(TransactionTestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.storage = ContentAddressedStorage(location=self.location)
+        cache.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.location)
+
+    def test_same_content_stored_once(self):
+        """Одинаковое содержимое под разными именами лежит один раз"""
+        first = self.storage.save('posts/a.jpg', ContentFile(b'meme'))
+        second = self.storage.save('posts/b.jpg', ContentFile(b'meme'))
+        self.assertEqual((first, second), ('posts/a.jpg', 'posts/b.jpg'))
+        self.assertEqual(self.storage.path(first), self.storage.path(second))
+        blob = Blob.objects.get()
+        self.assertEqual(blob.refcount, 2)
+        self.assertRegex(blob.name, r'^blobs/(\w\w)/(\w\w)/\1\2\w{60}\.jpg$')
+        with self.storage.open(second) as stored:
+            self.assertEqual(stored.read(), b'meme')
+        self.assertEqual(self.storage.url(first), '/media/' + blob.name)
+
+    def test_taken_name_gets_new_one(self):
+        """Занятое имя не перезаписывается"""
+        self.storage.save('posts/a.jpg', ContentFile(b'one'))
+        name = self.storage.save('posts/a.jpg', ContentFile(b'two'))
+        self.assertNotEqual(name, 'posts/a.jpg')
+        with self.storage.open('posts/a.jpg') as stored:
+            self.assertEqual(stored.read(), b'one')
+
+    def test_blob_removed_with_last_reference(self):
+        """Файл удаляется с диска вместе с последним именем"""
+        self.storage.save('posts/a.jpg', ContentFile(b'meme'))
+        self.storage.save('posts/b.jpg', ContentFile(b'meme'))
+        path = self.storage.path('posts/a.jpg')
+        self.storage.delete('posts/a.jpg')
+        self.assertTrue(os.path.exists(path))
+        self.assertFalse(self.storage.exists('posts/a.jpg'))
+        self.assertEqual(Blob.objects.get().refcount, 1)
+        self.storage.delete('posts/b.jpg')
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(StoredFile.objects.exists())
+
+    def test_legacy_file_is_served_but_never_deleted(self):
+        """Файлы, сохранённые до хранилища, читаются и не удаляются"""
+        os.makedirs(os.path.join(self.location, 'posts'))
+        path = os.path.join(self.location, 'posts', 'old.jpg')
+        with open(path, 'wb') as legacy:
+            legacy.write(b'old')
+        self.assertTrue(self.storage.exists('posts/old.jpg'))
+        self.assertIsNone(self.storage.digest('posts/old.jpg'))
+        self.assertEqual(self.storage.path('posts/old.jpg'), path)
+        self.storage.delete('posts/old.jpg')
+        self.assertTrue(os.path.exists(path))
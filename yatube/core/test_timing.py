@@ -0,0 +1,25 @@
+import time
+
+from django.template.loader import render_to_string
+from django.test import SimpleTestCase
+
+from core import timing
+
+
+class TimingTest(SimpleTestCase):
+    def test_nested_measure_counted_once(self):
+        """Вложенный замер того же слагаемого не удваивает время"""
+        with timing.collect() as timings:
+            with timing.measure('tpl'):
+                with timing.measure('tpl'):
+                    time.sleep(0.05)
+        self.assertGreaterEqual(timings.seconds['tpl'], 0.05)
+        self.assertLess(timings.seconds['tpl'], 0.09)
+
+    def test_nested_template_render(self):
+        """Шаблон, отрисованный внутри шаблона, считается один раз"""
+        with timing.collect() as timings, timing.measure('tpl'):
+            render_to_string('core/404.html')
+            outer = timings.seconds['tpl']
+        self.assertEqual(outer, 0)
+        self.assertGreater(timings.seconds['tpl'], 0)
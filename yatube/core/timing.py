@@ -0,0 +1,77 @@
+"""Учёт времени запроса по слагаемым: база, кэш, шаблоны, миниатюры.
+
+ServerTimingMiddleware (core.middleware) заводит Timings на время
+выбранного запроса, а код, время которого стоит знать, оборачивается
+в measure(name). Вне выбранных запросов measure ничего не замеряет.
+
+Слагаемые могут вкладываться друг в друга: запросы к базе из шаблона
+попадают и в db, и в tpl, чтение кэша при поиске миниатюры — и в cache,
+и в thumb. Вложенный замер того же слагаемого (шаблон карточки,
+отрисованный из шаблона страницы) отдельно не считается: время идёт
+только от внешнего.
+"""
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from time import perf_counter
+
+_local = threading.local()
+
+
+class Timings:
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.counts = Counter()
+        # Сколько замеров каждого слагаемого сейчас открыто.
+        self.depth = Counter()
+
+    def add(self, name, seconds):
+        self.seconds[name] += seconds
+
+    def count(self, name, number=1):
+        self.counts[name] += number
+
+    def execute(self, execute, sql, params, many, context):
+        """Обёртка connection.execute_wrapper: время и число запросов."""
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add('db', perf_counter() - start)
+            self.count('queries')
+
+
+def current():
+    return getattr(_local, 'timings', None)
+
+
+@contextmanager
+def collect():
+    """Собирает время кода, выполненного внутри, в новый Timings."""
+    timings = _local.timings = Timings()
+    try:
+        yield timings
+    finally:
+        _local.timings = None
+
+
+@contextmanager
+def measure(name):
+    timings = current()
+    if timings is None:
+        yield
+        return
+    timings.depth[name] += 1
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timings.depth[name] -= 1
+        if not timings.depth[name]:
+            timings.add(name, perf_counter() - start)
+
+
+def count(name, number=1):
+    timings = current()
+    if timings is not None:
+        timings.count(name, number)
@@ -0,0 +1,34 @@
+"""Транзакции, которые сразу берут блокировку записи SQLite.
+
+Обычный atomic() начинается с BEGIN (DEFERRED): пока в транзакции
+только чтение, она не ждёт писателей. Но если такая транзакция сначала
+читала, а потом пишет, а база за это время изменилась, SQLite отвечает
+«database is locked» сразу, без ожидания по busy_timeout.
+
+atomic_immediate() для блоков, которые точно пишут (сохранение постов,
+комментариев и подписок со счётчиками и лентами, импорт, хранилище
+файлов), начинает транзакцию с BEGIN IMMEDIATE: блокировка записи
+берётся в начале, и занятую базу SQLite ждёт по busy_timeout.
+"""
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+@contextmanager
+def atomic_immediate(using=None, savepoint=True):
+    """atomic(), внешний блок которого начинается с BEGIN IMMEDIATE.
+
+    Внутри уже открытой транзакции это обычный вложенный atomic().
+    Работает и как декоратор: @atomic_immediate().
+    """
+    connection = transaction.get_connection(using)
+    # Флаг читает DatabaseWrapper из core.backends.sqlite3, когда
+    # atomic() открывает транзакцию; другие бэкенды его не знают.
+    connection.begin_immediate = True
+    try:
+        with transaction.atomic(using=using, savepoint=savepoint):
+            connection.begin_immediate = False
+            yield
+    finally:
+        connection.begin_immediate = False
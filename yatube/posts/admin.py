@@ -1,10 +1,166 @@
+from functools import partial
+
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.widgets import RelatedFieldWidgetWrapper
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, models
+from django.db.backends.utils import typecast_timestamp
+from django.utils import timezone
+
+from core.backends.sqlite3.base import (
+    DatabaseWrapper as IndexedDatabaseWrapper,
+)
 
+from . import search
 from .models import Comment, Follow, Group, Post
+from .paginators import EstimatedCountPaginator
+
+
+class IndexedDatesQuerySet(models.QuerySet):
+    """dates() для иерархии дат в админке без полного прохода по таблице.
+
+    Обычный dates() считает DISTINCT по всем строкам. Здесь один
+    рекурсивный запрос находит каждый следующий год, месяц или день
+    шагом по индексу даты: первая запись не раньше начала следующего
+    периода (функция period_end бэкенда core.backends.sqlite3).
+    """
+    KINDS = ('year', 'month', 'day')
+    # Поле date_hierarchy, края которого берутся по индексу.
+    date_field = None
+
+    def _clone(self):
+        clone = super()._clone()
+        clone.date_field = self.date_field
+        return clone
+
+    def is_date_bounds(self, aggregates):
+        """Спрашиваются ли MIN и MAX поля date_field и ничего больше."""
+        kinds = set()
+        for aggregate in aggregates.values():
+            source = aggregate.get_source_expressions()[0]
+            if type(aggregate) not in (models.Min, models.Max) \
+                    or aggregate.filter is not None \
+                    or not isinstance(source, models.F) \
+                    or source.name != self.date_field:
+                return False
+            kinds.add(type(aggregate))
+        return len(aggregates) == 2 and kinds == {models.Min, models.Max}
+
+    def aggregate(self, *args, **kwargs):
+        # Иерархия дат сначала спрашивает MIN и MAX даты одним запросом,
+        # а так SQLite проходит всю таблицу. По отдельности каждый из них
+        # берётся с края индекса.
+        if args or not self.is_date_bounds(kwargs):
+            return super().aggregate(*args, **kwargs)
+        edges = {}
+        for alias, aggregate in kwargs.items():
+            order = self.date_field
+            if isinstance(aggregate, models.Max):
+                order = '-' + order
+            edges[alias] = self.filter(
+                **{f'{self.date_field}__isnull': False}
+            ).order_by(order).values_list(
+                self.date_field, flat=True
+            ).first()
+        return edges
+
+    def dates(self, field_name, kind, order='ASC'):
+        connection = connections[self.db]
+        if kind not in self.KINDS \
+                or not isinstance(connection, IndexedDatabaseWrapper):
+            return super().dates(field_name, kind, order)
+        try:
+            sql, params = self.order_by().filter(
+                **{f'{field_name}__isnull': False}
+            ).values_list(field_name).query.sql_with_params()
+        except EmptyResultSet:
+            return []
+        column = connection.ops.quote_name(
+            self.model._meta.get_field(field_name).column
+        )
+        tzname = timezone.get_current_timezone_name() \
+            if settings.USE_TZ else None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'''
+                WITH RECURSIVE moments(moment) AS (
+                    SELECT (
+                        SELECT {column} FROM ({sql})
+                        ORDER BY {column} LIMIT 1
+                    )
+                    UNION ALL
+                    SELECT (
+                        SELECT {column} FROM ({sql})
+                        WHERE {column} >= period_end(%s, moment, %s)
+                        ORDER BY {column} LIMIT 1
+                    )
+                    FROM moments WHERE moment IS NOT NULL
+                )
+                SELECT CAST(moment AS TEXT) FROM moments
+                WHERE moment IS NOT NULL
+                ''',
+                (*params, *params, kind, tzname),
+            )
+            moments = [
+                typecast_timestamp(moment) for moment, in cursor.fetchall()
+            ]
+        found = []
+        for moment in moments:
+            if settings.USE_TZ:
+                moment = timezone.localtime(moment)
+            found.append(self.truncate(moment.date(), kind))
+        if order == 'DESC':
+            found.reverse()
+        return found
+
+    @staticmethod
+    def truncate(day, kind):
+        if kind == 'year':
+            return day.replace(month=1, day=1)
+        if kind == 'month':
+            return day.replace(day=1)
+        return day
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Список объектов большой таблицы.
+
+    Число строк оценивается (EstimatedCountPaginator), полный COUNT(*)
+    рядом с результатами поиска не считается, а иерархия дат строится
+    по индексу (IndexedDatesQuerySet).
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        queryset = IndexedDatesQuerySet(
+            model=queryset.model, query=queryset.query, using=queryset.db
+        )
+        queryset.date_field = self.date_hierarchy
+        return queryset
+
+    def get_changelist_formset(self, request, **kwargs):
+        kwargs.setdefault(
+            'formfield_callback',
+            partial(self.changelist_formfield, request=request),
+        )
+        return super().get_changelist_formset(request, **kwargs)
+
+    def changelist_formfield(self, db_field, request, **kwargs):
+        # В строках списка хватает самого виджета: ссылки «добавить»
+        # и «изменить» рядом с ним отрисовываются заново в каждой строке.
+        field = self.formfield_for_dbfield(db_field, request, **kwargs)
+        if field is not None and isinstance(
+            field.widget, RelatedFieldWidgetWrapper
+        ):
+            field.widget = field.widget.widget
+        return field
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(LargeTableAdmin):
     list_display = (
         'pk',
         'text',
@@ -13,24 +169,48 @@ class PostAdmin(admin.ModelAdmin):
         'group'
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    raw_id_fields = ('author',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
     empty_value_display = '-пусто-'
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        field = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name == 'group':
+            # Поле группы копируется в форму каждой строки списка вместе
+            # с queryset; готовый список вариантов читается один раз.
+            field.choices = list(field.choices)
+        return field
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по тексту идёт через индекс FTS5, а не LIKE '%...%'.
+        query = search.to_query(search_term)
+        if not query:
+            return queryset, False
+        return queryset.filter(search_index__text__match=query), False
+
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
-    list_display = ('title', 'slug', 'description')
+    list_display = ('title', 'slug', 'description', 'posts_count')
     empty_value_display = '-пусто-'
 
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(LargeTableAdmin):
     list_display = ('user', 'author', )
-    search_fields = ('user',)
+    list_select_related = ('user', 'author')
+    raw_id_fields = ('user', 'author')
+    search_fields = ('=user__username', '=author__username')
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     list_display = ('text', 'post', 'author', )
+    list_select_related = ('post', 'author')
+    raw_id_fields = ('post', 'author')
     search_fields = ('text',)
+    # Индекса по одной дате комментария нет, а по первичному ключу есть.
+    ordering = ('-pk',)
@@ -0,0 +1,249 @@
+"""JSON API только для чтения: ленты, посты, группы и профили.
+
+Ленты берут посты из тех же scope, что и HTML-страницы (posts.views),
+и кэшируются для анонимных читателей тем же anonymous_page_cache: ключ,
+ETag и сброс кэша у страницы и у её JSON общие.
+
+Посты читаются через values() без создания моделей, а в ответ попадают
+только поля из ?fields=id,text,author (по умолчанию — все).
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponse, QueryDict
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_safe
+
+from .cache import anonymous_page_cache
+from .models import Group, Post, User
+from .paginators import CursorPaginator, cursor_params
+from .views import group_scope, index_scope, profile_scope
+
+# Поле ответа и столбцы values(), из которых оно собирается.
+POST_FIELDS = {
+    'id': ('id',),
+    'text': ('text',),
+    'pub_date': ('pub_date',),
+    'author': ('author__username', 'author__first_name', 'author__last_name'),
+    'group': ('group__slug', 'group__title'),
+    'image': ('image',),
+    'comments_count': ('comments_count',),
+}
+# Комментарии сбрасывают кэш только своего поста, а не лент, поэтому
+# число комментариев отдаётся лишь в посте.
+FEED_FIELDS = tuple(
+    field for field in POST_FIELDS if field != 'comments_count'
+)
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def json_response(data, request, status=200):
+    """Компактный JSON с ETag по содержимому и ответом 304."""
+    content = json.dumps(
+        data, ensure_ascii=False, separators=(',', ':')
+    ).encode()
+    response = HttpResponse(
+        content, content_type='application/json', status=status
+    )
+    if status != 200:
+        return response
+    etag = quote_etag(hashlib.md5(content).hexdigest())
+    response['ETag'] = etag
+    return get_conditional_response(request, etag=etag, response=response)
+
+
+def api_view(scope=None, params=None):
+    """Обвязка представления API: GET и HEAD, ошибки в JSON.
+
+    Со scope ответ кэшируется для анонимных читателей, как HTML-ленты;
+    params(request) — параметры адреса, от которых зависит ответ.
+    """
+    def decorator(view):
+        cached = (
+            anonymous_page_cache(scope, params)(view) if scope else view
+        )
+
+        @require_safe
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                return cached(request, *args, **kwargs)
+            except Http404:
+                return json_response(
+                    {'error': 'Не найдено.'}, request, status=404
+                )
+            except ApiError as error:
+                return json_response(
+                    {'error': str(error)}, request, status=error.status
+                )
+        return wrapper
+    return decorator
+
+
+def requested_fields(request, allowed):
+    fields = request.GET.get('fields')
+    if not fields:
+        return list(allowed)
+    # Повторы не меняют ответ: ?fields=id,id — то же, что ?fields=id.
+    fields = list(dict.fromkeys(fields.split(',')))
+    unknown = set(fields) - set(allowed)
+    if unknown:
+        raise ApiError(
+            'Неизвестные поля: ' + ', '.join(sorted(unknown))
+            + '. Доступны: ' + ', '.join(allowed) + '.'
+        )
+    return fields
+
+
+def full_name(first_name, last_name):
+    return f'{first_name} {last_name}'.strip()
+
+
+def serialize_post(row, fields):
+    data = {}
+    for field in fields:
+        if field == 'author':
+            data['author'] = {
+                'username': row['author__username'],
+                'name': full_name(
+                    row['author__first_name'], row['author__last_name']
+                ),
+            }
+        elif field == 'group':
+            data['group'] = row['group__slug'] and {
+                'slug': row['group__slug'],
+                'title': row['group__title'],
+            }
+        elif field == 'pub_date':
+            data['pub_date'] = row['pub_date'].isoformat()
+        elif field == 'image':
+            data['image'] = (
+                default_storage.url(row['image']) if row['image'] else None
+            )
+        else:
+            data[field] = row[field]
+    return data
+
+
+def post_rows(posts, fields):
+    """values() постов со столбцами полей fields и ключа курсора."""
+    columns = {'id', 'pub_date'}
+    for field in fields:
+        columns.update(POST_FIELDS[field])
+    return posts.values(*columns)
+
+
+class RowCursorPaginator(CursorPaginator):
+    """CursorPaginator для словарей из values()."""
+
+    def get_key(self, obj):
+        date_field, id_field = self.fields
+        return obj[date_field], obj[id_field]
+
+
+def page_link(request, param, cursor):
+    if cursor is None:
+        return None
+    # Только параметры, которые читает лента: ответ, закэшированный
+    # по ним (feed_params), не зависит от остальных.
+    query = QueryDict(mutable=True)
+    if request.GET.get('fields'):
+        query['fields'] = request.GET['fields']
+    query[param] = cursor
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+def feed(request, posts):
+    """Страница ленты: results, next и previous для курсора."""
+    fields = requested_fields(request, FEED_FIELDS)
+    paginator = RowCursorPaginator(
+        post_rows(posts, fields), settings.COUNTER
+    )
+    page = paginator.get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    return json_response({
+        'results': [serialize_post(row, fields) for row in page],
+        'next': page_link(request, 'after', paginator.next_cursor),
+        'previous': page_link(request, 'before', paginator.previous_cursor),
+    }, request)
+
+
+def feed_params(request):
+    fields = ','.join(requested_fields(request, FEED_FIELDS))
+    return f'{cursor_params(request.GET)}&fields={fields}'
+
+
+def post_params(request):
+    return 'fields=' + ','.join(requested_fields(request, POST_FIELDS))
+
+
+def found(scope):
+    if scope is None:
+        raise Http404
+    return scope[1]
+
+
+def post_scope(request, post_id):
+    posts = Post.objects.filter(pk=post_id)
+    return (f'post:{post_id}',), posts
+
+
+@api_view(index_scope, feed_params)
+def posts_list(request):
+    return feed(request, found(index_scope(request)))
+
+
+@api_view(post_scope, post_params)
+def post_detail(request, post_id):
+    fields = requested_fields(request, POST_FIELDS)
+    row = post_rows(Post.objects.filter(pk=post_id), fields).first()
+    if row is None:
+        raise Http404
+    return json_response(serialize_post(row, fields), request)
+
+
+@api_view()
+def group_detail(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return json_response({
+        'slug': group.slug,
+        'title': group.title,
+        'description': group.description,
+        'posts_count': group.posts_count,
+    }, request)
+
+
+@api_view(group_scope, feed_params)
+def group_posts(request, slug):
+    return feed(request, found(group_scope(request, slug)))
+
+
+@api_view()
+def profile_detail(request, username):
+    author = get_object_or_404(
+        User.objects.select_related('profile'), username=username
+    )
+    return json_response({
+        'username': author.username,
+        'name': author.get_full_name(),
+        'posts_count': author.profile.posts_count,
+        'followers_count': author.profile.followers_count,
+        'following_count': author.profile.following_count,
+    }, request)
+
+
+@api_view(profile_scope, feed_params)
+def profile_posts(request, username):
+    return feed(request, found(profile_scope(request, username)))
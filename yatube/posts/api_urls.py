@@ -0,0 +1,20 @@
+from django.urls import path
+
+from . import api
+
+
+app_name = 'api'
+
+
+urlpatterns = [
+    path('posts/', api.posts_list, name='posts'),
+    path('posts/<int:post_id>/', api.post_detail, name='post'),
+    path('groups/<slug:slug>/', api.group_detail, name='group'),
+    path('groups/<slug:slug>/posts/', api.group_posts, name='group_posts'),
+    path('profiles/<str:username>/', api.profile_detail, name='profile'),
+    path(
+        'profiles/<str:username>/posts/',
+        api.profile_posts,
+        name='profile_posts'
+    ),
+]
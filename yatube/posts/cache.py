@@ -0,0 +1,177 @@
+import hashlib
+import secrets
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.utils.safestring import mark_safe
+
+GENERATION_KEY = 'generation:{}'
+# Записи страниц без Last-Modified: ключ сменён вместе с их форматом.
+PAGE_KEY = 'anonymous-page:{}'
+CARD_KEY = 'card:{}:{}:{}:{}'
+CARD_TEMPLATE = 'posts/includes/post_template.html'
+SHARED = ('groups', 'users')
+# Варианты карточки поста: какие ссылки она показывает.
+CARD_VARIANTS = {
+    'feed': {'index_profile': True, 'group_index': True},
+    'group': {'group_index': True},
+    'profile': {'index_profile': True},
+}
+
+
+def initial_generation():
+    # Случайное начальное значение: если ключ поколения вытеснили из кэша,
+    # новое поколение практически не может совпасть ни с одним из старых.
+    return secrets.randbits(52)
+
+
+def get_version(*namespaces):
+    """Текущие поколения пространств имён одной строкой для ключа кэша."""
+    keys = [GENERATION_KEY.format(namespace) for namespace in namespaces]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            generation = initial_generation()
+            if not cache.add(key, generation, None):
+                generation = cache.get(key, generation)
+            found[key] = generation
+    return '.'.join(str(found[key]) for key in keys)
+
+
+def _bump(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, initial_generation(), None)
+
+
+def bump(*namespaces):
+    """Делает устаревшим всё, что закэшировано с этими пространствами имён.
+
+    Поколения сдвигаются сразу и ещё раз после фиксации транзакции, чтобы
+    страница, собранная до фиксации, не осталась в кэше с новой версией.
+    """
+    keys = [
+        GENERATION_KEY.format(namespace)
+        for namespace in namespaces if namespace is not None
+    ]
+    _bump(keys)
+    transaction.on_commit(lambda: _bump(keys))
+
+
+def fragment(*namespaces, page=''):
+    """Параметры {% cache %} для фрагмента, зависящего от namespaces.
+
+    Карточки постов показывают названия групп и имена авторов, поэтому
+    к версии любого фрагмента добавляются общие поколения SHARED.
+    page — страница ленты в едином виде (posts.paginators.page_params):
+    ключ фрагмента не зависит от посторонних параметров адреса.
+    """
+    return {
+        'timeout': settings.FRAGMENT_CACHE_TIMEOUT,
+        'version': get_version(*namespaces, *SHARED),
+        'page': page,
+    }
+
+
+def cards(posts, variant):
+    """HTML карточек постов в варианте variant из CARD_VARIANTS.
+
+    Ключ карточки — пост, его updated_at и вариант, так что одна и та же
+    карточка достаётся из кэша на главной, в группе, профиле и ленте
+    подписок. Готовые карточки читаются одним get_many, рисуются только
+    недостающие. Имя автора и название группы в карточке учитываются
+    общими поколениями SHARED.
+    """
+    posts = list(posts)
+    version = get_version(*SHARED)
+    keys = [
+        CARD_KEY.format(
+            post.pk, post.updated_at.timestamp(), variant, version
+        )
+        for post in posts
+    ]
+    found = cache.get_many(keys)
+    rendered = {}
+    result = []
+    for post, key in zip(posts, keys):
+        html = found.get(key)
+        if html is None:
+            html = rendered[key] = render_to_string(
+                CARD_TEMPLATE, {'post': post, **CARD_VARIANTS[variant]}
+            )
+        result.append(mark_safe(html))
+    if rendered:
+        cache.set_many(rendered, settings.FRAGMENT_CACHE_TIMEOUT)
+    return result
+
+
+def html_page_params(request):
+    from .paginators import page_params
+
+    return page_params(request.GET)
+
+
+def anonymous_page_cache(scope, params=html_page_params):
+    """Кэширует страницу целиком для анонимных читателей.
+
+    scope(request, **kwargs) возвращает пространства имён страницы и
+    queryset её постов или None, если страницу кэшировать не нужно.
+    Ключ включает поколения пространств имён, поэтому страница
+    устаревает от тех же изменений моделей, что и её фрагменты. ETag
+    строится из ключа, на совпадающий If-None-Match отдаётся
+    304 Not Modified.
+
+    В ключ идут путь и params(request) — параметры адреса, которые
+    читает представление, в едином виде. Адреса с посторонними
+    параметрами попадают в ту же запись и не вытесняют кэш.
+
+    Last-Modified не отдаётся: правка текста, удаление поста или
+    переименование группы не меняют даты публикации, и по ней браузер
+    получал бы 304 на устаревшую страницу. Поколения же сдвигаются
+    от любых таких изменений.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or (
+                request.user.is_authenticated
+            ):
+                return view(request, *args, **kwargs)
+            found = scope(request, **kwargs)
+            if found is None:
+                return view(request, *args, **kwargs)
+            namespaces = found[0]
+            version = get_version(*namespaces, *SHARED)
+            digest = hashlib.md5(
+                f'{request.path}?{params(request)}:{version}'.encode()
+            ).hexdigest()
+            key = PAGE_KEY.format(digest)
+            etag = quote_etag(digest)
+            entry = cache.get(key)
+            if entry is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200 or response.cookies:
+                    return response
+                cache.set(
+                    key,
+                    (response.content, response['Content-Type']),
+                    settings.PAGE_CACHE_TIMEOUT,
+                )
+            else:
+                content, content_type = entry
+                response = HttpResponse(content, content_type=content_type)
+            response['ETag'] = etag
+            patch_cache_control(response, max_age=0, must_revalidate=True)
+            return get_conditional_response(
+                request, etag=etag, response=response
+            )
+        return wrapper
+    return decorator
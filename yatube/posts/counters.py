@@ -0,0 +1,75 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from core.transactions import atomic_immediate
+
+from .models import Comment, Follow, Group, Post, Profile
+
+User = get_user_model()
+
+# Модель со счётчиком, поле счётчика, поле ключа записи,
+# считаемая модель и её поле, ссылающееся на запись.
+COUNTERS = (
+    (Profile, 'posts_count', 'user', Post, 'author'),
+    (Profile, 'followers_count', 'user', Follow, 'author'),
+    (Profile, 'following_count', 'user', Follow, 'user'),
+    (Group, 'posts_count', 'pk', Post, 'group'),
+    (Post, 'comments_count', 'pk', Comment, 'post'),
+)
+
+
+def change(model, key, pk, field, delta):
+    """Атомарно сдвигает счётчик field записи model на delta."""
+    if pk is None:
+        return
+    rows = model.objects.filter(**{key: pk})
+    if delta < 0:
+        # Разошедшийся счётчик не должен уходить ниже нуля и ломать удаление.
+        rows = rows.filter(**{f'{field}__gte': -delta})
+    rows.update(**{field: F(field) + delta})
+
+
+def actual_count(key, counted, link):
+    return Coalesce(
+        Subquery(
+            counted.objects.filter(**{link: OuterRef(key)}).order_by().values(
+                link
+            ).annotate(total=Count('pk')).values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def missing_profiles():
+    return User.objects.filter(profile__isnull=True).values_list(
+        'pk', flat=True
+    )
+
+
+def create_missing_profiles():
+    Profile.objects.bulk_create(
+        [Profile(user_id=pk) for pk in missing_profiles().iterator()],
+    )
+
+
+def check():
+    """Возвращает список (модель, поле, ключ, в базе, на самом деле)."""
+    mismatches = []
+    for model, field, key, counted, link in COUNTERS:
+        rows = model.objects.annotate(
+            actual=actual_count(key, counted, link)
+        ).exclude(**{field: F('actual')}).values_list(key, field, 'actual')
+        mismatches.extend(
+            (model._meta.label, field, *row) for row in rows.iterator()
+        )
+    return mismatches
+
+
+@atomic_immediate()
+def rebuild():
+    """Пересчитывает все счётчики по данным в базе."""
+    create_missing_profiles()
+    for model, field, key, counted, link in COUNTERS:
+        model.objects.update(**{field: actual_count(key, counted, link)})
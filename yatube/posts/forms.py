@@ -1,7 +1,9 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm
 
-from .models import Comment, Post
+from .images import normalize
+from .models import Comment, Group, Post, User
 
 
 class PostForm(ModelForm):
@@ -18,8 +20,40 @@ class PostForm(ModelForm):
             'group': forms.Select(attrs={"class": "form-control"}),
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if not isinstance(image, UploadedFile):
+            return image
+        try:
+            return normalize(image)
+        except Exception:
+            raise forms.ValidationError(
+                self.fields['image'].error_messages['invalid_image'],
+                code='invalid_image',
+            )
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
         fields = ('text',)
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Искать', max_length=200, required=False)
+    group = forms.ModelChoiceField(
+        label='Группа',
+        queryset=Group.objects.all(),
+        to_field_name='slug',
+        required=False,
+    )
+    author = forms.CharField(label='Автор', max_length=150, required=False)
+
+    def clean_author(self):
+        username = self.cleaned_data['author']
+        if not username:
+            return None
+        author = User.objects.filter(username=username).first()
+        if author is None:
+            raise forms.ValidationError('Такого автора нет.')
+        return author
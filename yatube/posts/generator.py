@@ -0,0 +1,188 @@
+"""Синтетические данные для замеров: пользователи, группы, посты,
+комментарии, подписки и картинки в заданных объёмах.
+
+Записи собираются Faker и пишутся тем же Importer, что и при переносе
+данных (posts.importer): пачками bulk_create, с пересборкой счётчиков,
+лент подписок и поискового индекса в конце.
+
+Подписки распределены по закону Ципфа: на автора с номером k по
+популярности подписываются с весом 1 / k ** skew. При skew = 0 все
+авторы равны, при skew около 1 у первых авторов подписчиков на порядки
+больше, чем у остальных, как в настоящих соцсетях.
+"""
+import random
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from . import thumbnails
+from .importer import Importer
+from .models import Group, User
+
+# Сколько разных картинок делят между собой посты с картинкой.
+IMAGE_POOL = 20
+IMAGE_SIZE = (1600, 1200)
+# Из скольких готовых предложений набираются тексты.
+SENTENCE_POOL = 2000
+
+
+class Generator:
+    def __init__(self, users=100, groups=10, posts=1000, comments=1000,
+                 follows=10, skew=1.0, images=0.0, days=365, seed=0):
+        self.users = users
+        self.groups = groups
+        self.posts = posts
+        self.comments = comments
+        self.follows = min(follows, users - 1)
+        self.skew = skew
+        self.images = images
+        self.days = days
+        self.seed = seed
+        self.now = timezone.now()
+        self.faker = Faker('ru_RU')
+        self.faker.seed_instance(seed)
+        self.random = random.Random(seed)
+        self.sentences = [
+            self.faker.sentence() for _ in range(SENTENCE_POOL)
+        ]
+        self.pub_dates = []
+        # Номера в именах и адресах продолжают уже созданные записи,
+        # чтобы повторный запуск не упёрся в уникальность.
+        self.user_offset = 0
+        self.group_offset = 0
+
+    def text(self, longest):
+        return ' '.join(self.random.choices(
+            self.sentences, k=self.random.randint(1, longest)
+        ))
+
+    def moment(self, since=None):
+        """Случайный момент от since (или days назад) до сейчас."""
+        since = since or self.now - timedelta(days=self.days)
+        span = (self.now - since).total_seconds()
+        return since + timedelta(seconds=self.random.uniform(0, span))
+
+    def user_rows(self):
+        for number in range(1, self.users + 1):
+            yield {
+                'id': number,
+                'username': (
+                    f'{self.faker.user_name()}_{self.user_offset + number}'
+                ),
+                'first_name': self.faker.first_name(),
+                'last_name': self.faker.last_name(),
+                'email': self.faker.email(),
+                'date_joined': self.moment(),
+            }
+
+    def group_rows(self):
+        for number in range(1, self.groups + 1):
+            yield {
+                'id': number,
+                'title': self.faker.catch_phrase()[:200],
+                'slug': f'group-{self.group_offset + number}',
+                'description': self.text(3),
+            }
+
+    def post_rows(self, images):
+        for number in range(1, self.posts + 1):
+            pub_date = self.moment()
+            self.pub_dates.append(pub_date)
+            image = ''
+            if images and self.random.random() < self.images:
+                image = self.random.choice(images)
+            yield {
+                'id': number,
+                'author': self.random.randint(1, self.users),
+                # Каждый пятый пост — без группы.
+                'group': (
+                    self.random.randint(1, self.groups)
+                    if self.groups and self.random.random() >= 0.2 else ''
+                ),
+                'text': self.text(8),
+                'pub_date': pub_date,
+                'image': image,
+            }
+
+    def comment_rows(self):
+        for number in range(1, self.comments + 1):
+            post = self.random.randrange(self.posts)
+            yield {
+                'id': number,
+                'post': post + 1,
+                'author': self.random.randint(1, self.users),
+                'text': self.text(3),
+                'created': self.moment(self.pub_dates[post]),
+            }
+
+    def follow_rows(self):
+        authors = list(range(1, self.users + 1))
+        weights = list(accumulate(
+            1 / rank ** self.skew for rank in authors
+        ))
+        for user in authors:
+            chosen = set()
+            # При сильном перекосе выборка повторяется, поэтому попыток
+            # несколько, но не бесконечно.
+            for _ in range(10):
+                chosen.update(self.random.choices(
+                    authors, cum_weights=weights,
+                    k=self.follows - len(chosen),
+                ))
+                chosen.discard(user)
+                if len(chosen) >= self.follows:
+                    break
+            for author in sorted(chosen):
+                yield {'user': user, 'author': author}
+
+    def make_images(self):
+        """Сохраняет IMAGE_POOL картинок с готовыми миниатюрами."""
+        names = []
+        for number in range(IMAGE_POOL):
+            start, end = (
+                tuple(self.random.randrange(256) for _ in range(3))
+                for _ in range(2)
+            )
+            image = Image.linear_gradient('L').resize(IMAGE_SIZE)
+            image = Image.merge('RGB', [
+                image.point(lambda x, a=a, b=b: a + (b - a) * x // 255)
+                for a, b in zip(start, end)
+            ])
+            output = BytesIO()
+            image.save(output, 'JPEG', quality=85)
+            name = default_storage.save(
+                f'posts/synthetic-{number}.jpg', ContentFile(output.getvalue())
+            )
+            source = ImageFile(name, default_storage)
+            for geometry_string, options in thumbnails.variants():
+                default.backend.generate(source, geometry_string, **options)
+            names.append(name)
+        return names
+
+    def sources(self):
+        """Записи для Importer.run по видам."""
+        self.user_offset = User.objects.aggregate(last=Max('pk'))['last'] or 0
+        self.group_offset = (
+            Group.objects.aggregate(last=Max('pk'))['last'] or 0
+        )
+        images = self.make_images() if self.posts and self.images else []
+        return {
+            'users': self.user_rows(),
+            'groups': self.group_rows(),
+            'posts': self.post_rows(images),
+            'comments': self.comment_rows() if self.posts else (),
+            'follows': self.follow_rows() if self.follows > 0 else (),
+        }
+
+    def run(self, batch_size=1000):
+        """Пишет данные; возвращает отчёт Importer.run."""
+        return Importer(batch_size).run(self.sources())
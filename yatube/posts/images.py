@@ -0,0 +1,55 @@
+"""Приведение загруженной картинки поста к ограниченному оригиналу.
+
+Загрузка пишется во временный файл (FILE_UPLOAD_HANDLERS), а Pillow
+сначала читает только заголовок. Картинка, которая уже не больше
+POST_IMAGE_MAX_SIDE и не повёрнута EXIF, сохраняется как есть, без
+декодирования. Большие снимки декодируются сразу уменьшенными (draft для
+JPEG, reduce для остальных), поворот по EXIF применяется один раз, и в
+MEDIA_ROOT попадает уже ограниченный оригинал.
+"""
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from PIL import Image, ImageOps
+
+EXIF_ORIENTATION = 0x0112
+# Во что сохраняется пересжатая картинка: с прозрачностью — PNG.
+ALPHA_MODES = ('RGBA', 'LA', 'PA')
+
+
+def needs_normalizing(image):
+    if getattr(image, 'is_animated', False):
+        # Анимацию покадрово не пересжимаем: миниатюры возьмут первый кадр.
+        return False
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+    return max(image.size) > max_side or orientation != 1
+
+
+def normalize(upload):
+    """Возвращает upload как есть или файл с ограниченной картинкой."""
+    upload.seek(0)
+    image = Image.open(upload)
+    if not needs_normalizing(image):
+        upload.seek(0)
+        return upload
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    # thumbnail сам выбирает draft у JPEG и reduce у остальных форматов,
+    # поэтому полноразмерный растр в памяти не появляется.
+    image.thumbnail((max_side, max_side), Image.LANCZOS, reducing_gap=3.0)
+    image = ImageOps.exif_transpose(image)
+    if image.mode == 'P' and 'transparency' in image.info:
+        image = image.convert('RGBA')
+    if image.mode in ALPHA_MODES:
+        image, fmt, extension = image.convert('RGBA'), 'PNG', '.png'
+    else:
+        image, fmt, extension = image.convert('RGB'), 'JPEG', '.jpg'
+    output = tempfile.TemporaryFile()
+    image.save(
+        output, fmt, quality=settings.POST_IMAGE_QUALITY, optimize=True
+    )
+    output.seek(0)
+    name = os.path.splitext(os.path.basename(upload.name))[0] + extension
+    return File(output, name=name)
@@ -0,0 +1,308 @@
+"""Массовый импорт пользователей, групп, постов, комментариев и подписок.
+
+Каждая модель читается из своего файла: CSV с заголовком или NDJSON
+(по объекту JSON в строке). Записи ссылаются друг на друга старыми id
+(поле id у пользователей, групп, постов и комментариев), а новые id
+выдаются подряд после наибольшего в таблице; соответствие старых и новых
+id хранится в памяти (IdMap) и ссылки переводятся через него.
+
+Записи пишутся bulk_create пачками по batch_size, каждая пачка — в своей
+транзакции. Сигналы при этом не работают, поэтому счётчики, профили,
+ленты подписок и поисковый индекс пересобираются в конце (finish),
+а кэш очищается.
+
+С каталогом checkpoint импорт можно продолжить после сбоя: перед
+фиксацией пачки соответствие id дописывается в <модель>.ids, после —
+число обработанных записей в progress.json. При повторном запуске
+обработанные записи пропускаются, а пачка, зафиксированная без отметки
+в progress.json, узнаётся по уже занятым id и второй раз не пишется.
+"""
+import csv
+import json
+import os
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.transactions import atomic_immediate
+
+from . import counters, search, timeline
+from .models import Comment, Follow, Group, Post, User
+
+# Виды записей в порядке импорта: ссылки ведут только на предыдущие.
+MODELS = {
+    'users': User,
+    'groups': Group,
+    'posts': Post,
+    'comments': Comment,
+    'follows': Follow,
+}
+KINDS = tuple(MODELS)
+
+
+class ImportFailed(Exception):
+    pass
+
+
+def read_rows(path):
+    """Записи файла словарями: .csv — CSV с заголовком, иначе NDJSON."""
+    with open(path, newline='', encoding='utf-8') as source:
+        if path.endswith('.csv'):
+            yield from csv.DictReader(source)
+            return
+        for number, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as error:
+                raise ImportFailed(f'{path}:{number}: {error}')
+
+
+def parse_date(value):
+    if not value:
+        return timezone.now()
+    moment = parse_datetime(str(value))
+    if moment is None:
+        raise ImportFailed(f'Непонятная дата: {value!r}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class IdMap(dict):
+    """Старый id → новый id; с path дописывается в файл и читается из него."""
+
+    def __init__(self, path=None):
+        super().__init__()
+        self.path = path
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as source:
+                for line in source:
+                    old, new = line.rstrip('\n').split('\t')
+                    self[old] = int(new)
+
+    def record(self, pairs):
+        self.update(pairs)
+        if not self.path:
+            return
+        with open(self.path, 'a', encoding='utf-8') as output:
+            output.writelines(f'{old}\t{new}\n' for old, new in pairs)
+            output.flush()
+            os.fsync(output.fileno())
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """bulk_create проставляет auto_now_add сам; на время импорта — нет."""
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field, _ in saved:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now_add in saved:
+            field.auto_now_add = auto_now_add
+
+
+class Importer:
+    def __init__(self, batch_size=1000, checkpoint=None):
+        self.batch_size = batch_size
+        self.checkpoint = checkpoint
+        if checkpoint:
+            os.makedirs(checkpoint, exist_ok=True)
+        self.progress = self.load_progress()
+        self.maps = {
+            kind: IdMap(checkpoint and os.path.join(checkpoint, f'{kind}.ids'))
+            for kind in KINDS
+        }
+
+    @property
+    def progress_path(self):
+        return os.path.join(self.checkpoint, 'progress.json')
+
+    def load_progress(self):
+        if self.checkpoint and os.path.exists(self.progress_path):
+            with open(self.progress_path, encoding='utf-8') as source:
+                return json.load(source)
+        return {}
+
+    def save_progress(self):
+        if not self.checkpoint:
+            return
+        temp_path = self.progress_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as output:
+            json.dump(self.progress, output)
+        os.replace(temp_path, self.progress_path)
+
+    def reference(self, kind, old, required=True):
+        """Новый id по старому id записи kind."""
+        if old in (None, ''):
+            if required:
+                raise ImportFailed(f'Нет ссылки на {kind}')
+            return None
+        try:
+            return self.maps[kind][str(old)]
+        except KeyError:
+            raise ImportFailed(f'Нет записи {kind} со старым id {old}')
+
+    def build_users(self, row, pk):
+        return User(
+            pk=pk,
+            username=row['username'],
+            first_name=row.get('first_name') or '',
+            last_name=row.get('last_name') or '',
+            email=row.get('email') or '',
+            # Хэш пароля переносится как есть, без него войти нельзя.
+            password=row.get('password') or make_password(None),
+            date_joined=parse_date(row.get('date_joined')),
+        )
+
+    def build_groups(self, row, pk):
+        return Group(
+            pk=pk,
+            title=row['title'],
+            slug=row['slug'],
+            description=row.get('description') or '',
+        )
+
+    def build_posts(self, row, pk):
+        return Post(
+            pk=pk,
+            text=row['text'],
+            pub_date=parse_date(row.get('pub_date')),
+            author_id=self.reference('users', row.get('author')),
+            group_id=self.reference('groups', row.get('group'), False),
+            image=row.get('image') or '',
+        )
+
+    def build_comments(self, row, pk):
+        return Comment(
+            pk=pk,
+            post_id=self.reference('posts', row.get('post')),
+            author_id=self.reference('users', row.get('author')),
+            text=row['text'],
+            created=parse_date(row.get('created')),
+        )
+
+    def build_follows(self, row, pk):
+        return Follow(
+            user_id=self.reference('users', row.get('user')),
+            author_id=self.reference('users', row.get('author')),
+        )
+
+    def next_pk(self, kind):
+        model = MODELS[kind]
+        last = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        return max([last, *self.maps[kind].values()]) + 1
+
+    def write(self, kind, batch, done):
+        """Пишет пачку (старый id, объект) и отмечает done записей."""
+        model = MODELS[kind]
+        if kind == 'follows':
+            objects = [
+                follow for _, follow in batch
+                if follow.user_id != follow.author_id
+            ]
+            with atomic_immediate():
+                model.objects.bulk_create(objects, ignore_conflicts=True)
+        else:
+            ids = self.maps[kind]
+            fresh = [(old, obj) for old, obj in batch if old not in ids]
+            resumed = {obj.pk for old, obj in batch if old in ids}
+            if resumed:
+                # Эти записи дошли до файла id в прошлый раз; если пачку
+                # тогда успели зафиксировать, они уже в базе.
+                resumed -= set(model.objects.filter(
+                    pk__in=resumed
+                ).values_list('pk', flat=True))
+            objects = [obj for _, obj in batch if obj.pk in resumed]
+            objects += [obj for _, obj in fresh]
+            ids.record([(old, obj.pk) for old, obj in fresh])
+            with atomic_immediate():
+                model.objects.bulk_create(objects)
+        self.progress[kind] = done
+        self.save_progress()
+        return len(objects)
+
+    def import_kind(self, kind, source):
+        """Импортирует файл или записи source; возвращает (записано, секунд).
+
+        source — путь к файлу или итератор словарей тех же полей.
+        """
+        build = getattr(self, f'build_{kind}')
+        if isinstance(source, str):
+            path, rows = source, read_rows(source)
+        else:
+            path, rows = kind, source
+        skip = self.progress.get(kind, 0)
+        pk = self.next_pk(kind)
+        ids = self.maps[kind]
+        written = 0
+        batch = []
+        done = 0
+        started = time.perf_counter()
+        for done, row in enumerate(rows, 1):
+            if done <= skip:
+                continue
+            old = str(row.get('id', ''))
+            if kind != 'follows' and not old:
+                raise ImportFailed(f'{path}: запись {done} без id')
+            try:
+                if old in ids:
+                    obj = build(row, ids[old])
+                else:
+                    obj = build(row, pk)
+                    pk += 1
+            except KeyError as error:
+                raise ImportFailed(f'{path}: запись {done} без поля {error}')
+            batch.append((old, obj))
+            if len(batch) >= self.batch_size:
+                written += self.write(kind, batch, done)
+                batch = []
+        if batch:
+            written += self.write(kind, batch, done)
+        return written, time.perf_counter() - started
+
+    def run(self, sources):
+        """Импортирует {вид: источник} в порядке KINDS и пересобирает данные.
+
+        Возвращает список (вид, записано, секунд).
+        """
+        with connection.cursor() as cursor:
+            # Индекс проще собрать один раз в конце, чем дописывать
+            # триггером после каждой вставки.
+            search.drop_triggers(cursor)
+        report = []
+        try:
+            with explicit_dates(
+                Post._meta.get_field('pub_date'),
+                Comment._meta.get_field('created'),
+            ):
+                for kind in KINDS:
+                    if sources.get(kind):
+                        report.append((kind, *self.import_kind(
+                            kind, sources[kind]
+                        )))
+        except BaseException:
+            # Триггеры возвращаются и после сбоя, иначе посты с сайта
+            # перестанут попадать в поиск; уже записанные пачки
+            # индексируются сразу.
+            search.rebuild()
+            raise
+        started = time.perf_counter()
+        self.finish()
+        report.append(('finish', None, time.perf_counter() - started))
+        return report
+
+    def finish(self):
+        counters.rebuild()
+        timeline.rebuild()
+        search.rebuild()
+        cache.clear()
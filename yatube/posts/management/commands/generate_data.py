@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.generator import Generator
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами, постами, '
+        'комментариями, подписками и картинками для замеров.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument(
+            '--follows',
+            type=int,
+            default=20,
+            help='Сколько авторов читает каждый пользователь.',
+        )
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=1.0,
+            help='Перекос подписок по Ципфу: 0 — все авторы равны.',
+        )
+        parser.add_argument(
+            '--images',
+            type=float,
+            default=0.1,
+            help='Доля постов с картинкой, от 0 до 1.',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='За сколько последних дней разбросаны даты.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь.')
+        if not 0 <= options['images'] <= 1:
+            raise CommandError('--images — доля от 0 до 1.')
+        generator = Generator(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows=options['follows'],
+            skew=options['skew'],
+            images=options['images'],
+            days=options['days'],
+            seed=options['seed'],
+        )
+        for kind, written, seconds in generator.run(options['batch_size']):
+            if written is None:
+                self.stdout.write(
+                    f'{kind}: счётчики, ленты и поиск — {seconds:.1f} с'
+                )
+                continue
+            self.stdout.write(f'{kind}: {written} записей за {seconds:.1f} с')
+        self.stdout.write(self.style.SUCCESS('Данные созданы.'))
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from posts.importer import KINDS, ImportFailed, Importer
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует пользователей, группы, посты, комментарии и подписки '
+        'из файлов CSV или NDJSON пачками bulk_create.'
+    )
+
+    def add_arguments(self, parser):
+        for kind in KINDS:
+            parser.add_argument(
+                f'--{kind}', metavar='FILE', help=f'Файл с записями {kind}.'
+            )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько записей писать в одной транзакции.',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            metavar='DIR',
+            help='Каталог состояния, чтобы продолжить импорт после сбоя.',
+        )
+
+    def handle(self, *args, **options):
+        sources = {kind: options[kind] for kind in KINDS if options[kind]}
+        if not sources:
+            raise CommandError('Не указан ни один файл.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть не меньше 1.')
+        importer = Importer(options['batch_size'], options['checkpoint'])
+        try:
+            report = importer.run(sources)
+        except (ImportFailed, OSError, DatabaseError) as error:
+            hint = ''
+            if options['checkpoint']:
+                hint = ' Повторный запуск продолжит с места сбоя.'
+            raise CommandError(f'{error}.{hint}')
+        for kind, written, seconds in report:
+            if written is None:
+                self.stdout.write(
+                    f'{kind}: счётчики, ленты и поиск — {seconds:.1f} с'
+                )
+                continue
+            rate = written / seconds if seconds else 0
+            self.stdout.write(
+                f'{kind}: {written} записей за {seconds:.1f} с, '
+                f'{rate:.0f} записей/с'
+            )
+        self.stdout.write(self.style.SUCCESS('Импорт закончен.'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики постов, комментариев и подписок. '
+        'С --check только сверяет их с данными.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Не исправлять, а вывести расхождения.',
+        )
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            counters.rebuild()
+            self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны.'))
+            return
+        missing = list(counters.missing_profiles())
+        for pk in missing:
+            self.stdout.write(f'У пользователя {pk} нет профиля')
+        mismatches = counters.check()
+        for label, field, pk, stored, actual in mismatches:
+            self.stdout.write(
+                f'{label}({pk}).{field}: '
+                f'в базе {stored}, на самом деле {actual}'
+            )
+        if missing or mismatches:
+            raise CommandError(
+                f'Расхождений: {len(mismatches)}, '
+                f'без профиля: {len(missing)}'
+            )
+        self.stdout.write(self.style.SUCCESS('Счётчики сходятся.'))
@@ -0,0 +1,46 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+import posts.models
+
+
+def install(apps, schema_editor):
+    # FTS5 есть только в SQLite; на других базах поиск не работает.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from posts import search
+    search.install(schema_editor.connection.cursor())
+    schema_editor.execute(
+        "INSERT INTO posts_post_fts (posts_post_fts) VALUES ('rebuild')"
+    )
+
+
+def uninstall(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from posts import search
+    search.uninstall(schema_editor.connection.cursor())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+        migrations.CreateModel(
+            name='PostIndex',
+            fields=[
+                ('post', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='posts.Post')),
+                ('text', posts.models.SearchField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'posts_post_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 2.2.16 on 2026-10-18 14:20
+
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def set_updated_at(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.update(updated_at=F('pub_date'))
+
+
+def install_search(apps, schema_editor):
+    # Добавление столбца пересоздаёт posts_post, а с ней пропадают
+    # триггеры поискового индекса.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from posts import search
+    search.install(schema_editor.connection.cursor())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Изменён'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(set_updated_at, migrations.RunPython.noop),
+        migrations.RunPython(install_search, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,26 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from core.transactions import atomic_immediate
+
 User = get_user_model()
 
 
+class AtomicSaveModel(models.Model):
+    """Сохраняет запись в одной транзакции с обработчиками сигналов.
+
+    Обработчики в posts.signals обновляют счётчики, поэтому запись
+    и счётчики должны меняться вместе.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with atomic_immediate(savepoint=False):
+            super().save(*args, **kwargs)
+
+
 class Group(models.Model):
     title = models.CharField(
         max_length=200,
@@ -18,6 +35,11 @@ class Group(models.Model):
         max_length=400,
         verbose_name='Описание',
     )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Постов',
+    )
 
     class Meta:
         verbose_name_plural = 'Группы'
@@ -27,7 +49,7 @@ class Group(models.Model):
         return self.title
 
 
-class Post(models.Model):
+class Post(AtomicSaveModel):
     COUNTER_CHARACTERS: int = 15
     text = models.TextField(
         max_length=400,
@@ -42,6 +64,7 @@ class Post(models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='posts',
         verbose_name='Автор',
         help_text='Укажите автора',
@@ -51,6 +74,7 @@ class Post(models.Model):
         blank=True,
         null=True,
         on_delete=models.SET_NULL,
+        db_index=False,
         related_name='posts',
         verbose_name='Группа',
         help_text='Укажите группу',
@@ -61,9 +85,30 @@ class Post(models.Model):
         help_text='Выберите картинку',
         blank=True,
     )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Комментариев',
+    )
+    # Версия карточки поста в кэше (posts.cache.cards).
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Изменён',
+    )
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(fields=('pub_date', 'id'), name='post_pub_date_idx'),
+            models.Index(
+                fields=('author', 'pub_date', 'id'),
+                name='post_author_date_idx',
+            ),
+            models.Index(
+                fields=('group', 'pub_date', 'id'),
+                name='post_group_date_idx',
+            ),
+        )
         verbose_name_plural = 'Посты'
         verbose_name = 'Пост'
 
@@ -71,10 +116,11 @@ class Post(models.Model):
         return self.text[:self.COUNTER_CHARACTERS]
 
 
-class Comment(models.Model):
+class Comment(AtomicSaveModel):
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='comments',
         verbose_name='Группа',
     )
@@ -95,6 +141,12 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created']
+        indexes = (
+            models.Index(
+                fields=('post', 'created', 'id'),
+                name='comment_post_created_idx',
+            ),
+        )
         verbose_name_plural = 'Коментарии'
         verbose_name = 'Коментарий'
 
@@ -102,19 +154,145 @@ class Comment(models.Model):
         return self.text[:self.COUNTER_CHARACTERS]
 
 
-class Follow(models.Model):
+class Follow(AtomicSaveModel):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='follower',
         verbose_name='Подписчик',
     )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='following',
         verbose_name='Автор',
     )
 
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='follow_unique_author',
+            ),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='follow_not_self',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('author', 'user'),
+                name='follow_author_idx',
+            ),
+        )
+
     def __str__(self):
         return self.user
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        db_index=False,
+        related_name='timeline',
+        verbose_name='Читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+    )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='timeline_unique_post',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', 'pub_date', 'post'),
+                name='timeline_user_date_idx',
+            ),
+        )
+        verbose_name_plural = 'Ленты подписок'
+        verbose_name = 'Запись ленты'
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
+
+
+class Profile(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='profile',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Постов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписчиков',
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписок',
+    )
+
+    class Meta:
+        verbose_name_plural = 'Профили'
+        verbose_name = 'Профиль'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class Match(models.Lookup):
+    """Условие полнотекстового поиска FTS5: «столбец MATCH запрос»."""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class SearchField(models.TextField):
+    """Столбец полнотекстового индекса, в нём ищут через __match."""
+
+
+SearchField.register_lookup(Match)
+
+
+class PostIndex(models.Model):
+    """Полнотекстовый индекс FTS5 по тексту постов.
+
+    Таблицу posts_post_fts и триггеры, которые обновляют её вместе
+    с posts_post, создаёт posts.search.install (миграция 0012).
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        related_name='search_index',
+    )
+    text = SearchField()
+    # Скрытый столбец FTS5: bm25 совпадения, чем меньше, тем лучше.
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'posts_post_fts'
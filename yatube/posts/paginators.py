@@ -0,0 +1,268 @@
+import hashlib
+from datetime import datetime, timedelta
+from heapq import merge
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Page, Paginator
+from django.db.models import AutoField, Max, Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .cache import get_version
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def encode_cursor(date, pk):
+    """Кодирует ключ (дата, id) в строку для адреса страницы."""
+    return f'{(date - EPOCH) // MICROSECOND}_{pk}'
+
+
+def decode_cursor(cursor):
+    """Разбирает курсор, для битой строки возвращает None."""
+    try:
+        micro, pk = (int(part) for part in cursor.split('_'))
+        return EPOCH + micro * MICROSECOND, pk
+    except (AttributeError, OverflowError, ValueError):
+        return None
+
+
+def cursor_params(query):
+    """Курсор из параметров query в едином виде, как его поймёт get_page.
+
+    Для ключей кэша: адреса одной и той же страницы дают одну строку,
+    а битый курсор — пустую, как первая страница.
+    """
+    name = 'after'
+    if query.get('after') is None and query.get('before') is not None:
+        name = 'before'
+    cursor = decode_cursor(query.get(name))
+    return f'{name}={encode_cursor(*cursor)}' if cursor else ''
+
+
+def page_params(query):
+    """Параметры листания HTML-ленты в едином виде (см. cursor_params).
+
+    Повторяет выбор пагинатора в posts.views.paginatoring; остальные
+    параметры адреса на страницу не влияют и в строку не попадают.
+    """
+    if settings.PAGINATION_MODE != 'cursor' or 'page' in query:
+        try:
+            # Как Paginator.get_page: не число — первая страница.
+            number = int(query.get('page', 1))
+        except (TypeError, ValueError):
+            number = 1
+        return f'page={number}'
+    return cursor_params(query)
+
+
+class CountedPaginator(Paginator):
+    """Нумерованные страницы без COUNT(*) на каждый запрос.
+
+    Число записей берётся из готового счётчика count (например,
+    Group.posts_count) или из кэша, где оно хранится под поколениями
+    namespaces из posts.cache и считается заново только после изменений
+    в них. Без того и другого работает как обычный Paginator.
+
+    Счётчик может отстать от таблицы (bulk_create, правка в обход ORM),
+    поэтому последняя страница сверяется с выборкой и при расхождении
+    число пересчитывается честно.
+    """
+
+    def __init__(self, object_list, per_page, count=None, namespaces=None):
+        super().__init__(object_list, per_page)
+        self.stored_count = count
+        self.namespaces = namespaces
+        self.exact = count is None and namespaces is None
+        self.count_key = None
+
+    @cached_property
+    def count(self):
+        if self.stored_count is not None:
+            return self.stored_count
+        if self.namespaces is None:
+            return Paginator.count.func(self)
+        try:
+            sql = str(self.object_list.query)
+        except EmptyResultSet:
+            self.exact = True
+            return 0
+        self.count_key = 'count:{}:{}'.format(
+            hashlib.md5(sql.encode()).hexdigest(),
+            get_version(*self.namespaces),
+        )
+        count = cache.get(self.count_key)
+        if count is None:
+            count = self.recount()
+        return count
+
+    def recount(self):
+        """Считает записи через COUNT(*) и запоминает результат."""
+        count = Paginator.count.func(self)
+        if self.count_key is not None:
+            cache.set(self.count_key, count, settings.FRAGMENT_CACHE_TIMEOUT)
+        self.exact = True
+        self.__dict__['count'] = count
+        self.__dict__.pop('num_pages', None)
+        return count
+
+    def is_stale(self, page):
+        if page.number < self.num_pages:
+            return False
+        bottom = (page.number - 1) * self.per_page
+        if len(page) < self.count - bottom:
+            return True
+        return self.object_list[self.count:self.count + 1].exists()
+
+    def get_page(self, number):
+        page = super().get_page(number)
+        if not self.exact and self.is_stale(page):
+            self.recount()
+            page = super().get_page(number)
+        return page
+
+
+class EstimatedCountPaginator(Paginator):
+    """Нумерованные страницы больших таблиц в админке без точного COUNT(*).
+
+    Для всей таблицы с автоинкрементным ключом число записей оценивается
+    сверху по MAX(id) — это один шаг по индексу; удалённые записи дают
+    пустые страницы в конце. Выборка с фильтрами или поиском считается
+    точно, но не дальше limit записей: страниц за пределом не видно,
+    и список сужают фильтрами.
+    """
+    limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where and isinstance(
+            queryset.model._meta.pk, AutoField
+        ):
+            return queryset.order_by().aggregate(last=Max('pk'))['last'] or 0
+        return queryset.order_by().values('pk')[:self.limit].count()
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу (pub_date, id).
+
+    Страница выбирается условием по ключу крайней показанной записи,
+    а не через OFFSET, и общее число записей не считается. Поэтому
+    глубина листания не влияет на скорость, а новые записи не сдвигают
+    уже открытые страницы.
+    """
+    is_cursor = True
+    fields = ('pub_date', 'id')
+
+    def __init__(self, object_list, per_page, fields=None):
+        super().__init__(object_list, per_page)
+        if fields is not None:
+            self.fields = fields
+        self.number = 1
+        self.next_cursor = None
+        self.previous_cursor = None
+
+    @cached_property
+    def num_pages(self):
+        # Номера страниц здесь условные: первая страница или «не первая».
+        # Этого хватает Page.has_next() и has_previous() без COUNT(*).
+        return self.number + (self.next_cursor is not None)
+
+    def get_key(self, obj):
+        date_field, id_field = self.fields
+        return getattr(obj, date_field), getattr(obj, id_field)
+
+    def encode(self, key):
+        return encode_cursor(*key)
+
+    def decode(self, cursor):
+        return decode_cursor(cursor)
+
+    def seek(self, cursor, newer):
+        # Условие вида «date <= X AND (date < X OR id < Y)»: первая часть
+        # даёт SQLite диапазон по индексу, вторая отсекает ничьи по дате.
+        date_field, id_field = self.fields
+        date, pk = cursor
+        lookup = 'gt' if newer else 'lt'
+        return Q(**{f'{date_field}__{lookup}e': date}) & (
+            Q(**{f'{date_field}__{lookup}': date})
+            | Q(**{f'{id_field}__{lookup}': pk})
+        )
+
+    def fetch(self, cursor, newer, limit):
+        """Возвращает до limit записей за курсором, ближние — первыми."""
+        date_field, id_field = self.fields
+        queryset = self.object_list
+        if cursor is not None:
+            queryset = queryset.filter(self.seek(cursor, newer))
+        if newer:
+            return list(queryset.order_by(date_field, id_field)[:limit])
+        return list(
+            queryset.order_by(f'-{date_field}', f'-{id_field}')[:limit]
+        )
+
+    def get_page(self, after=None, before=None):
+        """Страница записей старше after или новее before.
+
+        Без курсора или с битым курсором отдаётся первая страница.
+        """
+        newer = after is None and before is not None
+        cursor = self.decode(before if newer else after)
+        rows = []
+        if cursor is not None:
+            rows = self.fetch(cursor, newer, self.per_page + 1)
+        if newer and len(rows) <= self.per_page:
+            # Новее курсора меньше страницы — это и есть первая страница.
+            cursor, newer = None, False
+        if cursor is None:
+            rows = self.fetch(None, False, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if newer:
+            rows.reverse()
+            has_previous, has_next = has_more, True
+        else:
+            has_previous, has_next = cursor is not None, has_more
+        if rows and has_next:
+            self.next_cursor = self.encode(self.get_key(rows[-1]))
+        if rows and has_previous:
+            self.previous_cursor = self.encode(self.get_key(rows[0]))
+        self.number = 2 if has_previous else 1
+        return Page(rows, self.number, self)
+
+
+class TimelinePaginator(CursorPaginator):
+    """Курсорный вывод ленты подписок (posts.timeline.Timeline).
+
+    Записи ленты листаются по ключу (pub_date, post_id) таблицы
+    TimelineEntry, посты подмешиваемых авторов — по тому же ключу
+    в Post, и обе выборки сливаются в одну страницу постов.
+    """
+    fields = ('pub_date', 'post_id')
+
+    def __init__(self, timeline, per_page):
+        super().__init__(timeline.entries(), per_page)
+        self.pulled = None
+        pulled_posts = timeline.pulled_posts()
+        if pulled_posts is not None:
+            self.pulled = CursorPaginator(pulled_posts, per_page)
+
+    def get_key(self, post):
+        return post.pub_date, post.id
+
+    def fetch(self, cursor, newer, limit):
+        posts = [
+            entry.post for entry in super().fetch(cursor, newer, limit)
+        ]
+        if self.pulled is None:
+            return posts
+        pulled = self.pulled.fetch(cursor, newer, limit)
+        merged, seen = [], set()
+        for post in merge(posts, pulled, key=self.get_key, reverse=not newer):
+            if post.id not in seen:
+                seen.add(post.id)
+                merged.append(post)
+        return merged[:limit]
@@ -0,0 +1,119 @@
+"""Полнотекстовый поиск по постам на FTS5 (SQLite).
+
+Индекс posts_post_fts хранит только словарь, сам текст читается из
+posts_post (external content). Триггеры обновляют индекс при любой
+записи в posts_post, в том числе bulk_create и update() в обход ORM.
+Пересоздание таблицы в миграциях SQLite удаляет триггеры, поэтому
+install можно вызывать повторно (команда rebuild_search).
+"""
+import re
+
+from django.db import connection
+from django.db.models import ExpressionWrapper, F, FloatField
+
+from .models import Post
+from .paginators import CursorPaginator
+
+INSTALL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_fts USING fts5("
+    " text, content='posts_post', content_rowid='id',"
+    " tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS posts_post_fts_insert"
+    " AFTER INSERT ON posts_post BEGIN"
+    " INSERT INTO posts_post_fts (rowid, text) VALUES (new.id, new.text);"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS posts_post_fts_delete"
+    " AFTER DELETE ON posts_post BEGIN"
+    " INSERT INTO posts_post_fts (posts_post_fts, rowid, text)"
+    " VALUES ('delete', old.id, old.text);"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS posts_post_fts_update"
+    " AFTER UPDATE OF text ON posts_post BEGIN"
+    " INSERT INTO posts_post_fts (posts_post_fts, rowid, text)"
+    " VALUES ('delete', old.id, old.text);"
+    " INSERT INTO posts_post_fts (rowid, text) VALUES (new.id, new.text);"
+    " END",
+)
+TRIGGERS = (
+    'posts_post_fts_insert',
+    'posts_post_fts_delete',
+    'posts_post_fts_update',
+)
+WORD = re.compile(r'\w+')
+
+
+def install(cursor):
+    for statement in INSTALL:
+        cursor.execute(statement)
+
+
+def drop_triggers(cursor):
+    """Отключает обновление индекса, например на время импорта.
+
+    Индекс отстаёт от постов, пока rebuild не вернёт триггеры.
+    """
+    for trigger in TRIGGERS:
+        cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+
+
+def uninstall(cursor):
+    drop_triggers(cursor)
+    cursor.execute('DROP TABLE IF EXISTS posts_post_fts')
+
+
+def rebuild():
+    """Создаёт недостающие таблицу и триггеры и заполняет индекс заново."""
+    with connection.cursor() as cursor:
+        install(cursor)
+        cursor.execute(
+            "INSERT INTO posts_post_fts (posts_post_fts) VALUES ('rebuild')"
+        )
+        cursor.execute(
+            "INSERT INTO posts_post_fts (posts_post_fts) VALUES ('optimize')"
+        )
+
+
+def to_query(text):
+    """Запрос FTS5 из ввода читателя: все слова обязательны.
+
+    Каждое слово берётся в кавычки, поэтому AND, NEAR, звёздочки
+    и прочий синтаксис FTS5 из ввода ищутся как обычные слова.
+    """
+    return ' '.join(f'"{word}"' for word in WORD.findall(text))
+
+
+def search_posts(text, group=None, author=None):
+    """Посты, подходящие под запрос, с оценкой score (больше — лучше)."""
+    query = to_query(text)
+    if not query:
+        return Post.objects.none()
+    posts = Post.objects.filter(search_index__text__match=query)
+    if group is not None:
+        posts = posts.filter(group=group)
+    if author is not None:
+        posts = posts.filter(author=author)
+    return posts.select_related('author', 'group').annotate(
+        score=ExpressionWrapper(
+            F('search_index__rank') * -1.0, output_field=FloatField()
+        )
+    )
+
+
+class SearchPaginator(CursorPaginator):
+    """Курсорный вывод результатов поиска по ключу (score, id).
+
+    Оценка bm25 зависит от всего индекса, так что новые посты могут
+    немного сдвинуть уже открытые страницы — для поиска это допустимо.
+    """
+    fields = ('score', 'id')
+
+    def encode(self, key):
+        score, pk = key
+        return f'{score!r}_{pk}'
+
+    def decode(self, cursor):
+        try:
+            score, pk = cursor.rsplit('_', 1)
+            return float(score), int(pk)
+        except (AttributeError, ValueError):
+            return None
@@ -0,0 +1,127 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.storage import ContentAddressedStorage
+
+from . import cache, thumbnails, timeline
+from .counters import change
+from .models import Comment, Follow, Group, Post, Profile
+
+
+def bump_post_pages(post_id, author_ids, group_ids):
+    cache.bump(
+        'index',
+        f'post:{post_id}',
+        *(f'profile:{pk}' for pk in set(author_ids)),
+        *(f'group:{pk}' for pk in set(group_ids) if pk is not None),
+    )
+
+
+def release_image(image):
+    """Отпускает ссылку на картинку, если её не показывает другой пост.
+
+    Удаляется только имя в ContentAddressedStorage и его записи
+    в хранилище ключей sorl: содержимое и миниатюры остаются, пока на них
+    ссылаются другие имена.
+    """
+    if not image or not isinstance(image.storage, ContentAddressedStorage):
+        return
+    if not Post.objects.filter(image=image.name).exists():
+        image.storage.delete(image.name)
+        thumbnails.forget(image.name)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_saved(sender, instance, created, update_fields, **kwargs):
+    if created:
+        Profile.objects.get_or_create(user=instance)
+    elif update_fields is None or set(update_fields) - {'last_login'}:
+        # Вход на сайт обновляет только last_login — карточки от него
+        # не меняются, и сбрасывать кэш на каждый вход незачем.
+        cache.bump('users')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    cache.bump('groups', f'group:{instance.pk}')
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, **kwargs):
+    instance._saved_links = None
+    instance._saved_image = None
+    if instance.pk is not None and not instance._state.adding:
+        saved = Post.objects.filter(pk=instance.pk).values_list(
+            'author_id', 'group_id', 'image'
+        ).first()
+        if saved is not None:
+            instance._saved_links = saved[:2]
+            instance._saved_image = saved[2]
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        change(Profile, 'user', instance.author_id, 'posts_count', 1)
+        change(Group, 'pk', instance.group_id, 'posts_count', 1)
+        timeline.fan_out(instance)
+        bump_post_pages(instance.pk, [instance.author_id], [instance.group_id])
+        return
+    author_id, group_id = instance._saved_links or (
+        instance.author_id, instance.group_id
+    )
+    if instance._saved_image and instance._saved_image != instance.image.name:
+        release_image(type(instance.image)(
+            instance, instance.image.field, instance._saved_image
+        ))
+    bump_post_pages(
+        instance.pk,
+        [author_id, instance.author_id],
+        [group_id, instance.group_id],
+    )
+    if author_id != instance.author_id:
+        change(Profile, 'user', author_id, 'posts_count', -1)
+        change(Profile, 'user', instance.author_id, 'posts_count', 1)
+    if group_id != instance.group_id:
+        change(Group, 'pk', group_id, 'posts_count', -1)
+        change(Group, 'pk', instance.group_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    release_image(instance.image)
+    change(Profile, 'user', instance.author_id, 'posts_count', -1)
+    change(Group, 'pk', instance.group_id, 'posts_count', -1)
+    bump_post_pages(instance.pk, [instance.author_id], [instance.group_id])
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        change(Post, 'pk', instance.post_id, 'comments_count', 1)
+    cache.bump(f'post:{instance.post_id}')
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    change(Post, 'pk', instance.post_id, 'comments_count', -1)
+    cache.bump(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        change(Profile, 'user', instance.author_id, 'followers_count', 1)
+        change(Profile, 'user', instance.user_id, 'following_count', 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        cache.bump(f'follow:{instance.user_id}')
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    change(Profile, 'user', instance.author_id, 'followers_count', -1)
+    change(Profile, 'user', instance.user_id, 'following_count', -1)
+    timeline.prune(instance.user_id, instance.author_id)
+    cache.bump(f'follow:{instance.user_id}')
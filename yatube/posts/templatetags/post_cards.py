@@ -0,0 +1,11 @@
+from django import template
+
+from posts.cache import cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts, variant):
+    """Карточки постов из кэша: {% post_cards page_obj 'feed' as cards %}."""
+    return cards(posts, variant)
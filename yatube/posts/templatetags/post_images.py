@@ -0,0 +1,30 @@
+import logging
+
+from django import template
+from django.conf import settings
+
+from posts import thumbnails
+
+logger = logging.getLogger(__name__)
+
+register = template.Library()
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def post_picture(image, css='card-img my-2'):
+    """Картинка поста в нескольких ширинах и форматах."""
+    sources = []
+    if image:
+        try:
+            sources = thumbnails.picture(image)
+        except Exception:
+            # Как и {% thumbnail %}: сломанная картинка не роняет страницу.
+            logger.exception('Picture tag failed for %s', image)
+    return {
+        'sources': sources[:-1],
+        'fallback': sources[-1] if sources else None,
+        'sizes': '(max-width: {0}px) 100vw, {0}px'.format(
+            max(settings.POST_IMAGE_WIDTHS)
+        ),
+        'css': css,
+    }
@@ -0,0 +1,163 @@
+from datetime import date, datetime
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Max, Min
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.admin import IndexedDatesQuerySet
+from posts.models import Group, Post
+from posts.paginators import EstimatedCountPaginator
+
+User = get_user_model()
+
+
+class PostAdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        cls.user = User.objects.create_user(username='auth')
+        cls.groups = Group.objects.bulk_create(
+            Group(title=f'Группа {number}', slug=f'group-{number}')
+            for number in range(3)
+        )
+        cls.url = reverse('admin:posts_post_changelist')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def create_posts(self, count):
+        Post.objects.bulk_create(
+            Post(
+                author=self.user,
+                group=self.groups[number % len(self.groups)],
+                text=f'Пост {number}',
+            )
+            for number in range(count)
+        )
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return queries
+
+    def test_queries_do_not_grow_with_rows(self):
+        """Число запросов списка не зависит от числа строк на странице"""
+        self.create_posts(2)
+        few = len(self.count_queries())
+        self.create_posts(20)
+        self.assertEqual(len(self.count_queries()), few)
+
+    def test_no_full_count(self):
+        """Список всей таблицы не считает COUNT(*)"""
+        self.create_posts(3)
+        queries = self.count_queries()
+        self.assertFalse([
+            query['sql'] for query in queries
+            if 'COUNT(' in query['sql'] and '"posts_post"' in query['sql']
+        ])
+
+    def test_estimated_count(self):
+        """Оценка сверху по MAX(id), с фильтром — точный счёт до limit"""
+        self.create_posts(5)
+        Post.objects.filter(pk=Post.objects.earliest('pk').pk).delete()
+        paginator = EstimatedCountPaginator(Post.objects.all(), 2)
+        self.assertEqual(paginator.count, Post.objects.latest('pk').pk)
+        group = Post.objects.filter(group=self.groups[0])
+        self.assertEqual(
+            EstimatedCountPaginator(group, 2).count, group.count()
+        )
+        paginator = EstimatedCountPaginator(group, 2)
+        paginator.limit = 1
+        self.assertEqual(paginator.count, 1)
+
+    def test_dates_in_local_time(self):
+        """Иерархия дат по индексу делит посты по местным суткам"""
+        self.create_posts(1)
+        moments = (
+            datetime(2020, 12, 31, 21, 30),
+            datetime(2021, 1, 1, 10),
+            datetime(2021, 1, 31, 23, 59),
+            datetime(2021, 3, 1),
+            datetime(2022, 2, 28, 20, 59),
+        )
+        for number, moment in enumerate(moments):
+            Post.objects.filter(pk=Post.objects.create(
+                author=self.user, text=f'Дата {number}'
+            ).pk).update(pub_date=timezone.make_aware(moment, timezone.utc))
+        indexed = IndexedDatesQuerySet(Post)
+        days = sorted({
+            timezone.localtime(moment).date()
+            for moment in Post.objects.values_list('pub_date', flat=True)
+        })
+        for kind in ('year', 'month', 'day'):
+            with self.subTest(kind=kind):
+                self.assertEqual(
+                    indexed.dates('pub_date', kind),
+                    sorted({
+                        indexed.truncate(day, kind) for day in days
+                    }),
+                )
+        self.assertEqual(
+            indexed.filter(pub_date__year=2021).dates(
+                'pub_date', 'month', order='DESC'
+            ),
+            [date(2021, 3, 1), date(2021, 2, 1), date(2021, 1, 1)],
+        )
+        response = self.client.get(self.url, {'pub_date__year': 2021})
+        self.assertContains(response, 'pub_date__month=2')
+
+    def test_dates_in_one_query(self):
+        """Все периоды иерархии дат находятся одним запросом"""
+        for day in (1, 2, 5):
+            Post.objects.filter(pk=Post.objects.create(
+                author=self.user, text=f'День {day}'
+            ).pk).update(pub_date=timezone.make_aware(datetime(2021, 1, day)))
+        with CaptureQueriesContext(connection) as queries:
+            days = IndexedDatesQuerySet(Post).dates('pub_date', 'day')
+        self.assertEqual(
+            days, [date(2021, 1, 1), date(2021, 1, 2), date(2021, 1, 5)]
+        )
+        self.assertEqual(len(queries), 1)
+
+    def test_only_date_bounds_are_split(self):
+        """По краям индекса берутся только MIN и MAX поля иерархии дат"""
+        self.create_posts(3)
+        queryset = IndexedDatesQuerySet(Post)
+        queryset.date_field = 'pub_date'
+        queryset = queryset.filter(text__startswith='Пост')
+        with CaptureQueriesContext(connection) as queries:
+            bounds = queryset.aggregate(
+                first=Min('pub_date'), last=Max('pub_date')
+            )
+        self.assertEqual(len(queries), 2)
+        self.assertLessEqual(bounds['first'], bounds['last'])
+        for aggregates in (
+            {'first': Min('pk'), 'last': Max('pk')},
+            {'first': Min('pub_date')},
+            {'first': Min('pub_date'), 'last': Max('pk')},
+        ):
+            with self.subTest(aggregates=list(aggregates)):
+                with CaptureQueriesContext(connection) as queries:
+                    queryset.aggregate(**aggregates)
+                self.assertEqual(len(queries), 1)
+
+    def test_other_changelists(self):
+        """Списки комментариев и подписок открываются с поиском"""
+        post = Post.objects.create(author=self.user, text='Пост')
+        post.comments.create(author=self.admin, text='Комментарий')
+        self.user.following.create(user=self.admin)
+        for name in ('comment', 'follow'):
+            with self.subTest(name=name):
+                url = reverse(f'admin:posts_{name}_changelist')
+                self.assertEqual(self.client.get(url).status_code, 200)
+                response = self.client.get(url, {'q': 'admin'})
+                self.assertEqual(response.status_code, 200)
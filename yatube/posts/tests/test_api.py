@@ -0,0 +1,141 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='auth', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user, group=cls.group, text=f'Пост {number}'
+            )
+            for number in range(settings.COUNTER + 3)
+        ]
+        cls.post = cls.posts[-1]
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def get(self, name, params=None, **kwargs):
+        response = self.client.get(reverse(f'api_v1:{name}', kwargs=kwargs),
+                                   params or {})
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return response
+
+    def test_feeds_match_pages(self):
+        """Ленты API отдают те же посты, что и HTML-страницы"""
+        feeds = (
+            ('posts', 'posts:index', {}),
+            ('group_posts', 'posts:group_list', {'slug': self.group.slug}),
+            ('profile_posts', 'posts:profile', {'username': 'auth'}),
+        )
+        for name, page, kwargs in feeds:
+            with self.subTest(name=name):
+                data = self.get(name, **kwargs).json()
+                html = self.client.get(reverse(page, kwargs=kwargs))
+                self.assertEqual(
+                    [post['id'] for post in data['results']],
+                    [post.id for post in html.context['page_obj']],
+                )
+
+    def test_cursor_pagination(self):
+        """Лента листается ссылками next и previous"""
+        first = self.get('posts').json()
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).json()
+        self.assertEqual(
+            [post['id'] for post in first['results'] + second['results']],
+            [post.id for post in reversed(self.posts)],
+        )
+        self.assertIsNone(second['next'])
+        back = self.client.get(second['previous']).json()
+        self.assertEqual(back['results'], first['results'])
+
+    def test_post_payload(self):
+        """Пост отдаётся компактно, с автором и группой"""
+        data = self.get('post', post_id=self.post.id).json()
+        self.assertEqual(data['text'], self.post.text)
+        self.assertEqual(
+            data['author'], {'username': 'auth', 'name': 'Лев Толстой'}
+        )
+        self.assertEqual(
+            data['group'], {'slug': 'test-slug', 'title': 'Тестовая группа'}
+        )
+        self.assertEqual(data['comments_count'], 0)
+        self.assertIsNone(data['image'])
+
+    def test_sparse_fields(self):
+        """?fields оставляет только перечисленные поля"""
+        data = self.get('posts', {'fields': 'id,author'}).json()
+        self.assertEqual(set(data['results'][0]), {'id', 'author'})
+        self.assertIn('fields=id%2Cauthor', data['next'])
+        response = self.get('posts', {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['error'])
+
+    def test_unknown_params_share_cache(self):
+        """Посторонние параметры не заводят записей и не попадают в ссылки"""
+        first = self.get('posts', {'fields': 'id'})
+        with self.assertNumQueries(0):
+            other = self.get('posts', {'fields': 'id,id', 'x': '1'})
+        self.assertEqual(other.content, first.content)
+        self.assertNotIn('x=1', other.json()['next'])
+
+    def test_etag(self):
+        """Повтор с If-None-Match получает 304, изменения меняют ETag"""
+        etag = self.get('posts')['ETag']
+        response = self.client.get(
+            reverse('api_v1:posts'), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(author=self.user, text='Свежий пост')
+        self.assertNotEqual(self.get('posts')['ETag'], etag)
+        etag = self.get('group', slug=self.group.slug)['ETag']
+        response = self.client.get(
+            reverse('api_v1:group', kwargs={'slug': self.group.slug}),
+            HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_group_and_profile(self):
+        """Группа и профиль отдают счётчики"""
+        group = self.get('group', slug=self.group.slug).json()
+        self.assertEqual(group['posts_count'], len(self.posts))
+        profile = self.get('profile', username='auth').json()
+        self.assertEqual(profile['name'], 'Лев Толстой')
+        self.assertEqual(profile['posts_count'], len(self.posts))
+
+    def test_not_found(self):
+        """Несуществующие объекты — 404 в JSON"""
+        for name, kwargs in (
+            ('post', {'post_id': 0}),
+            ('group', {'slug': 'missing'}),
+            ('group_posts', {'slug': 'missing'}),
+            ('profile_posts', {'username': 'missing'}),
+        ):
+            with self.subTest(name=name):
+                response = self.get(name, **kwargs)
+                self.assertEqual(response.status_code, 404)
+                self.assertIn('error', response.json())
+
+    def test_read_only(self):
+        """API только читает"""
+        response = self.client.post(reverse('api_v1:posts'))
+        self.assertEqual(response.status_code, 405)
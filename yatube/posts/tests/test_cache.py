@@ -0,0 +1,294 @@
+import re
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.cache import CARD_TEMPLATE, bump, get_version
+from posts.models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+CSRF_TOKEN = re.compile(r'name="csrfmiddlewaretoken" value="\w+"')
+
+
+class FragmentCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Author')
+        cls.other = User.objects.create_user(username='Other')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый текст', author=cls.user, group=cls.group
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+        cache.clear()
+
+    def urls(self):
+        return {
+            'index': reverse('posts:index'),
+            'group': reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}
+            ),
+            'other_group': reverse(
+                'posts:group_list', kwargs={'slug': self.other_group.slug}
+            ),
+            'profile': reverse(
+                'posts:profile', kwargs={'username': self.user}
+            ),
+            'other_profile': reverse(
+                'posts:profile', kwargs={'username': self.other}
+            ),
+            'follow': reverse('posts:follow_index'),
+            'detail': reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.pk}
+            ),
+        }
+
+    def render_all(self):
+        return {
+            name: CSRF_TOKEN.sub(
+                '', self.authorized_client.get(url).content.decode()
+            )
+            for name, url in self.urls().items()
+        }
+
+    def changed_pages(self, action):
+        before = self.render_all()
+        action()
+        after = self.render_all()
+        return {name for name in before if before[name] != after[name]}
+
+    def test_unchanged_pages_served_from_cache(self):
+        """Без изменений моделей фрагменты берутся из кэша"""
+        self.render_all()
+        Post.objects.filter(pk=self.post.pk).update(text='Мимо сигналов')
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=self.reader, text='Без сигнала')
+        ])
+        pages = self.render_all()
+        detail = pages.pop('detail')
+        self.assertNotIn('Мимо сигналов', ''.join(pages.values()))
+        self.assertNotIn('Без сигнала', detail)
+
+    def test_post_edit_refreshes_only_its_pages(self):
+        """Правка поста сбрасывает только страницы, где он показан"""
+        def edit():
+            self.post.text = 'Исправленный текст'
+            self.post.save()
+
+        self.assertEqual(
+            self.changed_pages(edit),
+            {'index', 'group', 'profile', 'follow', 'detail'}
+        )
+
+    def test_new_post_refreshes_feeds(self):
+        """Новый пост другого автора не трогает чужие страницы"""
+        self.assertEqual(
+            self.changed_pages(lambda: Post.objects.create(
+                text='Новый пост', author=self.other, group=self.other_group
+            )),
+            {'index', 'other_group', 'other_profile'}
+        )
+
+    def test_comment_refreshes_post_detail(self):
+        """Комментарий сбрасывает только страницу поста"""
+        self.assertEqual(
+            self.changed_pages(lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий'
+            )),
+            {'detail'}
+        )
+
+    def test_group_rename_refreshes_cards(self):
+        """Переименование группы обновляет карточки постов"""
+        def rename():
+            self.group.title = 'Новое название'
+            self.group.save()
+
+        self.assertIn('index', self.changed_pages(rename))
+
+    def test_generation_survives_eviction(self):
+        """Вытесненное поколение не совпадает с прежним"""
+        version = get_version('index')
+        bump('index')
+        bumped = get_version('index')
+        self.assertNotEqual(version, bumped)
+        cache.clear()
+        self.assertNotIn(get_version('index'), (version, bumped))
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый текст', author=cls.user, group=cls.group
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user}),
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def test_repeated_request_skips_view(self):
+        """Повторный запрос отдаётся из кэша без запросов ленты"""
+        for url, queries in zip(self.urls, (0, 1, 1)):
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                with self.assertNumQueries(queries):
+                    second = self.guest_client.get(url)
+                self.assertEqual(first.content, second.content)
+                self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_unknown_params_share_entry(self):
+        """Посторонние параметры и битый курсор не заводят новых записей"""
+        self.guest_client.get(self.urls[0])
+        for query in ('?x=1', '?x=2&y=3', '?after=zzz', '?before=zzz'):
+            with self.subTest(query=query), self.assertNumQueries(0):
+                self.guest_client.get(self.urls[0] + query)
+
+    def test_conditional_get_returns_not_modified(self):
+        """Совпавший ETag даёт 304"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                by_etag = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(by_etag.status_code, 304)
+
+    def test_edit_not_hidden_by_modified_since(self):
+        """Правка поста и группы не прячется за If-Modified-Since"""
+        first = self.guest_client.get(self.urls[0])
+        self.assertNotIn('Last-Modified', first)
+        self.post.text = 'Исправленный текст'
+        self.post.save()
+        self.group.title = 'Новое название'
+        self.group.save()
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE='Sun, 01 Jan 2090 00:00:00 GMT'
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Исправленный текст')
+
+    def test_model_change_invalidates_page(self):
+        """Новый пост меняет ETag и содержимое страниц"""
+        etags = [self.guest_client.get(url)['ETag'] for url in self.urls]
+        Post.objects.create(
+            text='Новый пост', author=self.user, group=self.group
+        )
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Новый пост')
+
+    def test_authorized_pages_not_cached(self):
+        """Страницы авторизованных пользователей целиком не кэшируются"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertNotIn('ETag', response)
+                self.assertIsNotNone(response.context)
+
+
+class CardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.user, group=cls.group
+            )
+            for number in range(3)
+        ]
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+        cache.clear()
+
+    def rendered_cards(self, url):
+        response = self.client.get(url)
+        return [
+            template.name for template in response.templates
+        ].count(CARD_TEMPLATE)
+
+    def test_cards_shared_between_pages(self):
+        """Карточки главной страницы не рисуются заново в ленте подписок"""
+        self.assertEqual(self.rendered_cards(reverse('posts:index')), 3)
+        self.assertEqual(
+            self.rendered_cards(reverse('posts:follow_index')), 0
+        )
+
+    def test_edit_renders_only_changed_card(self):
+        """После правки поста заново рисуется только его карточка"""
+        self.rendered_cards(reverse('posts:index'))
+        post = self.posts[0]
+        post.text = 'Исправленный текст'
+        post.save()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Исправленный текст')
+        self.assertEqual([
+            template.name for template in response.templates
+        ].count(CARD_TEMPLATE), 1)
+
+    def test_variants_cached_separately(self):
+        """Карточки группы без ссылки на группу кэшируются отдельно"""
+        self.rendered_cards(reverse('posts:index'))
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.assertEqual(self.rendered_cards(url), 3)
+        self.assertNotContains(
+            self.client.get(url), 'все записи группы'
+        )
+
+    def test_fragment_ignores_unknown_params(self):
+        """Фрагмент ленты один для адресов с посторонними параметрами"""
+        url = reverse('posts:index')
+        self.client.get(url)
+        with mock.patch('posts.templatetags.post_cards.cards') as cards:
+            self.client.get(url + '?x=1&after=zzz')
+        cards.assert_not_called()
@@ -0,0 +1,103 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, Profile
+
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def assertCounters(self, obj, **expected):
+        obj.refresh_from_db()
+        for field, value in expected.items():
+            with self.subTest(obj=obj, field=field):
+                self.assertEqual(getattr(obj, field), value)
+
+    def test_post_counters(self):
+        """Создание, перенос и удаление поста меняют счётчики"""
+        post = Post.objects.create(
+            text='Текст', author=self.user, group=self.group
+        )
+        self.assertCounters(self.user.profile, posts_count=1)
+        self.assertCounters(self.group, posts_count=1)
+        post.group = self.other_group
+        post.save()
+        self.assertCounters(self.group, posts_count=0)
+        self.assertCounters(self.other_group, posts_count=1)
+        post.delete()
+        self.assertCounters(self.user.profile, posts_count=0)
+        self.assertCounters(self.other_group, posts_count=0)
+
+    def test_comment_counter(self):
+        """Комментарии считаются у поста"""
+        post = Post.objects.create(text='Текст', author=self.user)
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий'
+        )
+        self.assertCounters(post, comments_count=1)
+        comment.delete()
+        self.assertCounters(post, comments_count=0)
+
+    def test_follow_counters(self):
+        """Подписка и отписка меняют счётчики обоих пользователей"""
+        follow = Follow.objects.create(user=self.reader, author=self.user)
+        self.assertCounters(self.user.profile, followers_count=1)
+        self.assertCounters(self.reader.profile, following_count=1)
+        follow.delete()
+        self.assertCounters(self.user.profile, followers_count=0)
+        self.assertCounters(self.reader.profile, following_count=0)
+
+    def test_pages_read_stored_counters(self):
+        """Страницы поста и профиля не пересчитывают посты автора"""
+        post = Post.objects.create(text='Текст', author=self.user)
+        urls = (
+            reverse('posts:post_detail', kwargs={'post_id': post.id}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.guest_client.get(url)
+                self.assertContains(response, 'постов')
+                self.assertFalse(
+                    [q for q in queries if 'COUNT(' in q['sql'].upper()]
+                )
+
+    def test_recount_command(self):
+        """Команда recount находит и исправляет расхождения"""
+        Post.objects.create(text='Текст', author=self.user, group=self.group)
+        Profile.objects.filter(user=self.user).update(posts_count=5)
+        Profile.objects.filter(user=self.reader).delete()
+        with self.assertRaises(CommandError):
+            call_command('recount', check=True, stdout=StringIO())
+        call_command('recount', stdout=StringIO())
+        call_command('recount', check=True, stdout=StringIO())
+        self.assertCounters(self.user.profile, posts_count=1)
+        self.assertTrue(Profile.objects.filter(user=self.reader).exists())
@@ -0,0 +1,83 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db.models import Count, F
+from django.test import TransactionTestCase, override_settings
+
+from posts import thumbnails
+from posts.generator import Generator
+from posts.models import Comment, Follow, Group, Post, User
+from posts.search import search_posts
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class GenerateDataTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_command_creates_requested_volumes(self):
+        """Команда создаёт заданное число записей и пересчитывает счётчики"""
+        output = StringIO()
+        call_command(
+            'generate_data', users=20, groups=3, posts=60, comments=40,
+            follows=4, images=0, stdout=output,
+        )
+        self.assertIn('posts: 60 записей', output.getvalue())
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 40)
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+        self.assertEqual(
+            sum(user.profile.posts_count for user in User.objects.all()), 60
+        )
+        for comment in Comment.objects.select_related('post'):
+            self.assertGreaterEqual(comment.created, comment.post.pub_date)
+
+    def test_second_run_adds_records(self):
+        """Повторный запуск с тем же seed дописывает новые записи"""
+        options = dict(
+            users=5, groups=2, posts=10, comments=5, follows=2, images=0,
+            stdout=StringIO(),
+        )
+        call_command('generate_data', **options)
+        call_command('generate_data', **options)
+        self.assertEqual(User.objects.count(), 10)
+        self.assertEqual(Group.objects.count(), 4)
+        self.assertEqual(Post.objects.count(), 20)
+        # Поиск после импорта по-прежнему видит новые посты.
+        Post.objects.create(author=User.objects.first(), text='Эпилог')
+        self.assertEqual(len(search_posts('Эпилог')), 1)
+
+    def test_follows_are_skewed(self):
+        """С перекосом у первых авторов подписчиков больше, чем у последних"""
+        Generator(users=50, posts=10, comments=0, follows=5, skew=1.5).run()
+        readers = dict(User.objects.annotate(
+            readers=Count('following')
+        ).values_list('pk', 'readers'))
+        ranked = sorted(readers, key=lambda pk: -readers[pk])
+        self.assertEqual(ranked[0], min(readers))
+        self.assertGreater(readers[ranked[0]], 5 * readers[max(readers)])
+
+    def test_images_have_thumbnails(self):
+        """Картинки постов сохраняются вместе с готовыми миниатюрами"""
+        with mock.patch('posts.generator.IMAGE_POOL', 2):
+            Generator(users=2, posts=5, comments=0, follows=0,
+                      images=1).run()
+        posts = Post.objects.all()
+        self.assertLessEqual(len({post.image.name for post in posts}), 2)
+        for post in posts:
+            self.assertTrue(post.image)
+            self.assertNotIn('data:', thumbnails.picture(post.image)[0]['src'])
+
+    def test_bad_share_of_images(self):
+        """Доля картинок вне [0, 1] — ошибка команды"""
+        with self.assertRaises(CommandError):
+            call_command('generate_data', images=2, stdout=StringIO())
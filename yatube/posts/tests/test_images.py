@@ -0,0 +1,102 @@
+import io
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from core.models import StoredFile
+from posts.images import EXIF_ORIENTATION, normalize
+from posts.models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_upload(name, size, fmt='JPEG', mode='RGB', orientation=None):
+    image = Image.new(mode, size, 'red')
+    options = {}
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = orientation
+        options['exif'] = exif.tobytes()
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **options)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+@override_settings(POST_IMAGE_MAX_SIDE=100)
+class NormalizeTests(TestCase):
+    def test_small_image_is_kept(self):
+        """Небольшая картинка без поворота сохраняется байт в байт"""
+        upload = make_upload('small.jpg', (80, 60))
+        content = upload.read()
+        self.assertIs(normalize(upload), upload)
+        self.assertEqual(upload.read(), content)
+
+    def test_large_image_is_bounded(self):
+        """Большая картинка ужимается до POST_IMAGE_MAX_SIDE"""
+        result = normalize(make_upload('large.jpg', (1000, 500)))
+        self.assertEqual(Image.open(result).size, (100, 50))
+        self.assertEqual(result.name, 'large.jpg')
+
+    def test_exif_orientation_applied_once(self):
+        """Поворот из EXIF применяется, а метка поворота убирается"""
+        result = normalize(make_upload('turned.jpg', (80, 40), orientation=6))
+        image = Image.open(result)
+        self.assertEqual(image.size, (40, 80))
+        self.assertEqual(image.getexif().get(EXIF_ORIENTATION, 1), 1)
+
+    def test_transparent_image_stays_png(self):
+        """Картинка с прозрачностью пересжимается в PNG"""
+        result = normalize(
+            make_upload('alpha.png', (400, 200), fmt='PNG', mode='RGBA')
+        )
+        image = Image.open(result)
+        self.assertEqual((image.format, image.mode), ('PNG', 'RGBA'))
+        self.assertEqual(result.name, 'alpha.png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_IMAGE_MAX_SIDE=100)
+class UploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_create_post_stores_bounded_image(self):
+        """В хранилище попадает уже ужатый оригинал"""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            {'text': 'Большая картинка',
+             'image': make_upload('photo.png', (600, 300), fmt='PNG')},
+        )
+        post = Post.objects.get(text='Большая картинка')
+        self.assertEqual(post.image.name, 'posts/photo.jpg')
+        self.assertEqual((post.image.width, post.image.height), (100, 50))
+
+    def test_deleted_post_releases_image(self):
+        """Удалённый пост отпускает картинку, если она больше не нужна"""
+        post = Post.objects.create(
+            text='Пост', author=self.user,
+            image=make_upload('meme.jpg', (50, 50)),
+        )
+        name = post.image.name
+        shared = Post.objects.create(text='Та же', author=self.user)
+        Post.objects.filter(pk=shared.pk).update(image=name)
+        post.delete()
+        self.assertTrue(StoredFile.objects.filter(name=name).exists())
+        Post.objects.get(pk=shared.pk).delete()
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
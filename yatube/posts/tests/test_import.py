@@ -0,0 +1,168 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TransactionTestCase
+
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+from posts.search import search_posts
+
+
+class ImportDataTests(TransactionTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        # Уже существующие записи: новые id должны идти после них.
+        self.existing = User.objects.create_user(username='existing')
+        self.users = self.write_csv('users.csv', [
+            {'id': 10, 'username': 'leo', 'first_name': 'Лев'},
+            {'id': 20, 'username': 'anna', 'first_name': ''},
+        ])
+        self.groups = self.write_ndjson('groups.ndjson', [
+            {'id': 'g1', 'title': 'Романы', 'slug': 'novels'},
+        ])
+        self.posts = self.write_ndjson('posts.ndjson', [
+            {'id': number, 'author': 10, 'group': 'g1' if number % 2 else '',
+             'text': f'Глава {number} про войну',
+             'pub_date': f'1869-01-{number:02d}T12:00:00'}
+            for number in range(1, 8)
+        ])
+        self.comments = self.write_csv('comments.csv', [
+            {'id': 100, 'post': 1, 'author': 20, 'text': 'Длинно',
+             'created': '1870-01-01T00:00:00+00:00'},
+            {'id': 101, 'post': 1, 'author': 20, 'text': 'Но хорошо',
+             'created': ''},
+        ])
+        self.follows = self.write_csv('follows.csv', [
+            {'user': 20, 'author': 10},
+            {'user': 20, 'author': 10},
+            {'user': 10, 'author': 10},
+        ])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_csv(self, name, rows):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', newline='', encoding='utf-8') as output:
+            writer = csv.DictWriter(output, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+    def write_ndjson(self, name, rows):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as output:
+            for row in rows:
+                output.write(json.dumps(row, ensure_ascii=False) + '\n')
+        return path
+
+    def test_batch_size_must_be_positive(self):
+        """Пачка меньше одной записи отклоняется до импорта"""
+        for size in (0, -5):
+            with self.subTest(size=size):
+                with self.assertRaisesMessage(CommandError, '--batch-size'):
+                    self.run_import(batch_size=size)
+        self.assertFalse(Post.objects.exists())
+
+    def run_import(self, **options):
+        output = StringIO()
+        call_command(
+            'import_data',
+            users=self.users,
+            groups=self.groups,
+            posts=self.posts,
+            comments=self.comments,
+            follows=self.follows,
+            stdout=output,
+            **options,
+        )
+        return output.getvalue()
+
+    def test_import(self):
+        """Записи и ссылки между ними переносятся, данные пересобираются"""
+        report = self.run_import(batch_size=3)
+        self.assertIn('posts: 7 записей', report)
+        leo = User.objects.get(username='leo')
+        anna = User.objects.get(username='anna')
+        self.assertGreater(leo.pk, self.existing.pk)
+        self.assertFalse(leo.has_usable_password())
+        group = Group.objects.get(slug='novels')
+        self.assertEqual(Post.objects.filter(author=leo).count(), 7)
+        self.assertEqual(group.posts_count, 4)
+        first = Post.objects.get(text='Глава 1 про войну')
+        self.assertEqual(first.pub_date.year, 1869)
+        self.assertEqual(first.group, group)
+        self.assertEqual(first.comments_count, 2)
+        self.assertEqual(
+            Comment.objects.get(text='Длинно').created.year, 1870
+        )
+        self.assertEqual(Follow.objects.get().user, anna)
+        self.assertEqual(leo.profile.posts_count, 7)
+        self.assertEqual(leo.profile.followers_count, 1)
+        self.assertEqual(TimelineEntry.objects.filter(user=anna).count(), 7)
+        self.assertEqual(len(search_posts('войну')), 7)
+        # Триггеры поиска вернулись после импорта.
+        Post.objects.create(author=leo, text='Эпилог про войну')
+        self.assertEqual(len(search_posts('войну')), 8)
+
+    def test_unknown_reference(self):
+        """Ссылка на неизвестную запись останавливает импорт"""
+        self.comments = self.write_csv('comments.csv', [
+            {'id': 100, 'post': 999, 'author': 20, 'text': 'Куда?'},
+        ])
+        with self.assertRaisesMessage(CommandError, '999'):
+            self.run_import()
+
+    def test_database_error_keeps_search_triggers(self):
+        """Ошибка базы посреди импорта не отключает поиск"""
+        self.users = self.write_csv('users.csv', [
+            {'id': 10, 'username': 'leo'},
+            {'id': 20, 'username': 'existing'},
+        ])
+        with self.assertRaisesMessage(CommandError, 'UNIQUE'):
+            self.run_import(batch_size=1)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM sqlite_master WHERE type = 'trigger'"
+                " AND name LIKE 'posts_post_fts_%'"
+            )
+            self.assertEqual(cursor.fetchone()[0], 3)
+        Post.objects.create(author=self.existing, text='Пост про войну')
+        self.assertEqual(len(search_posts('войну')), 1)
+
+    def test_resume_after_failure(self):
+        """Импорт продолжается с места сбоя без повторов"""
+        checkpoint = os.path.join(self.directory, 'state')
+        bulk_create = Post.objects.bulk_create
+        calls = []
+
+        def failing(objects, *args, **kwargs):
+            calls.append(len(objects))
+            if len(calls) == 2:
+                raise OSError('диск отключился')
+            return bulk_create(objects, *args, **kwargs)
+
+        with mock.patch.object(Post.objects, 'bulk_create', failing):
+            with self.assertRaises(CommandError):
+                self.run_import(batch_size=3, checkpoint=checkpoint)
+        self.assertEqual(Post.objects.count(), 3)
+        self.run_import(batch_size=3, checkpoint=checkpoint)
+        self.assertEqual(Post.objects.count(), 7)
+        self.assertEqual(User.objects.count(), 3)
+        self.assertEqual(Comment.objects.count(), 2)
+
+    def test_resume_after_unrecorded_commit(self):
+        """Пачка, записанная без отметки о прогрессе, не пишется второй раз"""
+        checkpoint = os.path.join(self.directory, 'state')
+        self.run_import(batch_size=3, checkpoint=checkpoint)
+        with open(os.path.join(checkpoint, 'progress.json'), 'w') as output:
+            json.dump({'users': 2, 'groups': 1, 'posts': 3}, output)
+        self.run_import(batch_size=3, checkpoint=checkpoint)
+        self.assertEqual(Post.objects.count(), 7)
+        self.assertEqual(Comment.objects.count(), 2)
@@ -0,0 +1,127 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.queries import capture_queries
+from posts import api_urls, urls
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Сколько SQL-запросов может сделать адрес при пустом кэше:
+# (гость, пользователь). У пользователя сверху запросы сессии и его самого.
+# Данные теста таковы, что запрос на каждую карточку или комментарий
+# выходит за бюджет.
+BUDGETS = {
+    'posts:index': (2, 3),
+    'posts:group_list': (4, 4),
+    'posts:profile': (4, 5),
+    'posts:post_detail': (2, 4),
+    'posts:search': (2, 4),
+    'posts:post_create': (0, 3),
+    'posts:post_edit': (0, 4),
+    'posts:post_comments': (2, 2),
+    'posts:add_comment': (0, 3),
+    'posts:follow_index': (0, 4),
+    'posts:profile_follow': (0, 3),
+    'posts:profile_unfollow': (0, 4),
+    'api_v1:posts': (2, 3),
+    'api_v1:post': (2, 3),
+    'api_v1:group': (1, 1),
+    'api_v1:group_posts': (4, 4),
+    'api_v1:profile': (1, 1),
+    'api_v1:profile_posts': (4, 4),
+}
+NAMESPACES = (('posts', urls), ('api_v1', api_urls))
+
+
+class QueryBudgetTests(TestCase):
+    """Число запросов каждого адреса не больше бюджета из BUDGETS.
+
+    При превышении в сообщении теста — отчёт capture_queries: одинаковые
+    запросы, сгруппированные по строкам шаблонов.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='Описание'
+        )
+        cls.user = User.objects.create_user(
+            username='auth', first_name='Лев', last_name='Толстой'
+        )
+        others = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(settings.COUNTER)
+        ]
+        Follow.objects.bulk_create([
+            Follow(user=cls.user, author=author) for author in others
+        ])
+        # Целая страница постов одного автора и целая страница постов
+        # разных авторов: в лентах, группе и профиле по карточке на пост.
+        for author in [cls.user] * settings.COUNTER + others:
+            cls.post = Post.objects.create(
+                text='Тестовый пост', author=author, group=cls.group
+            )
+        cls.post = Post.objects.filter(author=cls.user).first()
+        Comment.objects.bulk_create([
+            Comment(post=cls.post, author=author, text='Комментарий')
+            for author in others
+        ])
+        cls.kwargs = {
+            'post_id': cls.post.pk,
+            'slug': cls.group.slug,
+            'username': cls.user.username,
+        }
+
+    def setUp(self):
+        self.clients = (Client(), Client())
+        self.clients[1].force_login(self.user)
+
+    def routes(self):
+        for namespace, module in NAMESPACES:
+            for pattern in module.urlpatterns:
+                yield f'{namespace}:{pattern.name}', pattern
+
+    def url(self, name, pattern):
+        url = reverse(name, kwargs={
+            key: self.kwargs[key] for key in pattern.pattern.converters
+        })
+        if name == 'posts:search':
+            url += '?q=пост'
+        return url
+
+    def assertWithinBudget(self, client, url, budget):
+        cache.clear()
+        with capture_queries() as queries:
+            client.get(url)
+        if len(queries) > budget:
+            self.fail(
+                f'{url}: {len(queries)} запросов при бюджете {budget}.\n'
+                + queries.report()
+            )
+
+    def test_every_route_has_budget(self):
+        """У каждого адреса posts и API есть бюджет"""
+        self.assertEqual(
+            {name for name, _ in self.routes()}, set(BUDGETS)
+        )
+
+    def test_guest_budgets(self):
+        """Гость укладывается в бюджет запросов"""
+        for name, pattern in self.routes():
+            with self.subTest(name=name):
+                self.assertWithinBudget(
+                    self.clients[0], self.url(name, pattern), BUDGETS[name][0]
+                )
+
+    def test_authorized_budgets(self):
+        """Пользователь укладывается в бюджет запросов"""
+        for name, pattern in self.routes():
+            with self.subTest(name=name):
+                self.assertWithinBudget(
+                    self.clients[1], self.url(name, pattern), BUDGETS[name][1]
+                )
@@ -0,0 +1,98 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?posts_\w+( AS \w+)?$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+class QueryPlanTests(TestCase):
+    """Запросы лент и комментариев идут по индексам.
+
+    Для каждого запроса к таблицам posts_* выполняется
+    EXPLAIN QUERY PLAN: полный просмотр таблицы или сортировка
+    во временном B-дереве считаются ошибкой. ANALYZE не запускается:
+    статистика по десятку строк толкает планировщик к полному просмотру.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        Post.objects.bulk_create([
+            Post(text=f'Пост {number}', author=cls.user, group=cls.group)
+            for number in range(15)
+        ])
+        cls.post = Post.objects.create(
+            text='Пост с комментариями', author=cls.user, group=cls.group
+        )
+        Comment.objects.bulk_create([
+            Comment(post=cls.post, author=cls.reader, text=f'Ответ {number}')
+            for number in range(5)
+        ])
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+        cache.clear()
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertIndexedQueries(self, client, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url, params)
+        statements = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT') and 'posts_' in query['sql']
+        ]
+        self.assertTrue(statements)
+        for sql in statements:
+            for detail in self.explain(sql):
+                with self.subTest(url=url, params=params, sql=sql):
+                    self.assertNotRegex(detail, FULL_SCAN)
+                    self.assertNotIn(TEMP_SORT, detail)
+
+    def test_feed_pages_use_indexes(self):
+        """Ленты index, group_list, profile, follow_index"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:follow_index'),
+        )
+        first_page = self.authorized_client.get(urls[0]).context['page_obj']
+        for url in urls:
+            for params in (
+                None,
+                {'after': first_page.paginator.next_cursor},
+                {'page': 2},
+            ):
+                self.assertIndexedQueries(self.authorized_client, url, params)
+
+    def test_post_detail_uses_indexes(self):
+        """Страница поста и её комментарии"""
+        self.assertIndexedQueries(
+            self.guest_client,
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        )
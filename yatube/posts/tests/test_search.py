@@ -0,0 +1,123 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post
+from posts.search import SearchPaginator, search_posts, to_query
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.cats = Post.objects.create(
+            author=cls.user,
+            text='Коты спят на солнце. Коты любят солнце.',
+            group=cls.group,
+        )
+        cls.dogs = Post.objects.create(
+            author=cls.other,
+            text='Собаки гуляют под солнцем',
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def found(self, text, **filters):
+        return list(search_posts(text, **filters))
+
+    def test_query_escapes_syntax(self):
+        """Синтаксис FTS5 из запроса ищется как обычные слова"""
+        self.assertEqual(
+            to_query('коты AND "солнце*'), '"коты" "AND" "солнце"'
+        )
+        self.assertEqual(to_query(' ?! '), '')
+        self.assertEqual(self.found('коты OR NEAR('), [])
+
+    def test_search_all_words(self):
+        """Находятся посты со всеми словами запроса, без учёта регистра"""
+        self.assertEqual(self.found('КОТЫ солнце'), [self.cats])
+        self.assertEqual(self.found('гуляют'), [self.dogs])
+        self.assertEqual(self.found('коты гуляют'), [])
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при создании, правке и удалении поста"""
+        post = Post.objects.create(author=self.user, text='Ежик в тумане')
+        self.assertEqual(self.found('ЕЖИК'), [post])
+        post.text = 'Медвежонок в тумане'
+        post.save()
+        self.assertEqual(self.found('ЕЖИК'), [])
+        self.assertEqual(self.found('медвежонок'), [post])
+        Post.objects.filter(pk=post.pk).update(text='Лошадка в тумане')
+        self.assertEqual(self.found('лошадка'), [post])
+        post.delete()
+        self.assertEqual(self.found('тумане'), [])
+
+    def test_filters(self):
+        """Результаты фильтруются по группе и автору"""
+        self.assertEqual(self.found('солнце', group=self.group), [self.cats])
+        self.assertEqual(self.found('солнцем', author=self.other), [self.dogs])
+        self.assertEqual(self.found('солнцем', author=self.user), [])
+
+    def test_best_match_first(self):
+        """Лучшее совпадение стоит первым, страницы листаются курсором"""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Кот номер {number}')
+            for number in range(5)
+        )
+        paginator = SearchPaginator(search_posts('кот коты'), 2)
+        page = paginator.get_page()
+        seen = list(page)
+        while paginator.next_cursor:
+            cursor = paginator.next_cursor
+            paginator = SearchPaginator(search_posts('кот коты'), 2)
+            seen += list(paginator.get_page(after=cursor))
+        scores = [post.score for post in seen]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertEqual(len(set(seen)), len(seen))
+
+    def test_search_page(self):
+        """Страница поиска показывает найденное и сохраняет запрос в ссылках"""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Солнце номер {number}')
+            for number in range(12)
+        )
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': 'солнце', 'group': ''}
+        )
+        self.assertTemplateUsed(response, 'posts/search.html')
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertContains(response, '?q=%D1%81%D0%BE%D0%BB%D0%BD')
+        self.assertContains(response, '&amp;after=')
+
+    def test_search_page_unknown_author(self):
+        """Неизвестный автор — ошибка формы, а не пустой поиск"""
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': 'солнце', 'author': 'nobody'}
+        )
+        self.assertIsNone(response.context['page_obj'])
+        self.assertFormError(response, 'form', 'author', 'Такого автора нет.')
+
+    def test_rebuild_restores_triggers(self):
+        """rebuild_search возвращает триггеры и заполняет индекс"""
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER posts_post_fts_insert')
+        post = Post.objects.create(author=self.user, text='Пропущенный пост')
+        self.assertEqual(self.found('пропущенный'), [])
+        call_command('rebuild_search', stdout=StringIO())
+        self.assertEqual(self.found('пропущенный'), [post])
+        Post.objects.create(author=self.user, text='Следующий пост')
+        self.assertEqual(len(self.found('пост')), 2)
@@ -0,0 +1,207 @@
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings,
+)
+from django.urls import reverse
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from core import timing
+from posts import thumbnails
+from posts.models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=cls.user,
+            image=SimpleUploadedFile(
+                'small.gif', SMALL_GIF, content_type='image/gif'
+            ),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def test_page_shows_placeholder_without_pillow(self):
+        """Пока миниатюры нет, страница отдаёт заглушку и не зовёт Pillow"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        with mock.patch('sorl.thumbnail.default.engine') as engine:
+            response = self.guest_client.get(url)
+        self.assertFalse(engine.method_calls)
+        self.assertContains(response, 'src="data:image/svg+xml,')
+        self.assertContains(response, 'width="960"')
+        self.assertContains(response, 'height="339"')
+
+    def test_generated_thumbnail_replaces_placeholder(self):
+        """Готовая миниатюра сменяет заглушку и в кэшированной ленте"""
+        url = reverse('posts:index')
+        self.assertContains(self.guest_client.get(url), 'data:image/svg+xml,')
+        thumbnails.generate(self.post.image.name)
+        response = self.guest_client.get(url)
+        self.assertNotContains(response, 'data:image/svg+xml,')
+        self.assertContains(response, '/media/cache/')
+
+    def test_picture_lists_all_widths(self):
+        """Картинка отдаётся набором ширин в srcset"""
+        thumbnails.generate(self.post.image.name)
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        response = self.guest_client.get(url)
+        for width in settings.POST_IMAGE_WIDTHS:
+            self.assertContains(response, f' {width}w')
+        self.assertContains(response, 'width="960"')
+
+    @skipUnless('WEBP' in thumbnails.formats(), 'Pillow без поддержки WebP')
+    def test_picture_offers_webp(self):
+        """Браузеру с WebP предлагается WebP, остальным — JPEG"""
+        thumbnails.generate(self.post.image.name)
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        response = self.guest_client.get(url)
+        self.assertContains(response, '<source type="image/webp"')
+        self.assertContains(response, '.jpg 960w')
+
+    def test_duplicates_share_thumbnails(self):
+        """Копии одной картинки получают одни и те же миниатюры"""
+        copy = Post.objects.create(
+            text='Репост',
+            author=self.user,
+            image=SimpleUploadedFile(
+                'copy.gif', SMALL_GIF, content_type='image/gif'
+            ),
+        )
+        self.assertNotEqual(copy.image.name, self.post.image.name)
+        thumbnails.generate(self.post.image.name)
+        with mock.patch('posts.thumbnails.queue') as queue:
+            sources = thumbnails.picture(copy.image)
+        queue.assert_not_called()
+        self.assertEqual(sources, thumbnails.picture(self.post.image))
+
+    def test_lookup_time_is_measured(self):
+        """Поиск миниатюр попадает в слагаемое thumb заголовка Server-Timing"""
+        with timing.collect() as timings:
+            thumbnails.picture(self.post.image)
+        self.assertGreater(timings.seconds['thumb'], 0)
+
+    def test_upload_queues_thumbnails(self):
+        """Загрузка картинки ставит её миниатюры в очередь"""
+        with mock.patch('posts.views.thumbnails.queue') as queue:
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                {
+                    'text': 'Новый пост',
+                    'image': SimpleUploadedFile(
+                        'new.gif', SMALL_GIF, content_type='image/gif'
+                    ),
+                },
+            )
+        post = Post.objects.get(text='Новый пост')
+        queue.assert_called_once_with(post.image)
+
+    def test_edit_without_new_image_queues_nothing(self):
+        """Правка текста без новой картинки миниатюры не трогает"""
+        with mock.patch('posts.views.thumbnails.queue') as queue:
+            self.authorized_client.post(
+                reverse('posts:post_edit', kwargs={'post_id': self.post.id}),
+                {'text': 'Новый текст'},
+            )
+        queue.assert_not_called()
+
+    def test_failed_image_waits_before_retry(self):
+        """Картинку со сбоем не ставят в очередь снова до конца паузы"""
+        name = self.post.image.name
+        self.addCleanup(thumbnails._failed.pop, name, None)
+        with mock.patch(
+            'sorl.thumbnail.default.backend.generate',
+            side_effect=OSError('broken'),
+        ) as generate, self.assertLogs('posts.thumbnails', 'ERROR'):
+            thumbnails.submit(name)
+            thumbnails.submit(name)
+        self.assertEqual(generate.call_count, 1)
+        with mock.patch('posts.thumbnails.time.monotonic',
+                        return_value=thumbnails._failed[name][0]):
+            with mock.patch('posts.thumbnails.generate') as retry:
+                thumbnails.submit(name)
+        retry.assert_called_once_with(name)
+
+    @override_settings(THUMBNAIL_WORKERS=1)
+    def test_wait_for_pool(self):
+        """wait() дожидается заданий, которые пул делает без запроса"""
+        done = threading.Event()
+
+        def generate(name):
+            time.sleep(0.1)
+            done.set()
+
+        self.addCleanup(thumbnails._pending.discard, 'posts/pool.gif')
+        with mock.patch('posts.thumbnails.generate', side_effect=generate):
+            thumbnails.submit('posts/pool.gif')
+            self.assertTrue(thumbnails.wait(timeout=5))
+        self.assertTrue(done.is_set())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ReleasedImageTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+
+    def create_post(self, name):
+        return Post.objects.create(
+            text='Пост с картинкой',
+            author=self.user,
+            image=SimpleUploadedFile(
+                name, SMALL_GIF, content_type='image/gif'
+            ),
+        )
+
+    def test_thumbnails_removed_with_content(self):
+        """Миниатюры и их ключи удаляются вместе с последней копией"""
+        first = self.create_post('first.gif')
+        second = self.create_post('second.gif')
+        thumbnails.generate(first.image.name)
+        files = [
+            default.backend.prepare(first.image, geometry_string, options)[1]
+            for geometry_string, options in thumbnails.variants()
+        ]
+        first.delete()
+        self.assertIsNone(default.kvstore.get(ImageFile(first.image.name)))
+        for file_ in files:
+            self.assertTrue(file_.exists())
+            self.assertIsNotNone(default.kvstore.get(file_))
+        second.delete()
+        for file_ in files:
+            self.assertFalse(file_.exists())
+            self.assertIsNone(default.kvstore.get(file_))
@@ -0,0 +1,105 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Post, TimelineEntry
+
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Author')
+        cls.other = User.objects.create_user(username='Other')
+        cls.old_post = Post.objects.create(
+            text='Пост до подписки',
+            author=cls.author,
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+        cache.clear()
+
+    def feed(self, **params):
+        response = self.authorized_client.get(
+            reverse('posts:follow_index'), params
+        )
+        return response.context['page_obj']
+
+    def follow(self):
+        self.authorized_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author}
+        ))
+
+    def test_follow_backfills_timeline(self):
+        """Подписка добавляет в ленту уже написанные посты автора"""
+        self.follow()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=self.old_post
+        ).exists())
+        self.assertIn(self.old_post, self.feed())
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает в ленты подписчиков и только в них"""
+        self.follow()
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(post=post).values_list(
+                'user', flat=True
+            )),
+            [self.reader.id]
+        )
+        self.assertEqual(self.feed()[0], post)
+
+    def test_unfollow_prunes_timeline(self):
+        """Отписка убирает посты автора из ленты"""
+        self.follow()
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}
+        ))
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader
+        ).exists())
+        self.assertEqual(len(self.feed()), 0)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_popular_author_merged_on_read(self):
+        """Посты популярного автора не пишутся в ленты, а подмешиваются"""
+        Follow.objects.create(user=self.reader, author=self.other)
+        self.follow()
+        own_post = Post.objects.create(text='Свой', author=self.other)
+        popular_post = Post.objects.create(text='Чужой', author=self.author)
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=popular_post).exists()
+        )
+        self.assertEqual(
+            list(self.feed()),
+            [popular_post, own_post, self.old_post]
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_merged_feed_pages_by_cursor(self):
+        """Слитая лента листается курсором без пропусков и повторов"""
+        Follow.objects.create(user=self.reader, author=self.other)
+        self.follow()
+        for number in range(settings.COUNTER):
+            Post.objects.create(text=f'Свой {number}', author=self.other)
+            Post.objects.create(text=f'Чужой {number}', author=self.author)
+        first_page = self.feed()
+        second_page = self.feed(after=first_page.paginator.next_cursor)
+        numbered = self.feed(page=1)
+        self.assertEqual(len(first_page), settings.COUNTER)
+        self.assertEqual(list(first_page), list(numbered))
+        self.assertEqual(
+            list(first_page) + list(second_page),
+            list(Post.objects.order_by('-pub_date', '-id'))[
+                :settings.COUNTER * 2
+            ]
+        )
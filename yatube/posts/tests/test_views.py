@@ -4,7 +4,9 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from posts.models import Follow, Comment, Group, Post
@@ -185,20 +187,20 @@ class PostViewsTests(TestCase):
         self.assertNotIn(self.post.group, post_object)
 
     def test_cache_context(self):
-        '''Кэш записей index страницы сохранён'''
+        '''Кэш записей index страницы сохранён до изменения постов'''
         old_data = self.authorized_client.get(
             reverse('posts:index')
         ).content
-        Post.objects.filter(id=self.post.id).delete()
+        Post.objects.filter(id=self.post.id).update(text='Мимо сигналов')
         new_data = self.authorized_client.get(
             reverse('posts:index')
         ).content
         self.assertEqual(new_data, old_data)
-        cache.clear()
-        after_clear_data = self.authorized_client.get(
+        Post.objects.filter(id=self.post.id).delete()
+        after_delete_data = self.authorized_client.get(
             reverse('posts:index')
         ).content
-        self.assertNotEqual(new_data, after_clear_data)
+        self.assertNotEqual(new_data, after_delete_data)
 
     def test_authorized_user_follow(self):
         """Авторизованный пользователь подписывается на других """
@@ -346,3 +348,264 @@ class CommentTest(TestCase):
         )
         self.assertEqual(response.context['comments'][0], self.comment)
         self.assertIsInstance(response.context.get('form'), CommentForm)
+
+
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.group = Group.objects.create(
+            title='test-group',
+            slug='test-group',
+            description='test description',
+        )
+        cls.TEST_OF_POST: int = 13
+        Post.objects.bulk_create([
+            Post(
+                text='Тестовый текст' + str(post_plus),
+                group=cls.group,
+                author=cls.user,
+            )
+            for post_plus in range(cls.TEST_OF_POST)
+        ])
+        cls.pages_names = (
+            reverse('posts:index'),
+            reverse(
+                'posts:profile',
+                kwargs={'username': cls.user}),
+            reverse(
+                'posts:group_list',
+                kwargs={'slug': cls.group.slug})
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def test_older_page_continues_first_page(self):
+        """Курсор ведёт на следующие записи без пропусков и повторов"""
+        for url in self.pages_names:
+            with self.subTest(url=url):
+                first_page = self.guest_client.get(url).context['page_obj']
+                self.assertTrue(first_page.has_next())
+                self.assertFalse(first_page.has_previous())
+                second_page = self.guest_client.get(
+                    url, {'after': first_page.paginator.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(
+                    len(second_page),
+                    self.TEST_OF_POST - settings.COUNTER
+                )
+                self.assertFalse(second_page.has_next())
+                self.assertTrue(second_page.has_previous())
+                shown = list(first_page) + list(second_page)
+                self.assertEqual(
+                    shown,
+                    list(Post.objects.order_by('-pub_date', '-id'))
+                )
+
+    def test_newer_page_returns_to_first_page(self):
+        """Курсор назад возвращает на первую страницу"""
+        url = reverse('posts:index')
+        first_page = self.guest_client.get(url).context['page_obj']
+        second_page = self.guest_client.get(
+            url, {'after': first_page.paginator.next_cursor}
+        ).context['page_obj']
+        back_page = self.guest_client.get(
+            url, {'before': second_page.paginator.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back_page), list(first_page))
+        self.assertFalse(back_page.has_previous())
+
+    def test_new_post_does_not_shift_page(self):
+        """Новая запись не сдвигает уже открытую страницу"""
+        url = reverse('posts:index')
+        first_page = self.guest_client.get(url).context['page_obj']
+        cursor = first_page.paginator.next_cursor
+        before = list(self.guest_client.get(
+            url, {'after': cursor}
+        ).context['page_obj'])
+        Post.objects.create(text='Свежий пост', author=self.user)
+        cache.clear()
+        after = list(self.guest_client.get(
+            url, {'after': cursor}
+        ).context['page_obj'])
+        self.assertEqual(before, after)
+
+    def test_broken_cursor_shows_first_page(self):
+        """Битый курсор открывает первую страницу"""
+        url = reverse('posts:index')
+        response = self.guest_client.get(url, {'after': 'broken'})
+        self.assertEqual(len(response.context['page_obj']), settings.COUNTER)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    def test_cursor_page_skips_count(self):
+        """Листание по курсору не выполняет COUNT(*)"""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(url)
+        self.assertFalse(
+            [q for q in queries if 'COUNT(' in q['sql'].upper()]
+        )
+
+
+class CountedPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.group = Group.objects.create(
+            title='test-group',
+            slug='test-group',
+            description='test description',
+        )
+        cls.TEST_OF_POST: int = 13
+        for post_plus in range(cls.TEST_OF_POST):
+            Post.objects.create(
+                text='Тестовый текст' + str(post_plus),
+                group=cls.group,
+                author=cls.user,
+            )
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def count_queries(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(url, params)
+        counts = [q for q in queries if 'COUNT(' in q['sql'].upper()]
+        return response.context['page_obj'], counts
+
+    def test_group_and_profile_pages_use_counters(self):
+        """Номера страниц группы и профиля берутся из счётчиков"""
+        urls = (
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                page_obj, counts = self.count_queries(url, page=1)
+                self.assertFalse(counts)
+                self.assertEqual(
+                    page_obj.paginator.num_pages,
+                    ceil(self.TEST_OF_POST / settings.COUNTER)
+                )
+
+    def test_index_count_is_cached_until_new_post(self):
+        """Число постов на главной считается один раз до нового поста"""
+        url = reverse('posts:index')
+        self.assertTrue(self.count_queries(url, page=1)[1])
+        self.assertFalse(self.count_queries(url, page=2)[1])
+        Post.objects.create(text='Свежий пост', author=self.user)
+        page_obj, counts = self.count_queries(url, page=2)
+        self.assertTrue(counts)
+        self.assertEqual(page_obj.paginator.count, self.TEST_OF_POST + 1)
+
+    def test_stale_counter_is_recounted(self):
+        """Отставший счётчик не прячет посты с последней страницы"""
+        Post.objects.bulk_create([
+            Post(text='Без сигналов', group=self.group, author=self.user)
+            for _ in range(settings.COUNTER)
+        ])
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        page_obj = self.count_queries(url, page=3)[0]
+        self.assertEqual(page_obj.number, 3)
+        self.assertEqual(
+            len(page_obj),
+            self.TEST_OF_POST + settings.COUNTER - 2 * settings.COUNTER
+        )
+
+
+class CommentPagesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.post = Post.objects.create(text='Популярный пост', author=cls.user)
+        cls.url = reverse('posts:post_detail', kwargs={'post_id': cls.post.id})
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def add_comments(self, count):
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.user, text='Комментарий')
+            for _ in range(count)
+        )
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        return response, len(queries)
+
+    def test_first_comments_inline(self):
+        """На странице поста только первая порция комментариев"""
+        self.add_comments(settings.COMMENTS_PER_PAGE + 5)
+        response = self.get(self.url)[0]
+        comments = response.context['comments']
+        self.assertEqual(len(comments), settings.COMMENTS_PER_PAGE)
+        self.assertEqual(
+            list(comments),
+            list(self.post.comments.all()[:settings.COMMENTS_PER_PAGE]),
+        )
+        self.assertContains(response, 'js-more-comments')
+
+    def test_more_comments_fragment(self):
+        """Остальные комментарии отдаются фрагментом по курсору"""
+        self.add_comments(settings.COMMENTS_PER_PAGE + 5)
+        cursor = self.get(self.url)[0].context['comments'].paginator
+        response = self.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}),
+            after=cursor.next_cursor,
+        )[0]
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual(
+            list(response.context['comments']),
+            list(self.post.comments.all()[settings.COMMENTS_PER_PAGE:]),
+        )
+        self.assertNotContains(response, 'js-more-comments')
+
+    def test_broken_cursor_reuses_first_portion(self):
+        """Битый курсор отдаёт первую порцию из того же фрагмента кэша"""
+        self.add_comments(3)
+        self.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse(
+                    'posts:post_comments', kwargs={'post_id': self.post.id}
+                ),
+                {'after': 'zzz'},
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Комментарий', count=3)
+        self.assertFalse([
+            query for query in queries if 'posts_comment' in query['sql']
+        ])
+
+    def test_page_stays_flat(self):
+        """Размер страницы и число запросов не растут с комментариями"""
+        self.add_comments(settings.COMMENTS_PER_PAGE + 1)
+        response, queries = self.get(self.url)
+        self.add_comments(10 * settings.COMMENTS_PER_PAGE)
+        cache.clear()
+        more, more_queries = self.get(self.url)
+        self.assertEqual(more_queries, queries)
+        # Разница только в длине id и курсора в ссылке «Показать ещё».
+        self.assertAlmostEqual(
+            len(more.content), len(response.content), delta=100
+        )
+
+    def test_count_from_counter(self):
+        """Число комментариев берётся из счётчика поста"""
+        Comment.objects.create(post=self.post, author=self.user, text='Раз')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Комментарии: 1')
+        self.assertFalse([
+            query for query in queries
+            if 'COUNT(' in query['sql'] and 'posts_comment' in query['sql']
+        ])
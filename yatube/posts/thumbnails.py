@@ -0,0 +1,298 @@
+"""Миниатюры картинок постов создаются заранее, а не при показе страницы.
+
+После загрузки картинки (post_create, post_edit) все её варианты
+(variants: ширины POST_IMAGE_WIDTHS в форматах POST_IMAGE_FORMATS) ставятся
+в очередь пула потоков. Бэкенд DeferredThumbnailBackend при показе страницы
+только ищет готовую миниатюру в хранилище ключей sorl и, пока её нет,
+отдаёт заглушку того же размера, так что Pillow в обработке запроса
+не работает.
+
+Запрос задания не ждёт: пул доделывает их сам, а воркер сервера сразу
+берёт следующий запрос. Тесты и команды, которым нужны готовые
+миниатюры, дожидаются их функцией wait.
+
+Картинку, миниатюры которой создать не удалось, пул не берёт снова
+до конца паузы FAILURE_BACKOFF, которая растёт вдвое с каждым сбоем
+до FAILURE_BACKOFF_MAX: иначе каждый показ страницы ставил бы сломанную
+картинку в очередь и писал в лог ту же ошибку.
+
+Миниатюры называются по содержимому картинки и общие для её копий.
+Когда пост отпускает картинку, forget убирает из хранилища ключей
+записи о её имени, а сами миниатюры удаляются вместе с содержимым
+(сигнал core.storage.blob_removed).
+"""
+import logging
+import threading
+import time
+from concurrent import futures
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import serialize, tokey
+from sorl.thumbnail.images import DummyImageFile, ImageFile
+
+from core import metrics, timing
+from core.storage import blob_removed
+
+logger = logging.getLogger(__name__)
+
+# Пауза перед новой попыткой после сбоя, секунд.
+FAILURE_BACKOFF = 60
+FAILURE_BACKOFF_MAX = 60 * 60
+
+_lock = threading.Lock()
+_pending = set()
+# Картинки со сбоем: имя -> (когда можно снова, текущая пауза).
+_failed = {}
+_executor = None
+# Задания пула, которые ещё не закончились.
+_futures = set()
+
+GENERATED = metrics.Counter(
+    'yatube_thumbnails_generated_total',
+    'Картинки, для которых созданы миниатюры: ok — все, error — сбой.',
+    ('result',),
+)
+
+PLACEHOLDER = (
+    "<svg xmlns='http://www.w3.org/2000/svg' width='{}' height='{}'>"
+    "<rect width='100%' height='100%' fill='#e9ecef'/></svg>"
+)
+
+
+def geometry(width):
+    """Геометрия sorl для ширины с пропорциями POST_IMAGE_SIZE."""
+    full_width, full_height = settings.POST_IMAGE_SIZE
+    return f'{width}x{round(width * full_height / full_width)}'
+
+
+def formats():
+    """Форматы из POST_IMAGE_FORMATS, которые умеет сохранять Pillow."""
+    Image.init()
+    return [fmt for fmt in settings.POST_IMAGE_FORMATS if fmt in Image.SAVE]
+
+
+def variants():
+    """Пары (геометрия, параметры) всех миниатюр картинки поста."""
+    return [
+        (geometry(width), {'crop': 'center', 'upscale': True, 'format': fmt})
+        for fmt in formats()
+        for width in settings.POST_IMAGE_WIDTHS
+    ]
+
+
+def content_name(digest, geometry_string, options):
+    """Имя миниатюры содержимого с SHA-256 digest."""
+    key = tokey(digest, geometry_string, serialize(options))
+    return '{}{}/{}/{}.{}'.format(
+        sorl_settings.THUMBNAIL_PREFIX, key[:2], key[2:4], key,
+        EXTENSIONS[options['format']],
+    )
+
+
+class Placeholder(DummyImageFile):
+    """Серый прямоугольник размера миниатюры, встроенный в data: URL."""
+
+    @property
+    def url(self):
+        return 'data:image/svg+xml,' + quote(PLACEHOLDER.format(*self.size))
+
+
+class DeferredThumbnailBackend(ThumbnailBackend):
+    def complete(self, options, source=None):
+        """Параметры миниатюры с умолчаниями, которые добавляет sorl."""
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT and source is not None:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def prepare(self, file_, geometry_string, options):
+        """Источник и файл миниатюры, как их называет sorl."""
+        source = ImageFile(file_)
+        self.complete(options, source)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return source, ImageFile(name, default.storage)
+
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        # Миниатюры одинаковых картинок называются по содержимому
+        # и создаются один раз, как бы ни назывались сами картинки.
+        digest = getattr(source.storage, 'digest', None)
+        digest = digest and digest(source.name)
+        if digest is None:
+            return super()._get_thumbnail_filename(
+                source, geometry_string, options
+            )
+        return content_name(digest, geometry_string, options)
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        with timing.measure('thumb'):
+            source, thumbnail = self.prepare(
+                file_, geometry_string, options
+            )
+            cached = default.kvstore.get(thumbnail)
+        if cached:
+            return cached
+        # Картинка загружена в обход форм или хранилище ключей очищено:
+        # миниатюру всё равно создаст пул, а не этот запрос.
+        queue(source.name)
+        return Placeholder(geometry_string)
+
+    def generate(self, file_, geometry_string, **options):
+        return super().get_thumbnail(file_, geometry_string, **options)
+
+
+def picture(image):
+    """Источники <picture> для картинки поста.
+
+    Возвращает список словарей type/srcset/src/width/height по форматам,
+    запасной JPEG — последним. Пока готовы не все варианты, вместо них
+    одна заглушка: ссылки на картинку разных поколений не смешиваются.
+    """
+    sources = []
+    for fmt in formats():
+        files = [
+            default.backend.get_thumbnail(
+                image, geometry(width),
+                crop='center', upscale=True, format=fmt,
+            )
+            for width in settings.POST_IMAGE_WIDTHS
+        ]
+        if any(isinstance(file_, Placeholder) for file_ in files):
+            largest = Placeholder(geometry(max(settings.POST_IMAGE_WIDTHS)))
+            return [{
+                'src': largest.url,
+                'width': largest.width,
+                'height': largest.height,
+            }]
+        largest = files[-1]
+        sources.append({
+            'type': Image.MIME[fmt],
+            'srcset': ', '.join(
+                f'{file_.url} {file_.width}w' for file_ in files
+            ),
+            'src': largest.url,
+            'width': largest.width,
+            'height': largest.height,
+        })
+    return sources
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = futures.ThreadPoolExecutor(
+                settings.THUMBNAIL_WORKERS, thread_name_prefix='thumbnails'
+            )
+        return _executor
+
+
+def generate(name):
+    """Создаёт все миниатюры картинки и сбрасывает кэш её постов."""
+    from .models import Post
+    from .signals import bump_post_pages
+
+    try:
+        source = ImageFile(name, default_storage)
+        for geometry_string, options in variants():
+            default.backend.generate(source, geometry_string, **options)
+        posts = Post.objects.filter(image=name)
+        # Карточки этих постов закэшированы с заглушкой вместо картинки.
+        posts.update(updated_at=timezone.now())
+        for post_id, author_id, group_id in posts.values_list(
+            'id', 'author_id', 'group_id'
+        ):
+            bump_post_pages(post_id, [author_id], [group_id])
+        GENERATED.inc(result='ok')
+        with _lock:
+            _failed.pop(name, None)
+    except Exception:
+        GENERATED.inc(result='error')
+        logger.exception('Thumbnail generation failed for %s', name)
+        with _lock:
+            previous = _failed.get(name)
+            delay = FAILURE_BACKOFF if previous is None else min(
+                previous[1] * 2, FAILURE_BACKOFF_MAX
+            )
+            _failed[name] = (time.monotonic() + delay, delay)
+    finally:
+        with _lock:
+            _pending.discard(name)
+        if settings.THUMBNAIL_WORKERS:
+            connections.close_all()
+
+
+def submit(name):
+    with _lock:
+        if name in _pending:
+            return
+        if _failed.get(name, (0,))[0] > time.monotonic():
+            return
+        _pending.add(name)
+    if not settings.THUMBNAIL_WORKERS:
+        generate(name)
+        return
+    future = get_executor().submit(generate, name)
+    with _lock:
+        _futures.add(future)
+    future.add_done_callback(finished)
+
+
+def finished(future):
+    with _lock:
+        _futures.discard(future)
+
+
+def wait(timeout=None):
+    """Ждёт задания пула, поставленные до вызова; True, если дождались."""
+    with _lock:
+        pending = list(_futures)
+    return not futures.wait(pending, timeout=timeout).not_done
+
+
+def queue(image):
+    """Ставит картинку в очередь после фиксации транзакции.
+
+    Принимает поле Post.image или имя файла в хранилище.
+    """
+    name = getattr(image, 'name', image)
+    if name:
+        transaction.on_commit(lambda: submit(name))
+
+
+def forget(name):
+    """Убирает из хранилища ключей sorl записи об имени картинки."""
+    source = ImageFile(name, default_storage)
+    default.kvstore.delete(source, delete_thumbnails=False)
+    # Список миниатюр имени: сами они общие для копий содержимого.
+    default.kvstore._delete(source.key, identity='thumbnails')
+
+
+@receiver(blob_removed)
+def delete_content_thumbnails(sender, digest, **kwargs):
+    """Удаляет миниатюры содержимого, на которое не осталось имён."""
+    for geometry_string, options in variants():
+        thumbnail = ImageFile(
+            content_name(
+                digest, geometry_string, default.backend.complete(options)
+            ),
+            default.storage,
+        )
+        default.kvstore.delete(thumbnail, delete_thumbnails=False)
+        thumbnail.delete()
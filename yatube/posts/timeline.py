@@ -0,0 +1,133 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from .models import Follow, Post, Profile, TimelineEntry
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора.
+
+    Если подписчиков не меньше TIMELINE_FANOUT_LIMIT, пост никуда не
+    пишется: такие авторы подмешиваются в ленту при чтении.
+    """
+    if is_pull_author(post.author_id):
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id', flat=True
+    )
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту нового подписчика последние посты автора."""
+    if is_pull_author(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('id', 'pub_date')[:settings.TIMELINE_BACKFILL]
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты посты автора, от которого отписались."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def rebuild():
+    """Раскладывает посты по лентам всех подписчиков одним запросом.
+
+    Каждый читатель получает последние TIMELINE_BACKFILL постов авторов,
+    на которых подписан, как при backfill; авторы с числом подписчиков
+    от TIMELINE_FANOUT_LIMIT пропускаются. Уже разложенные записи
+    остаются как есть. Нужен после записи подписок и постов в обход ORM.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT OR IGNORE INTO posts_timelineentry '
+            '(user_id, post_id, pub_date) '
+            'SELECT follow.user_id, post.id, post.pub_date '
+            'FROM posts_follow AS follow '
+            'JOIN posts_profile AS profile '
+            'ON profile.user_id = follow.author_id '
+            'JOIN (SELECT id, author_id, pub_date, ROW_NUMBER() OVER ('
+            'PARTITION BY author_id ORDER BY pub_date DESC, id DESC'
+            ') AS position FROM posts_post) AS post '
+            'ON post.author_id = follow.author_id '
+            'WHERE post.position <= %s AND profile.followers_count < %s',
+            [settings.TIMELINE_BACKFILL, settings.TIMELINE_FANOUT_LIMIT],
+        )
+
+
+def is_pull_author(author_id):
+    return Profile.objects.filter(
+        user_id=author_id,
+        followers_count__gte=settings.TIMELINE_FANOUT_LIMIT,
+    ).exists()
+
+
+class Timeline:
+    """Лента подписок читателя.
+
+    Основная часть читается из TimelineEntry одним проходом по индексу
+    (user, pub_date, post). Посты авторов, у которых подписчиков не меньше
+    TIMELINE_FANOUT_LIMIT, берутся из Post и сливаются с ней при чтении.
+    Если автор опустился ниже порога, посты, написанные им в режиме
+    подмешивания, в ленты задним числом не раскладываются.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    @cached_property
+    def pull_author_ids(self):
+        return list(
+            Follow.objects.filter(
+                user=self.user,
+                author__profile__followers_count__gte=(
+                    settings.TIMELINE_FANOUT_LIMIT
+                ),
+            ).values_list('author_id', flat=True)
+        )
+
+    def entries(self):
+        return TimelineEntry.objects.filter(user=self.user).select_related(
+            'post__author', 'post__group'
+        ).order_by('-pub_date', '-post_id')
+
+    def pulled_posts(self):
+        if not self.pull_author_ids:
+            return None
+        return Post.objects.filter(
+            author_id__in=self.pull_author_ids
+        ).select_related('author', 'group')
+
+    def posts(self):
+        """Та же лента одним запросом к Post — для нумерованных страниц."""
+        if not self.pull_author_ids:
+            # Сортировка по полям ленты идёт по её индексу, без сортировки
+            # всей выборки постов.
+            return Post.objects.filter(
+                timeline_entries__user=self.user
+            ).select_related('author', 'group').order_by(
+                '-timeline_entries__pub_date', '-timeline_entries__post__id'
+            )
+        return Post.objects.filter(
+            Q(id__in=self.user.timeline.values('post_id'))
+            | Q(author_id__in=self.pull_author_ids)
+        ).select_related('author', 'group')
@@ -1,65 +1,173 @@
 from django.shortcuts import get_object_or_404, redirect, render
 from django.conf import settings
-from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required
+from django.utils.functional import SimpleLazyObject
+
+from . import thumbnails
+from .cache import anonymous_page_cache, fragment
+from .forms import CommentForm, PostForm, SearchForm
+from .models import Comment, Post, Group, User, Follow
+from .paginators import (
+    CountedPaginator, CursorPaginator, TimelinePaginator, decode_cursor,
+    encode_cursor, page_params,
+)
+from .search import SearchPaginator, search_posts
+from .timeline import Timeline
+
+
+def paginatoring(post_list, query_params, cursor_paginator=None, **count):
+    if settings.PAGINATION_MODE == 'cursor' and 'page' not in query_params:
+        paginator = cursor_paginator or CursorPaginator(
+            post_list, settings.COUNTER
+        )
+        return paginator.get_page(
+            after=query_params.get('after'),
+            before=query_params.get('before'),
+        )
+    paginator = CountedPaginator(post_list, settings.COUNTER, **count)
+    page_obj = paginator.get_page(query_params.get('page'))
+    return page_obj
 
-from .forms import CommentForm, PostForm
-from .models import Post, Group, User, Follow
 
+def index_scope(request):
+    return ('index',), Post.objects.all()
 
-def paginatoring(post_list, page_number):
-    paginator = Paginator(post_list, settings.COUNTER)
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+
+def group_scope(request, slug):
+    pk = Group.objects.filter(slug=slug).values_list('pk', flat=True).first()
+    if pk is not None:
+        return (f'group:{pk}',), Post.objects.filter(group_id=pk)
 
 
+def profile_scope(request, username):
+    pk = User.objects.filter(
+        username=username
+    ).values_list('pk', flat=True).first()
+    if pk is not None:
+        return (f'profile:{pk}',), Post.objects.filter(author_id=pk)
+
+
+@anonymous_page_cache(index_scope)
 def index(request):
     post_list = Post.objects.select_related('author', 'group')
-    page_obj = paginatoring(post_list, request.GET.get('page'))
+    page_obj = paginatoring(post_list, request.GET, namespaces=('index',))
     context = {
         'page_obj': page_obj,
+        'fragment': fragment('index', page=page_params(request.GET)),
     }
     return render(request, 'posts/index.html', context)
 
 
+@anonymous_page_cache(group_scope)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     post_list = group.posts.select_related('author')
     context = {
-        'page_obj': paginatoring(post_list, request.GET.get('page')),
+        'page_obj': paginatoring(
+            post_list, request.GET, count=group.posts_count
+        ),
         'group': group,
+        'fragment': fragment(
+            f'group:{group.pk}', page=page_params(request.GET)
+        ),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@anonymous_page_cache(profile_scope)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('profile'), username=username
+    )
     posts = author.posts.select_related('group')
     following = (request.user.is_authenticated
                  and request.user.follower.filter(author=author).exists()
                  )
     context = {
         'author': author,
-        'page_obj': paginatoring(posts, request.GET.get('page')),
+        'page_obj': paginatoring(
+            posts, request.GET, count=author.profile.posts_count
+        ),
         'following': following,
+        'fragment': fragment(
+            f'profile:{author.pk}', page=page_params(request.GET)
+        ),
     }
     return render(request, 'posts/profile.html', context)
 
 
+def comments_page(post_id, after=None):
+    """Порция комментариев поста, новые — первыми.
+
+    Страница читается лениво: если порция есть в кэше фрагментов,
+    запроса к комментариям не будет.
+    """
+    paginator = CursorPaginator(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        settings.COMMENTS_PER_PAGE,
+        fields=('created', 'id'),
+    )
+    return SimpleLazyObject(lambda: paginator.get_page(after=after))
+
+
 def post_detail(request, post_id):
     post = get_object_or_404(
-        Post.objects.select_related('group', 'author'),
+        Post.objects.select_related('group', 'author__profile'),
         id=post_id)
-    comments = post.comments.select_related('author')
+    comments = comments_page(post.pk)
     context = {
         'post': post,
-        'posts_count': post.author.posts.count(),
+        'posts_count': post.author.profile.posts_count,
         'comments': comments,
-        'form': CommentForm()
+        'cursor': 'first',
+        'form': CommentForm(),
+        'fragment': fragment(f'post:{post.pk}'),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def search(request):
+    form = SearchForm(request.GET or None)
+    page_obj = None
+    if form.is_valid() and form.cleaned_data['q']:
+        paginator = SearchPaginator(
+            search_posts(
+                form.cleaned_data['q'],
+                group=form.cleaned_data['group'],
+                author=form.cleaned_data['author'],
+            ),
+            settings.COUNTER,
+        )
+        page_obj = paginator.get_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
+    query = request.GET.copy()
+    for param in ('after', 'before'):
+        query.pop(param, None)
+    context = {
+        'form': form,
+        'page_obj': page_obj,
+        'query': query.urlencode() + '&' if query else '',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    # Ключ фрагмента — разобранный курсор: битые и равные по смыслу
+    # строки не заводят новых записей кэша.
+    cursor = decode_cursor(request.GET.get('after'))
+    after = cursor and encode_cursor(*cursor)
+    context = {
+        'post': post,
+        'comments': comments_page(post.pk, after),
+        'cursor': after or 'first',
+        'fragment': fragment(f'post:{post.pk}'),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -67,6 +175,7 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.queue(post.image)
         return redirect('posts:profile', username=request.user)
     return render(request, 'posts/create_post.html', {'form': form})
 
@@ -84,6 +193,8 @@ def post_edit(request, post_id):
         instance=post)
     if form.is_valid():
         form.save()
+        if 'image' in form.changed_data:
+            thumbnails.queue(post.image)
         return redirect('posts:post_detail', post_id)
     context = {
         'form': form,
@@ -108,11 +219,18 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(
-        author__following__user=request.user
-    ).select_related('author', 'group')
+    timeline = Timeline(request.user)
     context = {
-        'page_obj': paginatoring(posts, request.GET.get('page')),
+        'page_obj': paginatoring(
+            timeline.posts(),
+            request.GET,
+            TimelinePaginator(timeline, settings.COUNTER),
+            namespaces=('index', f'follow:{request.user.pk}'),
+        ),
+        'fragment': fragment(
+            'index', f'follow:{request.user.pk}',
+            page=page_params(request.GET),
+        ),
     }
     return render(request, 'posts/follow.html', context)
 
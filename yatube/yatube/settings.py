@@ -1,4 +1,8 @@
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
@@ -40,6 +44,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.ReplicaMiddleware',
+    'core.middleware.QueryMemoMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,7 +61,9 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Обычный DjangoTemplates, только время отрисовки идёт
+        # в Server-Timing (core.middleware).
+        'BACKEND': 'core.templates.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -70,23 +80,41 @@ TEMPLATES = [
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
-}
-
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# core/backends/sqlite3: WAL и PRAGMA при открытии соединения, BEGIN
+# IMMEDIATE в core.transactions.atomic_immediate(). Соединение живёт между
+# запросами CONN_MAX_AGE секунд; timeout — сколько SQLite ждёт блокировку.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {'timeout': 5},
     }
 }
 
+# Реплики только для чтения (core/routers.py): GET-запросы читают их,
+# запись идёт в default. YATUBE_REPLICAS=2 добавляет копии
+# db-replica1.sqlite3 и db-replica2.sqlite3, их обновляет команда
+# copy_replicas. Тесты запускаются без реплик (маршрутизацию проверяет
+# core/test_routers.py); MIRROR только не даёт создавать для них базы.
+DATABASE_REPLICAS = [
+    f'replica{number}'
+    for number in range(1, int(os.getenv('YATUBE_REPLICAS', 0)) + 1)
+]
+for alias in DATABASE_REPLICAS:
+    DATABASES[alias] = {
+        'ENGINE': 'core.backends.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'NAME': os.path.join(BASE_DIR, f'db-{alias}.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Сколько секунд после записи браузер читает основную базу.
+REPLICA_PIN_SECONDS: int = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -131,6 +159,17 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
 
 COUNTER: int = 10
+# 'cursor' — листание по ключу (pub_date, id) без COUNT(*) и OFFSET,
+# 'offset' — нумерованные страницы. Адреса с ?page= работают в обоих режимах.
+PAGINATION_MODE: str = 'cursor'
+# Комментарии под постом показываются порциями, остальные подгружаются.
+COMMENTS_PER_PAGE: int = 20
+
+# Лента подписок: новый пост раскладывается по лентам подписчиков, если их
+# меньше TIMELINE_FANOUT_LIMIT, иначе посты автора подмешиваются при чтении.
+# При подписке в ленту добавляются TIMELINE_BACKFILL последних постов автора.
+TIMELINE_FANOUT_LIMIT: int = 1000
+TIMELINE_BACKFILL: int = 200
 
 
 LOGIN_URL = 'users:login'
@@ -145,9 +184,85 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
-
+# Одинаковые файлы хранятся один раз (core/storage.py); миниатюры sorl
+# и так называются по содержимому и лежат в обычном хранилище.
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+THUMBNAIL_STORAGE = 'django.core.files.storage.FileSystemStorage'
+# Загрузки всегда пишутся во временный файл, а не в память воркера.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+# Оригинал картинки поста ужимается до этой стороны (posts/images.py).
+POST_IMAGE_MAX_SIDE: int = 2048
+POST_IMAGE_QUALITY: int = 85
+
+# Фрагменты страниц сбрасываются сигналами моделей (posts.cache),
+# поэтому срок жизни может быть долгим.
+FRAGMENT_CACHE_TIMEOUT: int = 60 * 60 * 24
+# Страницы index, group_posts и profile для анонимных читателей.
+PAGE_CACHE_TIMEOUT: int = 60 * 60
+
+THUMBNAIL_BACKEND = 'posts.thumbnails.DeferredThumbnailBackend'
+# Картинка поста показывается кадром POST_IMAGE_SIZE в нескольких ширинах
+# (srcset) и форматах (<picture>): первые форматы предпочтительнее, JPEG —
+# запасной. Форматы, которые Pillow сохранять не умеет, пропускаются.
+POST_IMAGE_SIZE = (960, 339)
+POST_IMAGE_WIDTHS = (320, 640, 960)
+POST_IMAGE_FORMATS = ('WEBP', 'JPEG')
+# Потоков для создания миниатюр; 0 — создавать без пула, сразу.
+THUMBNAIL_WORKERS: int = 2
+
+# Общий для всех воркеров кэш в файле SQLite (core/cache.py): сброс
+# поколений из одного процесса виден остальным.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_SIZE': 256 * 1024 * 1024,
+        },
     }
 }
+
+# Тесты (manage.py test и pytest) пишут служебные файлы во временный
+# каталог: иначе cache.clear() в тестах стирал бы общий кэш сервера.
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+if TESTING:
+    TEST_DIR = tempfile.mkdtemp(prefix='yatube-test-')
+    atexit.register(shutil.rmtree, TEST_DIR, ignore_errors=True)
+    CACHES['default']['LOCATION'] = os.path.join(TEST_DIR, 'cache.sqlite3')
+
+# Доля запросов с заголовком Server-Timing и строкой в логе core.timing
+# (core/middleware.py); 0 — не замерять.
+SERVER_TIMING_SAMPLE: float = 0.1
+
+# Метрики процессов сервера (core/metrics.py): каталог их файлов
+# и адреса, с которых можно читать /metrics/.
+METRICS_DIR = os.path.join(BASE_DIR, 'metrics')
+if TESTING:
+    METRICS_DIR = os.path.join(TEST_DIR, 'metrics')
+METRICS_ALLOWED_IPS = ['127.0.0.1']
+
+# Строки JSON core.timing о выбранных запросах и отчёт core.memo
+# о невыполненных повторах запросов (core/middleware.py, только при DEBUG)
+# печатаются в консоль сервера. В тестах строки замеров не нужны.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.timing': {
+            'handlers': ['console'],
+            'level': 'WARNING' if TESTING else 'INFO',
+        },
+        'core.memo': {
+            'handlers': ['console'],
+            'level': 'DEBUG' if DEBUG else 'WARNING',
+        },
+    },
+}